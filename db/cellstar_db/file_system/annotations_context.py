@@ -1,3 +1,4 @@
+from copy import deepcopy
 from uuid import uuid4
 
 from cellstar_db.file_system.constants import ANNOTATION_METADATA_FILENAME
@@ -12,24 +13,22 @@ from cellstar_preprocessor.flows.common import save_dict_to_json_file
 
 class AnnnotationsEditContext:
     async def update_annotations_json(self, annotations_json: AnnotationsMetadata):
-        path = self.db._path_to_object(namespace=self.namespace, key=self.key)
-        save_dict_to_json_file(annotations_json, ANNOTATION_METADATA_FILENAME, path)
+        self.__save_annotations(annotations_json)
 
     async def remove_descriptions(self, ids: list[str]):
         # 1. read annotations.json file using existing read_annotations function to AnnotationsMetadata TypedDict in d variable
-        d = await self.db.read_annotations(namespace=self.namespace, key=self.key)
+        d = await self._read_annotations_for_editing()
         # 2. for id in ids, if id exists in annotations.description.keys()
         for id in ids:
             if id in d["descriptions"].keys():
                 # 3. remove that key from d variable
                 del d["descriptions"][id]
         # 4. write d back to annotations.json
-        path = self.db._path_to_object(namespace=self.namespace, key=self.key)
-        save_dict_to_json_file(d, ANNOTATION_METADATA_FILENAME, path)
+        self.__save_annotations(d)
 
     async def add_or_modify_descriptions(self, xs: list[DescriptionData]):
         # 1. read annotations.json file using existing read_annotations function to AnnotationsMetadata TypedDict in d variable
-        d = await self.db.read_annotations(namespace=self.namespace, key=self.key)
+        d = await self._read_annotations_for_editing()
         # 2. loop over xs:
         for x in xs:
             # 2. if 'id' in x:
@@ -75,27 +74,25 @@ class AnnnotationsEditContext:
             else:
                 d["descriptions"][descr_id] = x
         # 4. write d back to annotations.json
-        path = self.db._path_to_object(namespace=self.namespace, key=self.key)
-        save_dict_to_json_file(d, ANNOTATION_METADATA_FILENAME, path)
+        self.__save_annotations(d)
 
     async def remove_segment_annotations(self, ids: list[str]):
         """
         Removes (segment) annotations by annotation ids.
         """
         # 1. read annotations.json file using existing read_annotations function to AnnotationsMetadata TypedDict in d variable
-        d = await self.db.read_annotations(namespace=self.namespace, key=self.key)
+        d = await self._read_annotations_for_editing()
         # filter annotations list to leave only those which id is not in ids
         old_annotations_list: list[SegmentAnnotationData] = d["segment_annotations"]
         new_annotations_list = list(
             filter(lambda a: a["id"] not in ids, old_annotations_list)
         )
         d["segment_annotations"] = new_annotations_list
-        path = self.db._path_to_object(namespace=self.namespace, key=self.key)
-        save_dict_to_json_file(d, ANNOTATION_METADATA_FILENAME, path)
+        self.__save_annotations(d)
 
     async def add_or_modify_segment_annotations(self, xs: list[SegmentAnnotationData]):
         # 1. read annotations.json file using existing read_annotations function to AnnotationsMetadata TypedDict in d variable
-        d = await self.db.read_annotations(namespace=self.namespace, key=self.key)
+        d = await self._read_annotations_for_editing()
         # 2. loop over xs:
         for x in xs:
             # 2. if 'id' in x:
@@ -119,8 +116,21 @@ class AnnnotationsEditContext:
                 d["segment_annotations"].append(x)
                 print(f"Annotation with id {annotation_id} was added")
 
+        self.__save_annotations(d)
+
+    async def _read_annotations_for_editing(self) -> AnnotationsMetadata:
+        # annotations returned by db are shared with other readers (cached)
+        d = await self.db.read_annotations(namespace=self.namespace, key=self.key)
+        return deepcopy(d)
+
+    def __save_annotations(self, d: AnnotationsMetadata):
         path = self.db._path_to_object(namespace=self.namespace, key=self.key)
         save_dict_to_json_file(d, ANNOTATION_METADATA_FILENAME, path)
+        self.db.metadata_cache.invalidate(
+            self.namespace, self.key, ANNOTATION_METADATA_FILENAME
+        )
+        self.db.keyword_index.update_entry(self.namespace, self.key, d)
+        self.db.entry_catalog.update_entry(self.namespace, self.key)
 
     def __enter__(self):
         return self
@@ -0,0 +1,176 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import numcodecs
+import numpy as np
+import zarr
+from cellstar_db.file_system.constants import DECODED_CHUNK_CACHE_MAX_BYTES
+from numcodecs.compat import ensure_ndarray
+
+# (entry token, store key of the chunk, i.e. array path + chunk index)
+DecodedChunkKey = tuple[Hashable, str]
+
+
+class DecodedChunkCache:
+    """
+    Byte-bounded LRU cache of decompressed (and unfiltered) zarr chunks,
+    shared by all entries read in a process
+    """
+
+    def __init__(self, max_bytes: int = DECODED_CHUNK_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._chunks: OrderedDict[DecodedChunkKey, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: DecodedChunkKey) -> Optional[np.ndarray]:
+        with self._lock:
+            chunk = self._chunks.get(key)
+            if chunk is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._chunks.move_to_end(key)
+            return chunk
+
+    def put(self, key: DecodedChunkKey, chunk: np.ndarray):
+        if chunk.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._chunks:
+                return
+            self._chunks[key] = chunk
+            self.current_bytes += chunk.nbytes
+            self._evict()
+
+    def set_max_bytes(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._chunks.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "chunks": len(self._chunks),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes:
+            _, chunk = self._chunks.popitem(last=False)
+            self.current_bytes -= chunk.nbytes
+            self.evictions += 1
+
+
+class DecodedChunkCacheStore(zarr.storage.Store):
+    """
+    Read-only zarr store wrapper that serves decoded chunks from DecodedChunkCache.
+    Array metadata is rewritten to have no compressor and no filters, chunks are
+    decoded here (once per cache entry) instead of by zarr.
+    Object arrays (e.g. set tables) and arrays with nested chunk keys are passed through
+    """
+
+    _writeable = False
+    _erasable = False
+
+    def __init__(
+        self,
+        store: zarr.storage.BaseStore,
+        cache: DecodedChunkCache,
+        entry_token: Hashable,
+    ):
+        self._store = store
+        self._cache = cache
+        self._entry_token = entry_token
+        # array path => (compressor, filters)
+        self._codecs: dict[str, tuple[Any, list[Any]]] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: str):
+        if key.endswith(".zarray"):
+            return self._get_array_metadata(key)
+
+        array_path, _, chunk_index = key.rpartition("/")
+        codecs = self._codecs.get(array_path)
+        if codecs is None or chunk_index.startswith("."):
+            return self._store[key]
+
+        cache_key = (self._entry_token, key)
+        chunk = self._cache.get(cache_key)
+        if chunk is None:
+            chunk = self._decode(self._store[key], *codecs)
+            self._cache.put(cache_key, chunk)
+        return chunk
+
+    def _get_array_metadata(self, key: str) -> bytes:
+        raw = self._store[key]
+        meta = json.loads(ensure_ndarray(raw).tobytes())
+        if meta["dtype"] == "|O" or meta.get("dimension_separator", ".") != ".":
+            return raw
+
+        array_path = key[: -len(".zarray")].rstrip("/")
+        compressor = (
+            numcodecs.get_codec(meta["compressor"])
+            if meta["compressor"] is not None
+            else None
+        )
+        filters = [numcodecs.get_codec(f) for f in meta["filters"] or []]
+        with self._lock:
+            self._codecs[array_path] = (compressor, filters)
+
+        meta["compressor"] = None
+        meta["filters"] = None
+        return json.dumps(meta).encode("ascii")
+
+    @staticmethod
+    def _decode(cdata, compressor, filters) -> np.ndarray:
+        chunk = compressor.decode(cdata) if compressor is not None else cdata
+        for f in reversed(filters):
+            chunk = f.decode(chunk)
+        # cached chunks are shared between requests
+        chunk = ensure_ndarray(chunk).reshape(-1).view(np.uint8)
+        chunk.flags.writeable = False
+        return chunk
+
+    def __contains__(self, key):
+        return key in self._store
+
+    def __iter__(self):
+        return iter(self._store)
+
+    def __len__(self):
+        return len(self._store)
+
+    def keys(self):
+        return self._store.keys()
+
+    def listdir(self, path: str = ""):
+        return zarr.storage.listdir(self._store, path)
+
+    def getsize(self, path=None):
+        return zarr.storage.getsize(self._store, path)
+
+    def __setitem__(self, key, value):
+        raise NotImplementedError
+
+    def __delitem__(self, key):
+        raise NotImplementedError
+
+    def close(self):
+        self._store.close()
+
+
+DECODED_CHUNK_CACHE = DecodedChunkCache()
@@ -2,6 +2,13 @@ QUANTIZATION_DATA_DICT_ATTR_NAME = "quantization_data_dict"
 LATTICE_SEGMENTATION_DATA_GROUPNAME = "lattice_segmentation_data"
 MESH_SEGMENTATION_DATA_GROUPNAME = "mesh_segmentation_data"
 VOLUME_DATA_GROUPNAME = "volume_data"
+# per-chunk (min, max) of volume data arrays, same hierarchy as VOLUME_DATA_GROUPNAME
+VOLUME_CHUNK_STATISTICS_GROUPNAME = "volume_chunk_statistics"
+# packed mesh list (detail lvl group of mesh segmentation): rows of
+# (mesh_id, first row of each array in PACKED_MESH_ARRAYS_ATTR_NAME order)
+PACKED_MESH_OFFSETS_ARRAY_NAME = "mesh_offsets"
+PACKED_MESH_ARRAYS_ATTR_NAME = "packed_mesh_arrays"
+PACKED_MESH_ATTRS_ATTR_NAME = "mesh_attrs"
 
 # TODO: the namespaces should NOT be hardcoded
 DB_NAMESPACES = ("emdb", "empiar")
@@ -13,6 +20,27 @@ ANNOTATION_METADATA_FILENAME = "annotations.json"
 GRID_METADATA_FILENAME = "metadata.json"
 GEOMETRIC_SEGMENTATION_FILENAME = "geometric_segmentation.json"
 GEOMETRIC_SEGMENTATIONS_ZATTRS = "geometric_segmentations"
+# SQLite keyword index, stored in the DB folder,
+# starts with "_" so it is not listed as a source
+KEYWORD_INDEX_FILENAME = "_keyword_index.sqlite"
+# SQLite catalog of entries, stored in the DB folder like KEYWORD_INDEX_FILENAME
+ENTRY_CATALOG_FILENAME = "_entry_catalog.sqlite"
+
+# max number of entry stores (open zip files) kept open by the read store pool
+MAX_OPEN_ENTRY_STORES = 64
+
+# max size of decompressed chunks kept in memory by the read store pool
+DECODED_CHUNK_CACHE_MAX_BYTES = 512 * 1024**2
+
+# shared chunk cache of the tensorstore read mode
+TENSORSTORE_CACHE_POOL_BYTES = 256 * 1024**2
+# max number of opened TensorStores (arrays) kept by the tensorstore read mode
+TENSORSTORE_MAX_OPEN_ARRAYS = 256
+
+# number of parsed metadata/annotations files kept in memory
+METADATA_CACHE_MAX_SIZE = 4096
+# seconds for which cached metadata/annotations are used without checking file mtime
+METADATA_CACHE_REVALIDATE_INTERVAL = 5.0
 
 DEFAULT_HOST = '0.0.0.0'  # 0.0.0.0 = localhost
 DEFAULT_PORT = '9000'
\ No newline at end of file
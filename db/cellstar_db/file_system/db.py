@@ -1,8 +1,11 @@
+import asyncio
 import json
 import os
 import shutil
 from argparse import ArgumentError
+from concurrent.futures import Executor
 from pathlib import Path
+from typing import Hashable, Iterable, Optional
 
 import zarr
 from cellstar_db.file_system.annotations_context import AnnnotationsEditContext
@@ -11,47 +14,87 @@ from cellstar_db.file_system.constants import (
     DB_NAMESPACES,
     GEOMETRIC_SEGMENTATION_FILENAME,
     GRID_METADATA_FILENAME,
+    VOLUME_CHUNK_STATISTICS_GROUPNAME,
     VOLUME_DATA_GROUPNAME,
     ZIP_STORE_DATA_ZIP_NAME,
 )
+from cellstar_db.file_system.entry_catalog import EntryCatalog
+from cellstar_db.file_system.keyword_index import KeywordIndex
+from cellstar_db.file_system.metadata_cache import EntryFileCache
 from cellstar_db.file_system.models import FileSystemVolumeMedatada
 from cellstar_db.file_system.read_context import FileSystemDBReadContext
+from cellstar_db.file_system.store_pool import ENTRY_STORE_POOL, EntryStorePool
 from cellstar_db.file_system.volume_and_segmentation_context import (
     VolumeAndSegmentationContext,
 )
-from cellstar_db.models import AnnotationsMetadata, Metadata, VolumeMetadata
+from cellstar_db.models import (
+    AnnotationsMetadata,
+    CatalogEntriesPage,
+    EntryDataKind,
+    Metadata,
+    VolumeMetadata,
+)
 from cellstar_db.protocol import DBReadContext, VolumeServerDB
+from cellstar_db.utils.executor import get_default_executor
+from cellstar_db.utils.files import file_signature
 
 
 class FileSystemVolumeServerDB(VolumeServerDB):
     async def list_sources(self) -> list[str]:
-        sources: list[str] = []
-        for file in os.listdir(self.folder):
-            d = os.path.join(self.folder, file)
-            if os.path.isdir(d):
-                if (
-                    file == "interface"
-                    or file == "implementations"
-                    or file.startswith("_")
-                ):
-                    continue
-
-                sources.append(str(file))
+        return await asyncio.to_thread(self.entry_catalog.list_sources)
 
-        return sources
+    def _is_source_dir(self, file: str) -> bool:
+        if not os.path.isdir(os.path.join(self.folder, file)):
+            return False
+        return not (
+            file == "interface" or file == "implementations" or file.startswith("_")
+        )
 
     async def list_entries(self, source: str, limit: int) -> list[str]:
-        entries: list[str] = []
-        source_path = os.path.join(self.folder, source)
-        for file in os.listdir(source_path):
-            entries.append(file)
-            limit -= 1
-            if limit == 0:
-                break
+        page = await self.list_catalog_entries(limit, source=source)
+        return [entry["entry_id"] for entry in page["entries"]]
+
+    async def list_catalog_entries(
+        self,
+        limit: int,
+        source: Optional[str] = None,
+        data_kinds: Iterable[EntryDataKind] = (),
+        entry_id_prefix: Optional[str] = None,
+        cursor: Optional[str] = None,
+    ) -> CatalogEntriesPage:
+        """
+        Returns page of entries from the entry catalog (see EntryCatalog.list_entries)
+        """
+        return await asyncio.to_thread(
+            self.entry_catalog.list_entries,
+            limit,
+            source=source,
+            data_kinds=data_kinds,
+            entry_id_prefix=entry_id_prefix,
+            cursor=cursor,
+        )
+
+    async def search_entries(
+        self, keyword: str, limit: int, offset: int = 0
+    ) -> dict[str, list[str]]:
+        """
+        Returns entries matching the keyword (see KeywordIndex) grouped by source,
+        entries are ordered by source and key, offset and limit are applied to that order
+        """
+        entries: dict[str, list[str]] = {}
+        for namespace, key in await asyncio.to_thread(
+            self.keyword_index.search, keyword, limit=limit, offset=offset
+        ):
+            entries.setdefault(namespace, []).append(key)
 
         return entries
 
-    def __init__(self, folder: Path, store_type: str = "zip"):
+    def __init__(
+        self,
+        folder: Path,
+        store_type: str = "zip",
+        executor: Optional[Executor] = None,
+    ):
         # either create of say it doesn't exist
         if not folder.is_dir():
             folder.mkdir(parents=True, exist_ok=True)
@@ -67,6 +110,12 @@ class FileSystemVolumeServerDB(VolumeServerDB):
             raise ArgumentError(f"store type is not supported: {store_type}")
 
         self.store_type = store_type
+        self.store_pool: EntryStorePool = ENTRY_STORE_POOL
+        self.metadata_cache = EntryFileCache()
+        self.keyword_index = KeywordIndex(self)
+        self.entry_catalog = EntryCatalog(self)
+        # executor for blocking reads (see FileSystemDBReadContext)
+        self.executor: Executor = executor or get_default_executor()
 
     def _path_to_object(self, namespace: str, key: str) -> Path:
         """
@@ -74,6 +123,29 @@ class FileSystemVolumeServerDB(VolumeServerDB):
         """
         return self.folder / namespace / key
 
+    def _store_pool_key(self, namespace: str, key: str) -> tuple[str, str, str]:
+        return (str(self.folder.resolve()), namespace, key)
+
+    def invalidate_entry(self, namespace: str, key: str):
+        """
+        Drops cached open stores and parsed files of the entry,
+        should be called after the entry is modified
+        """
+        self.store_pool.invalidate(self._store_pool_key(namespace, key))
+        self.metadata_cache.invalidate(namespace, key)
+
+    def entry_version(self, namespace: str, key: str) -> Hashable:
+        """
+        Returns value that changes when data or metadata of the entry is rewritten
+        (signatures of the files), used to invalidate cached responses
+        """
+        return (
+            file_signature(self.path_to_zarr_root_data(namespace, key)),
+            file_signature(
+                self._path_to_object(namespace, key) / GRID_METADATA_FILENAME
+            ),
+        )
+
     def path_to_zarr_root_data(self, namespace: str, key: str) -> Path:
         """
         Returns path to actual zarr structure root depending on store type
@@ -99,8 +171,11 @@ class FileSystemVolumeServerDB(VolumeServerDB):
         Removes entry
         """
         path = self._path_to_object(namespace=namespace, key=key)
+        self.invalidate_entry(namespace, key)
         if path.is_dir():
             shutil.rmtree(path, ignore_errors=True)
+            self.keyword_index.remove_entry(namespace, key)
+            self.entry_catalog.remove_entry(namespace, key)
         else:
             raise Exception(f"Entry path {path} does not exists or is not a dir")
 
@@ -110,6 +185,8 @@ class FileSystemVolumeServerDB(VolumeServerDB):
         used before another run of building db to build it from scratch without interfering with
         previously existing entries
         """
+        self.store_pool.clear()
+        self.metadata_cache.clear()
         for namespace in DB_NAMESPACES:
             content = sorted((self.folder / namespace).glob("*"))
             for path in content:
@@ -117,6 +194,8 @@ class FileSystemVolumeServerDB(VolumeServerDB):
                     path.unlink()
                 if path.is_dir():
                     shutil.rmtree(path, ignore_errors=True)
+        self.keyword_index.rebuild()
+        self.entry_catalog.rebuild()
 
     async def add_custom_annotations(
         self, namespace: str, key: str, temp_store_path: Path
@@ -139,6 +218,9 @@ class FileSystemVolumeServerDB(VolumeServerDB):
                 temp_store_path / ANNOTATION_METADATA_FILENAME,
                 self._path_to_object(namespace, key) / ANNOTATION_METADATA_FILENAME,
             )
+            self.metadata_cache.invalidate(namespace, key)
+            self.keyword_index.update_entry_from_db(namespace, key)
+            self.entry_catalog.update_entry(namespace, key)
         else:
             print("no annotation metadata file found, continuing without copying it")
 
@@ -154,6 +236,8 @@ class FileSystemVolumeServerDB(VolumeServerDB):
                 namespace=namespace,
                 key=key,
             )
+        self.metadata_cache.invalidate(namespace, key)
+        self.keyword_index.update_entry_from_db(namespace, key)
 
     def _store_entry_file(
         self, temp_store_path: Path, filename: str, namespace: str, key: str
@@ -193,6 +277,7 @@ class FileSystemVolumeServerDB(VolumeServerDB):
         # open zip store again for writing
         # copy_store from temp store to perm zip store
 
+        self.invalidate_entry(namespace, key)
         if self.store_type == "zip":
             existing_store = zarr.ZipStore(
                 path=str(self.path_to_zarr_root_data(namespace, key)),
@@ -210,6 +295,13 @@ class FileSystemVolumeServerDB(VolumeServerDB):
                 source_path=VOLUME_DATA_GROUPNAME,
                 dest_path=VOLUME_DATA_GROUPNAME,
             )
+            if VOLUME_CHUNK_STATISTICS_GROUPNAME in existing_root:
+                zarr.copy_store(
+                    source=existing_store,
+                    dest=temp_store,
+                    source_path=VOLUME_CHUNK_STATISTICS_GROUPNAME,
+                    dest_path=VOLUME_CHUNK_STATISTICS_GROUPNAME,
+                )
 
             existing_store.close()
 
@@ -239,6 +331,7 @@ class FileSystemVolumeServerDB(VolumeServerDB):
 
         if self.store_type == "zip":
             perm_store.close()
+        self.entry_catalog.update_entry(namespace, key)
 
         temp_store.rmdir()
         # TODO: check if copied and store closed properly
@@ -262,6 +355,7 @@ class FileSystemVolumeServerDB(VolumeServerDB):
         # WHAT NEEDS TO BE CHANGED
         # perm_store = zarr.ZipStore(self._path_to_object(namespace, key) + '.zip', mode='w', compression=12)
 
+        self.invalidate_entry(namespace, key)
         if self.store_type == "directory":
             perm_store = zarr.DirectoryStore(str(self._path_to_object(namespace, key)))
             zarr.copy_store(temp_store, perm_store)  # , log=stdout)
@@ -288,6 +382,7 @@ class FileSystemVolumeServerDB(VolumeServerDB):
 
         if self.store_type == "zip":
             perm_store.close()
+        self.entry_catalog.update_entry(namespace, key)
 
         temp_store.rmdir()
         # TODO: check if copied and store closed properly
@@ -310,17 +405,32 @@ class FileSystemVolumeServerDB(VolumeServerDB):
         path: Path = (
             self._path_to_object(namespace=namespace, key=key) / GRID_METADATA_FILENAME
         )
-        with open(path.resolve(), "r", encoding="utf-8") as f:
-            # reads into dict
-            read_json_of_metadata: Metadata = json.load(f)
-        return FileSystemVolumeMedatada(read_json_of_metadata)
+        return self.metadata_cache.get(
+            (namespace, key, GRID_METADATA_FILENAME), path, _load_metadata
+        )
 
     async def read_annotations(self, namespace: str, key: str) -> AnnotationsMetadata:
+        """
+        Returned dict is shared with other readers, copy it before modifying
+        """
         path: Path = (
             self._path_to_object(namespace=namespace, key=key)
             / ANNOTATION_METADATA_FILENAME
         )
-        with open(path.resolve(), "r", encoding="utf-8") as f:
-            # reads into dict
-            read_json_of_metadata: AnnotationsMetadata = json.load(f)
-        return read_json_of_metadata
+        return self.metadata_cache.get(
+            (namespace, key, ANNOTATION_METADATA_FILENAME), path, _load_annotations
+        )
+
+
+def _load_metadata(path: Path) -> FileSystemVolumeMedatada:
+    with open(path.resolve(), "r", encoding="utf-8") as f:
+        # reads into dict
+        read_json_of_metadata: Metadata = json.load(f)
+    return FileSystemVolumeMedatada(read_json_of_metadata)
+
+
+def _load_annotations(path: Path) -> AnnotationsMetadata:
+    with open(path.resolve(), "r", encoding="utf-8") as f:
+        # reads into dict
+        read_json_of_metadata: AnnotationsMetadata = json.load(f)
+    return read_json_of_metadata
@@ -0,0 +1,222 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Iterable, Optional
+
+from cellstar_db.file_system.constants import (
+    ENTRY_CATALOG_FILENAME,
+    GRID_METADATA_FILENAME,
+)
+from cellstar_db.file_system.sqlite_file import SQLiteFile
+from cellstar_db.models import CatalogEntriesPage, CatalogEntryData, EntryDataKind
+
+ENTRY_CATALOG_VERSION = 1
+
+# data kind => (metadata key, key of the list of ids)
+DATA_KINDS: dict[EntryDataKind, tuple[str, str]] = {
+    "volume": ("volumes", "channel_ids"),
+    "lattice_segmentation": ("segmentation_lattices", "segmentation_ids"),
+    "mesh_segmentation": ("segmentation_meshes", "segmentation_ids"),
+    "geometric_segmentation": ("geometric_segmentation", "segmentation_ids"),
+}
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS entries (
+    source TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    {", ".join(f"{kind} INTEGER NOT NULL" for kind in DATA_KINDS)},
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (source, entry_id)
+) WITHOUT ROWID
+"""
+
+_COLUMNS = ("source", "entry_id", "size", *DATA_KINDS, "created_at", "updated_at")
+
+
+def entry_data_kinds(metadata: Optional[dict]) -> list[EntryDataKind]:
+    """
+    Returns kinds of data listed in the entry metadata (GRID_METADATA_FILENAME)
+    """
+    if metadata is None:
+        return []
+    return [
+        kind
+        for kind, (metadata_key, ids_key) in DATA_KINDS.items()
+        if len((metadata.get(metadata_key) or {}).get(ids_key) or []) > 0
+    ]
+
+
+def encode_cursor(source: str, entry_id: str) -> str:
+    return f"{source}/{entry_id}"
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    source, sep, entry_id = cursor.partition("/")
+    if not sep or not source:
+        raise ValueError(f"invalid cursor: {cursor}")
+    return source, entry_id
+
+
+class EntryCatalog(SQLiteFile):
+    """
+    Persistent catalog of DB entries (source, entry id, size of files,
+    available data kinds, creation and modification time) stored in
+    SQLite database ENTRY_CATALOG_FILENAME in the DB folder.
+    Built from the DB on first use if the file does not exist, updated
+    when an entry is stored, edited or deleted, so that entries can be listed
+    without walking the DB folder.
+    The file can be shared by several processes (server workers, preprocessor)
+    """
+
+    def __init__(self, db):
+        super().__init__(db.folder / ENTRY_CATALOG_FILENAME, ENTRY_CATALOG_VERSION)
+        self.db = db
+
+    def list_sources(self) -> list[str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT source FROM entries ORDER BY source"
+            ).fetchall()
+        return [source for (source,) in rows]
+
+    def list_entries(
+        self,
+        limit: int,
+        source: Optional[str] = None,
+        data_kinds: Iterable[EntryDataKind] = (),
+        entry_id_prefix: Optional[str] = None,
+        cursor: Optional[str] = None,
+    ) -> CatalogEntriesPage:
+        """
+        Returns page of at most limit entries ordered by source and entry id,
+        optionally only of the given source, with all of data_kinds available
+        and entry id starting with entry_id_prefix.
+        cursor is next_cursor of the previous page
+        """
+        conditions: list[str] = []
+        params: list = []
+        if source is not None:
+            conditions.append("source = ?")
+            params.append(source)
+        for kind in set(data_kinds):
+            if kind not in DATA_KINDS:
+                raise ValueError(f"unknown data kind: {kind}")
+            conditions.append(f"{kind} = 1")
+        if entry_id_prefix:
+            conditions.append("substr(entry_id, 1, ?) = ?")
+            params.extend((len(entry_id_prefix), entry_id_prefix))
+        if cursor is not None:
+            conditions.append("(source, entry_id) > (?, ?)")
+            params.extend(decode_cursor(cursor))
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # one more row to find out if there is a next page
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM entries {where} "
+                "ORDER BY source, entry_id LIMIT ?",
+                (*params, max(limit, 0) + 1),
+            ).fetchall()
+
+        entries = [self._entry_data(row) for row in rows[: max(limit, 0)]]
+        next_cursor = None
+        if len(rows) > len(entries) and len(entries) > 0:
+            next_cursor = encode_cursor(entries[-1]["source"], entries[-1]["entry_id"])
+        return CatalogEntriesPage(entries=entries, next_cursor=next_cursor)
+
+    def get_entry(self, namespace: str, key: str) -> Optional[CatalogEntryData]:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM entries "
+                "WHERE source = ? AND entry_id = ?",
+                (namespace, key),
+            ).fetchone()
+        return self._entry_data(row) if row is not None else None
+
+    def update_entry(self, namespace: str, key: str):
+        """
+        Records current state of the entry files, should be called
+        after the entry is stored or modified
+        """
+        row = self._scan_entry(namespace, key, time.time())
+        with self._connect() as conn:
+            self._upsert(conn, [row])
+
+    def remove_entry(self, namespace: str, key: str):
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM entries WHERE source = ? AND entry_id = ?",
+                (namespace, key),
+            )
+
+    def rebuild(self):
+        """
+        Re-creates the catalog from all entries in the DB
+        """
+        with self._lock:
+            rows = []
+            for namespace in sorted(os.listdir(self.db.folder)):
+                if not self.db._is_source_dir(namespace):
+                    continue
+                for key in sorted(os.listdir(self.db.folder / namespace)):
+                    if not (self.db.folder / namespace / key).is_dir():
+                        continue
+                    path = self.db._path_to_object(namespace, key)
+                    rows.append(self._scan_entry(namespace, key, path.stat().st_mtime))
+
+            def fill(conn: sqlite3.Connection):
+                conn.execute("DROP TABLE IF EXISTS entries")
+                conn.execute(_SCHEMA)
+                self._upsert(conn, rows)
+
+            self._replace(fill)
+
+    def _scan_entry(self, namespace: str, key: str, timestamp: float) -> tuple:
+        path = self.db._path_to_object(namespace, key)
+        size = 0
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                try:
+                    size += os.stat(os.path.join(dirpath, filename)).st_size
+                except FileNotFoundError:
+                    pass
+
+        metadata = None
+        if (path / GRID_METADATA_FILENAME).exists():
+            with open(path / GRID_METADATA_FILENAME, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+        kinds = entry_data_kinds(metadata)
+
+        return (
+            namespace,
+            key,
+            size,
+            *(int(kind in kinds) for kind in DATA_KINDS),
+            timestamp,
+            timestamp,
+        )
+
+    def _upsert(self, conn: sqlite3.Connection, rows: list[tuple]):
+        # created_at of existing entries is kept
+        updated_columns = [c for c in _COLUMNS[2:] if c != "created_at"]
+        conn.executemany(
+            f"INSERT INTO entries ({', '.join(_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in _COLUMNS)}) "
+            "ON CONFLICT (source, entry_id) DO UPDATE SET "
+            + ", ".join(f"{c} = excluded.{c}" for c in updated_columns),
+            rows,
+        )
+
+    def _entry_data(self, row: tuple) -> CatalogEntryData:
+        d = dict(zip(_COLUMNS, row))
+        return CatalogEntryData(
+            source=d["source"],
+            entry_id=d["entry_id"],
+            size=d["size"],
+            data_kinds=[kind for kind in DATA_KINDS if d[kind]],
+            created_at=d["created_at"],
+            updated_at=d["updated_at"],
+        )
@@ -0,0 +1,160 @@
+import json
+import os
+import re
+import sqlite3
+from typing import Any, Optional
+
+from cellstar_db.file_system.constants import (
+    ANNOTATION_METADATA_FILENAME,
+    KEYWORD_INDEX_FILENAME,
+)
+from cellstar_db.file_system.sqlite_file import SQLiteFile
+from cellstar_db.models import AnnotationsMetadata
+
+KEYWORD_INDEX_VERSION = 2
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS postings (
+    token TEXT NOT NULL,
+    source TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    PRIMARY KEY (token, source, entry_id)
+) WITHOUT ROWID
+"""
+_ENTRY_INDEX = (
+    "CREATE INDEX IF NOT EXISTS postings_entry ON postings (source, entry_id)"
+)
+# greater than any character, tokens starting with a prefix are
+# in the range [prefix, prefix + _MAX_CHAR)
+_MAX_CHAR = "\U0010ffff"
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _collect_tokens(value: Any, tokens: set[str]):
+    # walks string and integer values of annotations (names, descriptions,
+    # external references, segment annotations), dict keys are not indexed
+    if isinstance(value, str):
+        tokens.update(tokenize(value))
+    elif isinstance(value, bool) or value is None or isinstance(value, float):
+        return
+    elif isinstance(value, int):
+        tokens.add(str(value))
+    elif isinstance(value, dict):
+        for v in value.values():
+            _collect_tokens(v, tokens)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            _collect_tokens(v, tokens)
+
+
+def entry_tokens(key: str, annotations: Optional[AnnotationsMetadata]) -> list[str]:
+    tokens: set[str] = set(tokenize(key))
+    tokens.add(key.lower())
+    if annotations is not None:
+        _collect_tokens(annotations, tokens)
+    return sorted(tokens)
+
+
+class KeywordIndex(SQLiteFile):
+    """
+    Persistent inverted index (token => entries) over entry ids and annotations,
+    stored in SQLite database KEYWORD_INDEX_FILENAME in the DB folder.
+    Built from the DB on first use if the file does not exist, updated
+    incrementally (only postings of the entry) when an entry or its annotations
+    are written. The file can be shared by several processes (server workers,
+    preprocessor), updates are transactions of SQLite.
+    Keyword search matches entries for which each token of the keyword
+    is a prefix of some token of the entry
+    """
+
+    def __init__(self, db):
+        super().__init__(db.folder / KEYWORD_INDEX_FILENAME, KEYWORD_INDEX_VERSION)
+        self.db = db
+
+    def search(
+        self, keyword: str, limit: Optional[int] = None, offset: int = 0
+    ) -> list[tuple[str, str]]:
+        """
+        Returns (namespace, key) of matching entries sorted by namespace and key,
+        at most limit of them (all if None) after skipping offset of them
+        """
+        query_tokens = sorted(set(tokenize(keyword)))
+        if len(query_tokens) == 0:
+            return []
+
+        query = " INTERSECT ".join(
+            "SELECT source, entry_id FROM postings WHERE token >= ? AND token < ?"
+            for _ in query_tokens
+        )
+        params = [p for token in query_tokens for p in (token, token + _MAX_CHAR)]
+        # LIMIT -1 is no limit in SQLite
+        params.extend((-1 if limit is None else max(limit, 0), max(offset, 0)))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"{query} ORDER BY source, entry_id LIMIT ? OFFSET ?", params
+            ).fetchall()
+        return [(namespace, key) for namespace, key in rows]
+
+    def update_entry(
+        self, namespace: str, key: str, annotations: Optional[AnnotationsMetadata]
+    ):
+        tokens = entry_tokens(key, annotations)
+        with self._connect() as conn:
+            self._remove(conn, namespace, key)
+            self._add(conn, namespace, key, tokens)
+
+    def update_entry_from_db(self, namespace: str, key: str):
+        self.update_entry(namespace, key, self._read_annotations(namespace, key))
+
+    def remove_entry(self, namespace: str, key: str):
+        with self._connect() as conn:
+            self._remove(conn, namespace, key)
+
+    def rebuild(self):
+        """
+        Re-creates the index from all entries in the DB
+        """
+        with self._lock:
+            entries = []
+            for namespace in sorted(os.listdir(self.db.folder)):
+                if not self.db._is_source_dir(namespace):
+                    continue
+                for key in sorted(os.listdir(self.db.folder / namespace)):
+                    if not (self.db.folder / namespace / key).is_dir():
+                        continue
+                    annotations = self._read_annotations(namespace, key)
+                    entries.append((namespace, key, entry_tokens(key, annotations)))
+
+            def fill(conn: sqlite3.Connection):
+                conn.execute("DROP TABLE IF EXISTS postings")
+                conn.execute(_SCHEMA)
+                conn.execute(_ENTRY_INDEX)
+                for namespace, key, tokens in entries:
+                    self._add(conn, namespace, key, tokens)
+
+            self._replace(fill)
+
+    def _read_annotations(
+        self, namespace: str, key: str
+    ) -> Optional[AnnotationsMetadata]:
+        path = self.db._path_to_object(namespace, key) / ANNOTATION_METADATA_FILENAME
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _add(self, conn: sqlite3.Connection, namespace: str, key: str, tokens):
+        conn.executemany(
+            "INSERT OR IGNORE INTO postings (token, source, entry_id) VALUES (?, ?, ?)",
+            ((token, namespace, key) for token in tokens),
+        )
+
+    def _remove(self, conn: sqlite3.Connection, namespace: str, key: str):
+        conn.execute(
+            "DELETE FROM postings WHERE source = ? AND entry_id = ?", (namespace, key)
+        )
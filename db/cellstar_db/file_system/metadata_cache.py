@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from time import monotonic
+from typing import Any, Callable, Optional, Tuple
+
+from cellstar_db.file_system.constants import (
+    METADATA_CACHE_MAX_SIZE,
+    METADATA_CACHE_REVALIDATE_INTERVAL,
+)
+from cellstar_db.utils.files import file_signature
+
+# (namespace, key, filename)
+EntryFileCacheKey = Tuple[str, str, str]
+
+
+class _CachedEntryFile:
+    def __init__(self, value: Any, signature: Optional[Tuple[int, int, int]]):
+        self.value = value
+        self.signature = signature
+        self.checked_at = monotonic()
+
+
+class EntryFileCache:
+    """
+    Bounded LRU cache of parsed entry files (metadata.json, annotations.json).
+    Cached values are shared between callers and must not be modified in place.
+    The mtime of the file is checked at most once per revalidate_interval seconds,
+    writes done in this process invalidate the entry explicitly
+    """
+
+    def __init__(
+        self,
+        max_size: int = METADATA_CACHE_MAX_SIZE,
+        revalidate_interval: float = METADATA_CACHE_REVALIDATE_INTERVAL,
+    ):
+        self.max_size = max_size
+        self.revalidate_interval = revalidate_interval
+        self._entries: OrderedDict[EntryFileCacheKey, _CachedEntryFile] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(
+        self, cache_key: EntryFileCacheKey, path: Path, load: Callable[[Path], Any]
+    ) -> Any:
+        with self._lock:
+            cached = self._entries.get(cache_key)
+            if cached is not None:
+                self._entries.move_to_end(cache_key)
+                if monotonic() - cached.checked_at < self.revalidate_interval:
+                    return cached.value
+
+        signature = file_signature(path)
+        if cached is not None and signature is not None:
+            if cached.signature == signature:
+                cached.checked_at = monotonic()
+                return cached.value
+
+        # signature is taken before loading, so a write in between is picked up
+        # by the next revalidation
+        value = load(path)
+        with self._lock:
+            self._entries[cache_key] = _CachedEntryFile(value, signature)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, namespace: str, key: str, filename: Optional[str] = None):
+        """
+        Drops cached files of an entry (all of them if filename is None)
+        """
+        with self._lock:
+            for cache_key in list(self._entries.keys()):
+                if cache_key[0] == namespace and cache_key[1] == key:
+                    if filename is None or cache_key[2] == filename:
+                        del self._entries[cache_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,205 @@
+import os
+from typing import Optional
+
+import numpy as np
+import zarr
+from cellstar_db.file_system.constants import (
+    MESH_SEGMENTATION_DATA_GROUPNAME,
+    PACKED_MESH_ARRAYS_ATTR_NAME,
+    PACKED_MESH_ATTRS_ATTR_NAME,
+    PACKED_MESH_OFFSETS_ARRAY_NAME,
+)
+from cellstar_db.models import MeshData, MeshesData
+from cellstar_db.protocol import VolumeServerDB
+
+# Mesh list (detail lvl group) can be stored in two layouts:
+# - legacy: group per mesh ({mesh_id}/vertices, {mesh_id}/triangles, ...),
+#   as written by the preprocessor to the intermediate zarr structure
+# - packed: arrays of all meshes concatenated into a single buffer each
+#   (vertices, triangles, normals) + PACKED_MESH_OFFSETS_ARRAY_NAME table,
+#   each stored as a single chunk, so that the whole list is read at once.
+#   Triangles keep vertex indices local to their mesh
+
+
+def is_packed_mesh_list(mesh_list_group: zarr.Group) -> bool:
+    return PACKED_MESH_OFFSETS_ARRAY_NAME in mesh_list_group
+
+
+def read_mesh_list(mesh_list_group: zarr.Group) -> MeshesData:
+    if is_packed_mesh_list(mesh_list_group):
+        return read_packed_mesh_list(mesh_list_group)
+    return _read_legacy_mesh_list(mesh_list_group)
+
+
+def read_packed_mesh_list(mesh_list_group: zarr.Group) -> MeshesData:
+    array_names: list[str] = mesh_list_group.attrs[PACKED_MESH_ARRAYS_ATTR_NAME]
+    offsets: np.ndarray = mesh_list_group[PACKED_MESH_OFFSETS_ARRAY_NAME][...]
+
+    # meshes are views of the buffers
+    arrays_per_mesh = [
+        np.split(mesh_list_group[name][...], offsets[1:, i + 1])
+        for i, name in enumerate(array_names)
+    ]
+    return [
+        MeshData(mesh_id=mesh_id, **dict(zip(array_names, arrays)))
+        for mesh_id, *arrays in zip(offsets[:, 0].tolist(), *arrays_per_mesh)
+    ]
+
+
+def _read_legacy_mesh_list(mesh_list_group: zarr.Group) -> MeshesData:
+    mesh_list: MeshesData = []
+    for mesh_name, mesh in mesh_list_group.groups():
+        mesh_data: MeshData = {"mesh_id": int(mesh_name)}
+        for mesh_component_name, mesh_component_arr in mesh.arrays():
+            mesh_data[f"{mesh_component_name}"] = mesh_component_arr[...]
+        assert "vertices" in mesh_data
+        assert "triangles" in mesh_data
+        mesh_list.append(mesh_data)
+    return mesh_list
+
+
+def _read_mesh_list_attrs(mesh_list_group: zarr.Group) -> dict[str, dict]:
+    """
+    Returns attrs of single meshes (e.g. num_vertices, area) by mesh_id
+    """
+    if is_packed_mesh_list(mesh_list_group):
+        return mesh_list_group.attrs.get(PACKED_MESH_ATTRS_ATTR_NAME, {})
+    return {
+        mesh_name: mesh.attrs.asdict()
+        for mesh_name, mesh in mesh_list_group.groups()
+        if len(mesh.attrs) > 0
+    }
+
+
+def write_packed_mesh_list(
+    mesh_list_group: zarr.Group,
+    meshes: MeshesData,
+    mesh_attrs: Optional[dict[str, dict]] = None,
+):
+    """
+    Writes meshes to the (empty) detail lvl group in the packed layout
+    """
+    # arrays that all meshes have, normals are optional
+    array_names = [
+        name
+        for name in ("vertices", "triangles", "normals")
+        if meshes and all(name in m for m in meshes)
+    ]
+
+    counts = np.array(
+        [[len(m[name]) for name in array_names] for m in meshes], dtype=np.int64
+    ).reshape(len(meshes), len(array_names))
+    offsets = np.empty((len(meshes), len(array_names) + 1), dtype=np.int64)
+    offsets[:, 0] = [m["mesh_id"] for m in meshes]
+    offsets[:, 1:] = np.cumsum(counts, axis=0) - counts
+
+    for name in array_names:
+        buffer = np.concatenate([m[name] for m in meshes])
+        _create_single_chunk_dataset(mesh_list_group, name, buffer)
+    _create_single_chunk_dataset(
+        mesh_list_group, PACKED_MESH_OFFSETS_ARRAY_NAME, offsets
+    )
+
+    attrs = {PACKED_MESH_ARRAYS_ATTR_NAME: array_names}
+    if mesh_attrs:
+        attrs[PACKED_MESH_ATTRS_ATTR_NAME] = mesh_attrs
+    mesh_list_group.attrs.put(attrs)
+
+
+def _create_single_chunk_dataset(group: zarr.Group, name: str, data: np.ndarray):
+    # zarr does not support zero-length chunks
+    chunks = (max(len(data), 1),) + data.shape[1:]
+    group.create_dataset(name, data=data, chunks=chunks)
+
+
+def pack_mesh_segmentation(source: zarr.Group, dest: zarr.Group):
+    """
+    Writes mesh segmentation (timeframes => segment ids => detail lvls => meshes)
+    from source group (legacy or packed layout) to the (empty) dest group
+    in the packed layout
+    """
+    _copy_attrs(source, dest)
+    for time, timeframe_gr in source.groups():
+        dest_timeframe_gr = dest.create_group(time)
+        _copy_attrs(timeframe_gr, dest_timeframe_gr)
+        for segment_id, segment_gr in timeframe_gr.groups():
+            dest_segment_gr = dest_timeframe_gr.create_group(segment_id)
+            _copy_attrs(segment_gr, dest_segment_gr)
+            for detail_lvl, mesh_list_gr in segment_gr.groups():
+                write_packed_mesh_list(
+                    dest_segment_gr.create_group(detail_lvl),
+                    read_mesh_list(mesh_list_gr),
+                    _read_mesh_list_attrs(mesh_list_gr),
+                )
+
+
+def _copy_attrs(source: zarr.Group, dest: zarr.Group):
+    if len(source.attrs) > 0:
+        dest.attrs.put(source.attrs.asdict())
+
+
+def _has_legacy_mesh_lists(mesh_segmentations_gr: zarr.Group) -> bool:
+    for _, segmentation_gr in mesh_segmentations_gr.groups():
+        for _, timeframe_gr in segmentation_gr.groups():
+            for _, segment_gr in timeframe_gr.groups():
+                for _, mesh_list_gr in segment_gr.groups():
+                    if not is_packed_mesh_list(mesh_list_gr):
+                        return True
+    return False
+
+
+def pack_entry_meshes(db: VolumeServerDB, namespace: str, key: str) -> bool:
+    """
+    Converts mesh segmentations of existing DB entry to the packed layout.
+    Data file of the entry is rewritten to a new file which then replaces it,
+    so that readers never see partially converted entry.
+    Returns False if there was nothing to convert
+    """
+    if db.store_type != "zip":
+        raise ValueError(f"store type is not supported: {db.store_type}")
+
+    path = db.path_to_zarr_root_data(namespace, key)
+    if not path.exists():
+        return False
+    packed_path = path.with_name(f"{path.name}.packed")
+    source_store = zarr.ZipStore(
+        path=str(path), compression=0, allowZip64=True, mode="r"
+    )
+    try:
+        source_root = zarr.group(source_store)
+        if MESH_SEGMENTATION_DATA_GROUPNAME not in source_root or (
+            not _has_legacy_mesh_lists(source_root[MESH_SEGMENTATION_DATA_GROUPNAME])
+        ):
+            return False
+
+        dest_store = zarr.ZipStore(
+            path=str(packed_path), compression=0, allowZip64=True, mode="w"
+        )
+        try:
+            zarr.copy_store(
+                source_store,
+                dest_store,
+                excludes=[f"^{MESH_SEGMENTATION_DATA_GROUPNAME}/"],
+            )
+            mesh_segmentations_gr = source_root[MESH_SEGMENTATION_DATA_GROUPNAME]
+            dest_mesh_segmentations_gr = zarr.group(dest_store).create_group(
+                MESH_SEGMENTATION_DATA_GROUPNAME
+            )
+            _copy_attrs(mesh_segmentations_gr, dest_mesh_segmentations_gr)
+            for segmentation_id, segmentation_gr in mesh_segmentations_gr.groups():
+                pack_mesh_segmentation(
+                    segmentation_gr,
+                    dest_mesh_segmentations_gr.create_group(segmentation_id),
+                )
+        except Exception:
+            dest_store.close()
+            packed_path.unlink()
+            raise
+        dest_store.close()
+    finally:
+        source_store.close()
+
+    os.replace(packed_path, path)
+    db.invalidate_entry(namespace, key)
+    db.entry_catalog.update_entry(namespace, key)
+    return True
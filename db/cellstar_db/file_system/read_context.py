@@ -1,33 +1,46 @@
+import asyncio
 import json
 import logging
 from pathlib import Path
 from timeit import default_timer as timer
-from typing import Tuple, Union
+from typing import Optional, Tuple
 
 import dask.array as da
 import numpy as np
-import tensorstore as ts
 import zarr
 from cellstar_db.file_system.constants import (
     GEOMETRIC_SEGMENTATION_FILENAME,
     LATTICE_SEGMENTATION_DATA_GROUPNAME,
     MESH_SEGMENTATION_DATA_GROUPNAME,
     QUANTIZATION_DATA_DICT_ATTR_NAME,
+    VOLUME_CHUNK_STATISTICS_GROUPNAME,
     VOLUME_DATA_GROUPNAME,
 )
+from cellstar_db.file_system.packed_meshes import read_mesh_list
+from cellstar_db.file_system.store_pool import PooledEntryStore
+from cellstar_db.file_system.tensorstore_arrays import get_tensorstore_arrays
 from cellstar_db.models import (
+    ChunkGrid,
+    ChunkGridsData,
     GeometricSegmentationData,
-    MeshData,
+    GeometricSegmentationJson,
     MeshesData,
+    ShapePrimitiveData,
     VolumeSliceData,
 )
 from cellstar_db.protocol import DBReadContext, VolumeServerDB
 from cellstar_db.utils.box import normalize_box
-from cellstar_db.utils.quantization import decode_quantized_data
+from cellstar_db.utils.executor import is_process_executor, run_in_executor
+from cellstar_db.utils.quantization import decode_quantized_data_lut
 from fastapi import HTTPException
 
 
 class FileSystemDBReadContext(DBReadContext):
+    """
+    Read methods do blocking zarr I/O and decoding on db.executor (thread or process pool),
+    so that the event loop is not blocked
+    """
+
     async def read_slice(
         self,
         down_sampling_ratio: int,
@@ -37,112 +50,158 @@ class FileSystemDBReadContext(DBReadContext):
         mode: str = "dask",
         timer_printout=False,
         lattice_id: str = "0",
+        decode_quantized: bool = True,
     ) -> VolumeSliceData:
         """
         Reads a slice from a specific (down)sampling of segmentation and volume data
         from specific entry from DB based on key (e.g. EMD-1111), lattice_id (e.g. 0),
         downsampling ratio (1 => original data, 2 => downsampled by factor of 2 etc.),
-        and slice box (vec3, vec3)
+        and slice box (vec3, vec3).
+        Volume (including decoding of quantized data) and segmentation are read concurrently
         """
-        try:
-            box = normalize_box(box)
-
-            root: zarr.Group = zarr.group(self.store)
-
-            segm_arr = None
-            segm_dict = None
-            if LATTICE_SEGMENTATION_DATA_GROUPNAME in root and (lattice_id is not None):
-                segm_arr = root[LATTICE_SEGMENTATION_DATA_GROUPNAME][lattice_id][
-                    down_sampling_ratio
-                ][time].grid
-                assert (
-                    np.array(box[1]) <= np.array(segm_arr.shape)
-                ).all(), f"requested box {box} does not correspond to arr dimensions"
-                segm_dict = root[LATTICE_SEGMENTATION_DATA_GROUPNAME][lattice_id][
-                    down_sampling_ratio
-                ][time].set_table[0]
-            else:
-                raise HTTPException(
-                    status_code=404,
-                    detail="No segmentation data is available for the the given entry or lattice_id is None",
-                )
-
-            if VOLUME_DATA_GROUPNAME in root and (down_sampling_ratio is not None):
-                volume_arr: zarr.core.Array = root[VOLUME_DATA_GROUPNAME][
-                    down_sampling_ratio
-                ][time][channel_id]
-            else:
-                raise HTTPException(
-                    status_code=404,
-                    detail="No volume data is available for the the given entry or down_sampling_ratio is None",
-                )
+        volume, segmentation = await asyncio.gather(
+            self.read_volume_slice(
+                down_sampling_ratio=down_sampling_ratio,
+                box=box,
+                channel_id=channel_id,
+                time=time,
+                mode=mode,
+                timer_printout=timer_printout,
+                decode_quantized=decode_quantized,
+            ),
+            self.read_segmentation_slice(
+                lattice_id=lattice_id,
+                down_sampling_ratio=down_sampling_ratio,
+                box=box,
+                time=time,
+                mode=mode,
+                timer_printout=timer_printout,
+            ),
+            return_exceptions=True,
+        )
+        # missing segmentation is reported first, as when the reads were sequential
+        for result in (segmentation, volume):
+            if isinstance(result, BaseException):
+                raise result
+
+        result: VolumeSliceData = {
+            "segmentation_slice": segmentation["segmentation_slice"],
+            "volume_slice": volume["volume_slice"],
+            "time": time,
+            "channel_id": channel_id,
+        }
+        for k in ("volume_quantization", "volume_value_range"):
+            if k in volume:
+                result[k] = volume[k]
+        return result
 
-            assert (
-                np.array(box[0]) >= np.array([0, 0, 0])
-            ).all(), f"requested box {box} does not correspond to arr dimensions"
-            assert (
-                np.array(box[1]) <= np.array(volume_arr.shape)
-            ).all(), f"requested box {box} does not correspond to arr dimensions"
+    async def read_meshes(
+        self, segmentation_id: str, time: int, segment_id: int, detail_lvl: int
+    ) -> MeshesData:
+        return await self._run(
+            "_read_meshes",
+            segmentation_id=segmentation_id,
+            time=time,
+            segment_id=segment_id,
+            detail_lvl=detail_lvl,
+        )
 
-            segm_slice: np.ndarray
-            volume_slice: np.ndarray
+    async def read_geometric_segmentation(
+        self, segmentation_id: str, time: int
+    ) -> GeometricSegmentationData:
+        return await self._run(
+            "_read_geometric_segmentation", segmentation_id=segmentation_id, time=time
+        )
 
-            start = timer()
-            volume_slice = self._do_slicing(arr=volume_arr, box=box, mode=mode)
-            if segm_arr:
-                segm_slice = self._do_slicing(arr=segm_arr, box=box, mode=mode)
-            end = timer()
+    async def read_volume_slice(
+        self,
+        down_sampling_ratio: int,
+        box: Tuple[Tuple[int, int, int], Tuple[int, int, int]],
+        channel_id: str,
+        time: int,
+        mode: str = "dask",
+        timer_printout=False,
+        decode_quantized: bool = True,
+    ) -> VolumeSliceData:
+        return await self._run(
+            "_read_volume_slice",
+            down_sampling_ratio=down_sampling_ratio,
+            box=box,
+            channel_id=channel_id,
+            time=time,
+            mode=mode,
+            timer_printout=timer_printout,
+            decode_quantized=decode_quantized,
+        )
 
-            # check if volume_arr was originally quantized data (e.g. some attr on array, e.g. data_dict attr with data_dict)
-            # if yes, decode volume_slice (reassamble data dict from data_dict attr, just add 'data' key with volume_slice)
-            # do .compute on output of decode_quantized_data function if output is da.Array
+    async def read_segmentation_slice(
+        self,
+        lattice_id: str,
+        down_sampling_ratio: int,
+        box: Tuple[Tuple[int, int, int], Tuple[int, int, int]],
+        time: int,
+        mode: str = "dask",
+        timer_printout=False,
+    ) -> VolumeSliceData:
+        return await self._run(
+            "_read_segmentation_slice",
+            lattice_id=lattice_id,
+            down_sampling_ratio=down_sampling_ratio,
+            box=box,
+            time=time,
+            mode=mode,
+            timer_printout=timer_printout,
+        )
 
-            if QUANTIZATION_DATA_DICT_ATTR_NAME in volume_arr.attrs:
-                data_dict = volume_arr.attrs[QUANTIZATION_DATA_DICT_ATTR_NAME]
-                data_dict["data"] = volume_slice
-                volume_slice = decode_quantized_data(data_dict)
-                if isinstance(volume_slice, da.Array):
-                    volume_slice = volume_slice.compute()
+    async def read_volume_value_range(
+        self,
+        down_sampling_ratio: int,
+        box: Tuple[Tuple[int, int, int], Tuple[int, int, int]],
+        channel_id: str,
+        time: int,
+    ) -> Optional[Tuple[float, float]]:
+        return await self._run(
+            "_read_volume_box_value_range",
+            down_sampling_ratio=down_sampling_ratio,
+            box=box,
+            channel_id=channel_id,
+            time=time,
+        )
 
-            if timer_printout == True:
-                print(f"read_slice with mode {mode}: {end - start}")
-            if segm_arr:
-                d = {
-                    "segmentation_slice": {
-                        "category_set_ids": segm_slice,
-                        "category_set_dict": segm_dict,
-                        "lattice_id": lattice_id,
-                    },
-                    "volume_slice": volume_slice,
-                    "time": time,
-                    "channel_id": channel_id,
-                }
-            else:
-                d = {
-                    "segmentation_slice": {
-                        "category_set_ids": None,
-                        "category_set_dict": None,
-                        "lattice_id": lattice_id,
-                    },
-                    "volume_slice": volume_slice,
-                    "time": time,
-                    "channel_id": channel_id,
-                }
-        except Exception as e:
-            logging.error(e, stack_info=True, exc_info=True)
-            raise e
+    async def read_chunk_grids(self) -> ChunkGridsData:
+        return await self._run("_read_chunk_grids")
+
+    async def _run(self, method_name: str, **kwargs):
+        executor = self.db.executor
+        if is_process_executor(executor):
+            # read context (open store) cannot be sent to another process,
+            # the worker opens the entry on its own
+            result = await run_in_executor(
+                executor,
+                _read_in_worker,
+                self.db.folder,
+                self.db.store_type,
+                self.namespace,
+                self.key,
+                method_name,
+                kwargs,
+            )
+            if isinstance(result, _WorkerHTTPError):
+                raise HTTPException(
+                    status_code=result.status_code, detail=result.detail
+                )
+            return result
 
-        return d
+        return await run_in_executor(executor, getattr(self, method_name), **kwargs)
 
-    async def read_meshes(
+    def _read_meshes(
         self, segmentation_id: str, time: int, segment_id: int, detail_lvl: int
     ) -> MeshesData:
         """
         Returns list of meshes for a given segment, entry, detail lvl
         """
         try:
-            mesh_list: MeshesData = []
-            root: zarr.Group = zarr.group(self.store)
+            root: zarr.Group = self.root
 
             # # segmentation_id => timeframe => segment_id => detail_lvl => mesh_id in meshlist
             # mesh_segmentation_data: list[str, dict[int, list[dict[int, list[dict[int, list[dict[int, SingleMeshSegmentationData]]]]]]]]
@@ -150,41 +209,38 @@ class FileSystemDBReadContext(DBReadContext):
                 time
             ][segment_id][detail_lvl]
 
-            for mesh_name, mesh in mesh_list_group.groups():
-                mesh_data: MeshData = {"mesh_id": int(mesh_name)}
-                for mesh_component_name, mesh_component_arr in mesh.arrays():
-                    mesh_data[f"{mesh_component_name}"] = mesh_component_arr[...]
-                assert "vertices" in mesh_data
-                assert "triangles" in mesh_data
-                mesh_list.append(mesh_data)
+            mesh_list: MeshesData = read_mesh_list(mesh_list_group)
         except Exception as e:
             logging.error(e, stack_info=True, exc_info=True)
             raise e
 
         return mesh_list
 
-    async def read_geometric_segmentation(
+    def _read_geometric_segmentation(
         self, segmentation_id: str, time: int
     ) -> GeometricSegmentationData:
+        """
+        Returned data is shared with other readers, copy it before modifying
+        """
         try:
-            # GeometricSegmentationJson = list[GeometricSegmentationData]
-            path: Path = Path(self.store.path).parent / GEOMETRIC_SEGMENTATION_FILENAME
-            with open(path.resolve(), "r", encoding="utf-8") as f:
-                # reads into dict
-                read_json: list[GeometricSegmentationData] = json.load(f)
-                filter_results = list(
-                    filter(lambda i: i["segmentation_id"] == segmentation_id, read_json)
-                )
-                assert len(filter_results) == 1
-                target_segmentation: GeometricSegmentationData = filter_results[0]
-                target_timeframe_data = target_segmentation["primitives"][str(time)]
+            path: Path = (
+                self.db._path_to_object(self.namespace, self.key)
+                / GEOMETRIC_SEGMENTATION_FILENAME
+            )
+            # GeometricSegmentationJson is parsed once per version of the file
+            index = self.db.metadata_cache.get(
+                (self.namespace, self.key, GEOMETRIC_SEGMENTATION_FILENAME),
+                path,
+                _load_geometric_segmentation_index,
+            )
+            target_timeframe_data = index[(segmentation_id, time)]
         except Exception as e:
             logging.error(e, stack_info=True, exc_info=True)
             raise e
 
         return target_timeframe_data
 
-    async def read_volume_slice(
+    def _read_volume_slice(
         self,
         down_sampling_ratio: int,
         box: Tuple[Tuple[int, int, int], Tuple[int, int, int]],
@@ -192,11 +248,12 @@ class FileSystemDBReadContext(DBReadContext):
         time: int,
         mode: str = "dask",
         timer_printout=False,
+        decode_quantized: bool = True,
     ) -> VolumeSliceData:
         try:
             box = normalize_box(box)
 
-            root: zarr.Group = zarr.group(self.store)
+            root: zarr.Group = self.root
 
             if VOLUME_DATA_GROUPNAME in root and (down_sampling_ratio is not None):
                 volume_arr: zarr.core.Array = root[VOLUME_DATA_GROUPNAME][
@@ -218,21 +275,40 @@ class FileSystemDBReadContext(DBReadContext):
                 # if yes, decode volume_slice (reassamble data dict from data_dict attr, just add 'data' key with volume_slice)
                 # do .compute on output of decode_quantized_data function if output is da.Array
 
+                # if decode_quantized is False, quantized data is returned as stored,
+                # together with the parameters needed to decode it
+                quantization = None
                 if QUANTIZATION_DATA_DICT_ATTR_NAME in volume_arr.attrs:
                     data_dict = volume_arr.attrs[QUANTIZATION_DATA_DICT_ATTR_NAME]
-                    data_dict["data"] = volume_slice
-                    volume_slice = decode_quantized_data(data_dict)
-                    if isinstance(volume_slice, da.Array):
-                        volume_slice = volume_slice.compute()
+                    if decode_quantized:
+                        data_dict["data"] = volume_slice
+                        volume_slice = decode_quantized_data_lut(data_dict)
+                        if isinstance(volume_slice, da.Array):
+                            volume_slice = volume_slice.compute()
+                    else:
+                        quantization = data_dict
 
                 if timer_printout == True:
                     print(f"read_volume_slice with mode {mode}: {end - start}")
 
-                return {
+                result: VolumeSliceData = {
                     "volume_slice": volume_slice,
                     "time": time,
                     "channel_id": channel_id,
                 }
+                if quantization is not None:
+                    result["volume_quantization"] = quantization
+                else:
+                    value_range = self._read_volume_value_range(
+                        down_sampling_ratio=down_sampling_ratio,
+                        time=time,
+                        channel_id=channel_id,
+                        chunks=volume_arr.chunks,
+                        box=box,
+                    )
+                    if value_range is not None:
+                        result["volume_value_range"] = value_range
+                return result
             else:
                 raise HTTPException(
                     status_code=404,
@@ -243,7 +319,80 @@ class FileSystemDBReadContext(DBReadContext):
             logging.error(e, stack_info=True, exc_info=True)
             raise e
 
-    async def read_segmentation_slice(
+    def _read_volume_box_value_range(
+        self,
+        down_sampling_ratio: int,
+        box: Tuple[Tuple[int, int, int], Tuple[int, int, int]],
+        channel_id: str,
+        time: int,
+    ) -> Optional[Tuple[float, float]]:
+        try:
+            volume_arr: zarr.core.Array = self.root[VOLUME_DATA_GROUPNAME][
+                down_sampling_ratio
+            ][time][channel_id]
+        except KeyError:
+            return None
+        return self._read_volume_value_range(
+            down_sampling_ratio=down_sampling_ratio,
+            time=time,
+            channel_id=channel_id,
+            chunks=volume_arr.chunks,
+            box=normalize_box(box),
+        )
+
+    def _read_volume_value_range(
+        self,
+        down_sampling_ratio: int,
+        time: int,
+        channel_id: str,
+        chunks: Tuple[int, int, int],
+        box: Tuple[Tuple[int, int, int], Tuple[int, int, int]],
+    ) -> Optional[Tuple[float, float]]:
+        """
+        Returns (min, max) of values in chunks overlapping the box (inclusive)
+        from per-chunk statistics written by preprocessor,
+        None for entries without them
+        """
+        try:
+            statistics_arr: zarr.core.Array = self.root[
+                VOLUME_CHUNK_STATISTICS_GROUPNAME
+            ][down_sampling_ratio][time][channel_id]
+        except KeyError:
+            return None
+
+        statistics = statistics_arr[
+            tuple(
+                slice(box[0][i] // chunks[i], box[1][i] // chunks[i] + 1)
+                for i in range(3)
+            )
+        ]
+        return float(statistics[..., 0].min()), float(statistics[..., 1].max())
+
+    def _read_chunk_grids(self) -> ChunkGridsData:
+        root: zarr.Group = self.root
+        grids: ChunkGridsData = {"volume": {}, "segmentation": {}}
+
+        if VOLUME_DATA_GROUPNAME in root:
+            for level, level_gr in root[VOLUME_DATA_GROUPNAME].groups():
+                for time, time_gr in level_gr.groups():
+                    for channel_id, arr in time_gr.arrays():
+                        grids["volume"].setdefault(int(level), {}).setdefault(
+                            int(time), {}
+                        )[channel_id] = _chunk_grid(arr)
+
+        if LATTICE_SEGMENTATION_DATA_GROUPNAME in root:
+            for lattice_id, lattice_gr in root[
+                LATTICE_SEGMENTATION_DATA_GROUPNAME
+            ].groups():
+                for level, level_gr in lattice_gr.groups():
+                    for time, time_gr in level_gr.groups():
+                        grids["segmentation"].setdefault(lattice_id, {}).setdefault(
+                            int(level), {}
+                        )[int(time)] = _chunk_grid(time_gr.grid)
+
+        return grids
+
+    def _read_segmentation_slice(
         self,
         lattice_id: str,
         down_sampling_ratio: int,
@@ -255,7 +404,7 @@ class FileSystemDBReadContext(DBReadContext):
         try:
             box = normalize_box(box)
 
-            root: zarr.Group = zarr.group(self.store)
+            root: zarr.Group = self.root
 
             segm_arr = None
             segm_dict = None
@@ -385,22 +534,14 @@ class FileSystemDBReadContext(DBReadContext):
         arr: zarr.core.Array,
         box: Tuple[Tuple[int, int, int], Tuple[int, int, int]],
     ):
-        # TODO: check if slice is correct and equal to : notation slice
-        # TODO: await? # store - future object, result - ONE of the ways how to get it sync (can be async)
-        # store.read() - returns everything as future object. again result() or other methods
-        # can be store[1:10].read() ...
-        print("This method is MAY not work properly for ZIP store. Needs to be checked")
-        path = self.__get_path_to_zarr_object(arr)
-        store = ts.open(
-            {
-                "driver": "zarr",
-                "kvstore": {
-                    "driver": "file",
-                    "path": str(path.resolve()),
-                },
-            },
-            read=True,
-        ).result()
+        # opened TensorStores and their chunk cache are shared between read contexts,
+        # the read runs on the executor thread, so waiting for it does not block the event loop
+        store = get_tensorstore_arrays().get(
+            entry_token=(self._pooled.pool_key, self._pooled.signature),
+            path=self.path,
+            store_type=self.db.store_type,
+            array_path=arr.path,
+        )
         sliced = (
             store[
                 box[0][0] : box[1][0] + 1,
@@ -412,40 +553,22 @@ class FileSystemDBReadContext(DBReadContext):
         )
         return sliced
 
-    def __get_path_to_zarr_object(
-        self, zarr_obj: Union[zarr.Group, zarr.core.Array]
-    ) -> Path:
-        """
-        Returns Path to zarr object (array or group)
-        """
-        path: Path = Path(zarr_obj.store.path).resolve() / zarr_obj.path
-        return path
-
     def close(self):
-        if hasattr(self.store, "close"):
-            self.store.close()
-        else:
-            pass
+        if self._pooled is not None:
+            self.db.store_pool.release(self._pooled)
+            self._pooled = None
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if hasattr(self.store, "close"):
-            self.store.close()
-        else:
-            pass
+        self.close()
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, *args, **kwargs):
-        if hasattr(self.store, "aclose"):
-            await self.store.aclose()
-        if hasattr(self.store, "close"):
-            self.store.close()
-        else:
-            pass
+        self.close()
 
     def __init__(self, db: VolumeServerDB, namespace: str, key: str):
         self.db = db
@@ -453,9 +576,69 @@ class FileSystemDBReadContext(DBReadContext):
         assert self.path.exists(), f"Path {self.path} does not exist"
         self.key = key
         self.namespace = namespace
-        if self.db.store_type == "directory":
-            self.store = zarr.DirectoryStore(path=self.path)
-        elif self.db.store_type == "zip":
-            self.store = zarr.ZipStore(
-                path=self.path, compression=0, allowZip64=True, mode="r"
-            )
+        # store and root group are shared with other read contexts of the same entry,
+        # the store is closed by the pool, not by the read context
+        self._pooled: PooledEntryStore = self.db.store_pool.acquire(
+            pool_key=self.db._store_pool_key(namespace, key),
+            path=self.path,
+            store_type=self.db.store_type,
+        )
+        self.store = self._pooled.store
+        self.root: zarr.Group = self._pooled.root
+
+
+def _chunk_grid(arr: zarr.core.Array) -> ChunkGrid:
+    return {
+        "shape": list(arr.shape),
+        "chunks": list(arr.chunks),
+        "grid": [-(-s // c) for s, c in zip(arr.shape, arr.chunks)],
+    }
+
+
+class _WorkerHTTPError:
+    # HTTPException cannot be unpickled, so it is sent back from a worker process as this
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _load_geometric_segmentation_index(
+    path: Path,
+) -> dict[tuple[str, int], ShapePrimitiveData]:
+    """
+    Returns primitives of geometric segmentations by (segmentation_id, time)
+    """
+    with open(path.resolve(), "r", encoding="utf-8") as f:
+        # reads into dict
+        read_json: GeometricSegmentationJson = json.load(f)
+    return {
+        (segmentation["segmentation_id"], int(time)): timeframe_data
+        for segmentation in read_json
+        for time, timeframe_data in segmentation["primitives"].items()
+    }
+
+
+# (db folder, store type) => db, used in worker processes of a process pool executor
+_worker_dbs: dict[tuple[Path, str], VolumeServerDB] = {}
+
+
+def _read_in_worker(
+    folder: Path,
+    store_type: str,
+    namespace: str,
+    key: str,
+    method_name: str,
+    kwargs: dict,
+):
+    from cellstar_db.file_system.db import FileSystemVolumeServerDB
+
+    db = _worker_dbs.get((folder, store_type))
+    if db is None:
+        db = FileSystemVolumeServerDB(folder=folder, store_type=store_type)
+        _worker_dbs[(folder, store_type)] = db
+
+    try:
+        with FileSystemDBReadContext(db=db, namespace=namespace, key=key) as context:
+            return getattr(context, method_name)(**kwargs)
+    except HTTPException as e:
+        return _WorkerHTTPError(status_code=e.status_code, detail=e.detail)
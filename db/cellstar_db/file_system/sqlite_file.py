@@ -0,0 +1,74 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable
+
+
+class SQLiteConnection:
+    """
+    Commits (or rolls back) the transaction and closes the connection on exit
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.conn.close()
+
+
+class SQLiteFile:
+    """
+    SQLite database file derived from the DB (e.g. entry catalog, keyword index).
+    It is (re)built by rebuild on first use if it does not exist or if it was
+    written with a different version (user_version pragma) than the given one.
+    The file can be shared by several processes (server workers, preprocessor)
+    """
+
+    def __init__(self, path: Path, version: int):
+        self.path = path
+        self.version = version
+        self._lock = threading.RLock()
+
+    def rebuild(self):
+        raise NotImplementedError()
+
+    def _open(self) -> sqlite3.Connection:
+        # file can be written by another process, waits for its lock
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _connect(self) -> SQLiteConnection:
+        with self._lock:
+            if not self.path.exists():
+                self.rebuild()
+            conn = self._open()
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version != self.version:
+                conn.close()
+                self.rebuild()
+                conn = self._open()
+        return SQLiteConnection(conn)
+
+    def _replace(self, fill: Callable[[sqlite3.Connection], None]):
+        """
+        Replaces contents of the file by the ones written by fill
+        (dropping and creating tables) in a single transaction
+        """
+        conn = self._open()
+        try:
+            with conn:
+                # sqlite3 does not begin transaction before DDL statements,
+                # readers should not see the file without the tables
+                conn.execute("BEGIN IMMEDIATE")
+                fill(conn)
+                conn.execute(f"PRAGMA user_version = {self.version}")
+        finally:
+            conn.close()
@@ -0,0 +1,168 @@
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+import zarr
+from cellstar_db.file_system.chunk_cache import (
+    DECODED_CHUNK_CACHE,
+    DecodedChunkCache,
+    DecodedChunkCacheStore,
+)
+from cellstar_db.file_system.constants import MAX_OPEN_ENTRY_STORES
+from cellstar_db.utils.files import file_signature
+
+# (db folder, namespace, key)
+EntryPoolKey = Tuple[str, str, str]
+
+
+class PooledEntryStore:
+    """
+    Open read-only store of a single DB entry together with its root zarr group.
+    Shared between read contexts, closed by the pool once it is evicted or
+    invalidated and no read context holds it anymore
+    """
+
+    def __init__(
+        self,
+        pool_key: EntryPoolKey,
+        store: zarr.storage.BaseStore,
+        root: zarr.Group,
+        signature: Optional[Tuple[int, int, int]],
+    ):
+        self.pool_key = pool_key
+        self.store = store
+        self.root = root
+        self.signature = signature
+        self.refs = 0
+        # set when the handle is no longer in the pool (evicted or invalidated)
+        self.detached = False
+
+    def close(self):
+        if hasattr(self.store, "close"):
+            self.store.close()
+
+
+def _open_store(path: Path, store_type: str) -> zarr.storage.BaseStore:
+    if store_type == "directory":
+        return zarr.DirectoryStore(path=path)
+    elif store_type == "zip":
+        return zarr.ZipStore(path=path, compression=0, allowZip64=True, mode="r")
+    else:
+        raise ValueError(f"store type is not supported: {store_type}")
+
+
+class EntryStorePool:
+    """
+    Process-wide LRU pool of open read-only entry stores keyed by (db folder, namespace, key).
+    At most max_open stores are kept open; least recently used stores that are not in use
+    are closed first. A pooled store is replaced once the data file of the entry changes on disk.
+    Root groups read chunks through chunk_cache (if not None)
+    """
+
+    def __init__(
+        self,
+        max_open: int = MAX_OPEN_ENTRY_STORES,
+        chunk_cache: Optional[DecodedChunkCache] = DECODED_CHUNK_CACHE,
+    ):
+        self.max_open = max_open
+        self.chunk_cache = chunk_cache
+        self._entries: OrderedDict[EntryPoolKey, PooledEntryStore] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_max_open(self, max_open: int):
+        assert max_open > 0, "max_open must be positive"
+        with self._lock:
+            self.max_open = max_open
+            self._evict()
+
+    def acquire(
+        self, pool_key: EntryPoolKey, path: Path, store_type: str
+    ) -> PooledEntryStore:
+        signature = file_signature(path)
+        assert signature is not None, f"Path {path} does not exist"
+
+        with self._lock:
+            pooled = self._entries.get(pool_key)
+            if pooled is not None and pooled.signature != signature:
+                self._detach(pooled)
+                pooled = None
+
+            if pooled is None:
+                store = _open_store(path, store_type)
+                try:
+                    if self.chunk_cache is not None:
+                        # signature is a part of the token, so chunks of a rewritten
+                        # entry are never served from the cache
+                        root = zarr.group(
+                            DecodedChunkCacheStore(
+                                store, self.chunk_cache, (pool_key, signature)
+                            )
+                        )
+                    else:
+                        root = zarr.group(store)
+                except Exception:
+                    store.close()
+                    raise
+                pooled = PooledEntryStore(
+                    pool_key=pool_key, store=store, root=root, signature=signature
+                )
+                self._entries[pool_key] = pooled
+            else:
+                self._entries.move_to_end(pool_key)
+
+            pooled.refs += 1
+            self._evict()
+            return pooled
+
+    def release(self, pooled: PooledEntryStore):
+        with self._lock:
+            pooled.refs -= 1
+            if pooled.refs == 0 and pooled.detached:
+                self._close(pooled)
+            else:
+                self._evict()
+
+    def invalidate(self, pool_key: EntryPoolKey):
+        """
+        Drops the pooled store of an entry, e.g. after the entry was modified or deleted
+        """
+        with self._lock:
+            pooled = self._entries.get(pool_key)
+            if pooled is not None:
+                self._detach(pooled)
+
+    def clear(self):
+        with self._lock:
+            for pooled in list(self._entries.values()):
+                self._detach(pooled)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _detach(self, pooled: PooledEntryStore):
+        del self._entries[pooled.pool_key]
+        pooled.detached = True
+        if pooled.refs == 0:
+            self._close(pooled)
+
+    def _evict(self):
+        # stores that are in use are skipped, so the pool may temporarily exceed
+        # max_open if more entries than that are read at the same time
+        if len(self._entries) <= self.max_open:
+            return
+        for pooled in list(self._entries.values()):
+            if len(self._entries) <= self.max_open:
+                break
+            if pooled.refs == 0:
+                self._detach(pooled)
+
+    def _close(self, pooled: PooledEntryStore):
+        try:
+            pooled.close()
+        except Exception as e:
+            logging.error(e, stack_info=True, exc_info=True)
+
+
+ENTRY_STORE_POOL = EntryStorePool()
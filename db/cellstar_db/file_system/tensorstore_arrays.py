@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Hashable, Optional
+
+import tensorstore as ts
+from cellstar_db.file_system.constants import (
+    TENSORSTORE_CACHE_POOL_BYTES,
+    TENSORSTORE_MAX_OPEN_ARRAYS,
+)
+
+
+class TensorStoreArrays:
+    """
+    Opened TensorStores of entry arrays sharing a single ts.Context
+    with a bounded cache pool. Stores are reused per (entry token, array path),
+    at most max_open of them are kept (LRU)
+    """
+
+    def __init__(
+        self,
+        cache_pool_bytes: int = TENSORSTORE_CACHE_POOL_BYTES,
+        max_open: int = TENSORSTORE_MAX_OPEN_ARRAYS,
+    ):
+        self.max_open = max_open
+        self._stores: OrderedDict[tuple[Hashable, str], ts.TensorStore] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._create_context(cache_pool_bytes)
+
+    def set_cache_pool_bytes(self, cache_pool_bytes: int):
+        with self._lock:
+            self._stores.clear()
+            self._create_context(cache_pool_bytes)
+
+    def get(
+        self, entry_token: Hashable, path: Path, store_type: str, array_path: str
+    ) -> ts.TensorStore:
+        """
+        Returns opened TensorStore for array_path of an entry stored at path
+        (data.zip for zip store type, entry directory for directory store type).
+        entry_token should change when the entry is rewritten
+        """
+        key = (entry_token, array_path)
+        with self._lock:
+            store = self._stores.get(key)
+            if store is not None:
+                self._stores.move_to_end(key)
+                return store
+            context = self.context
+
+        store = ts.open(
+            _array_spec(path, store_type, array_path), read=True, context=context
+        ).result()
+
+        with self._lock:
+            if context is self.context:
+                self._stores[key] = store
+                while len(self._stores) > self.max_open:
+                    self._stores.popitem(last=False)
+        return store
+
+    def clear(self):
+        with self._lock:
+            self._stores.clear()
+
+    def _create_context(self, cache_pool_bytes: int):
+        self.context = ts.Context(
+            {"cache_pool": {"total_bytes_limit": cache_pool_bytes}}
+        )
+
+
+def _array_spec(path: Path, store_type: str, array_path: str) -> dict:
+    if store_type == "zip":
+        kvstore = {
+            "driver": "zip",
+            "base": {"driver": "file", "path": str(path.resolve())},
+            "path": f"{array_path}/",
+        }
+    elif store_type == "directory":
+        kvstore = {"driver": "file", "path": str((path / array_path).resolve())}
+    else:
+        raise ValueError(f"store type is not supported: {store_type}")
+
+    return {
+        "driver": "zarr",
+        "kvstore": kvstore,
+        # entries are immutable, a rewritten entry gets a new entry token
+        "recheck_cached_data": False,
+    }
+
+
+TENSORSTORE_ARRAYS: Optional[TensorStoreArrays] = None
+
+
+def get_tensorstore_arrays() -> TensorStoreArrays:
+    # created on first use so that processes which do not use tensorstore mode
+    # do not allocate the context
+    global TENSORSTORE_ARRAYS
+    if TENSORSTORE_ARRAYS is None:
+        TENSORSTORE_ARRAYS = TensorStoreArrays()
+    return TENSORSTORE_ARRAYS
@@ -17,8 +17,10 @@ from cellstar_db.file_system.constants import (
     GRID_METADATA_FILENAME,
     LATTICE_SEGMENTATION_DATA_GROUPNAME,
     MESH_SEGMENTATION_DATA_GROUPNAME,
+    VOLUME_CHUNK_STATISTICS_GROUPNAME,
     VOLUME_DATA_GROUPNAME,
 )
+from cellstar_db.file_system.packed_meshes import pack_mesh_segmentation
 from cellstar_db.models import GeometricSegmentationData
 from cellstar_db.protocol import VolumeServerDB
 from cellstar_preprocessor.flows.common import (
@@ -69,6 +71,7 @@ class VolumeAndSegmentationContext:
             existing_store.close()
             # 3. Deleting existing store
             self.db.path_to_zarr_root_data(namespace, key).unlink()
+            self.db.invalidate_entry(namespace, key)
 
         else:
             raise ArgumentError("store type is not supported: {self.store_type}")
@@ -86,6 +89,13 @@ class VolumeAndSegmentationContext:
             source_path=VOLUME_DATA_GROUPNAME,
             dest_path=VOLUME_DATA_GROUPNAME,
         )
+        if VOLUME_CHUNK_STATISTICS_GROUPNAME in temp_zarr_structure:
+            zarr.copy_store(
+                source=temp_store,
+                dest=self.store,
+                source_path=VOLUME_CHUNK_STATISTICS_GROUPNAME,
+                dest_path=VOLUME_CHUNK_STATISTICS_GROUPNAME,
+            )
         print("Volume added")
 
     def add_segmentation(
@@ -115,11 +125,11 @@ class VolumeAndSegmentationContext:
             if MESH_SEGMENTATION_DATA_GROUPNAME not in perm_root:
                 perm_root.create_group(MESH_SEGMENTATION_DATA_GROUPNAME)
 
-            zarr.copy_store(
-                source=temp_store,
-                dest=self.store,
-                source_path=source_path,
-                dest_path=source_path,
+            # intermediate structure has group per mesh (used by simplification),
+            # DB entry stores meshes of each detail lvl in contiguous buffers
+            pack_mesh_segmentation(
+                source=temp_zarr_structure[source_path],
+                dest=perm_root.create_group(source_path),
             )
 
         elif kind == "geometric_segmentation":
@@ -215,6 +225,8 @@ class VolumeAndSegmentationContext:
 
         # here save annotations and metadata in new_existing_store
         self.__save_annotations_and_metadata()
+        self.db.invalidate_entry(self.namespace, self.key)
+        self.db.entry_catalog.update_entry(self.namespace, self.key)
 
     def __save_annotations_and_metadata(self):
         zarr.DirectoryStore(str(self.intermediate_zarr_structure))
@@ -231,6 +243,9 @@ class VolumeAndSegmentationContext:
             GRID_METADATA_FILENAME,
             self.path_to_entry,
         )
+        self.db.keyword_index.update_entry(
+            self.namespace, self.key, root.attrs["annotations_dict"]
+        )
 
     def close(self):
         if hasattr(self.store, "close"):
@@ -433,14 +433,66 @@ class LatticeSegmentationSliceData(TypedDict):
     lattice_id: int
 
 
+class QuantizationDataDict(TypedDict):
+    # parameters of log transform + quantization of volume data
+    # stored in QUANTIZATION_DATA_DICT_ATTR_NAME attr of the array
+    min: float
+    max: float
+    num_steps: int
+    src_type: str
+    to_remove_negatives: Union[int, float]
+
+
 class VolumeSliceData(TypedDict):
     # changed segm slice to another typeddict
     segmentation_slice: Optional[LatticeSegmentationSliceData]
     volume_slice: Optional[np.ndarray]
+    # present if volume_slice is quantized data that was not decoded
+    volume_quantization: Optional[QuantizationDataDict]
+    # (min, max) bound of volume_slice values if known without reading it
+    # (from per-chunk statistics)
+    volume_value_range: Optional[tuple[float, float]]
     channel_id: Optional[str]
     time: int
 
 
+class ChunkGrid(TypedDict):
+    # shape of the array and of its chunks (zarr `chunks`)
+    shape: list[int]
+    chunks: list[int]
+    # number of chunks along each axis
+    grid: list[int]
+
+
+class ChunkGridsData(TypedDict):
+    # level => time => channel id => chunk grid of volume data array
+    volume: dict[int, dict[int, dict[str, ChunkGrid]]]
+    # lattice id => level => time => chunk grid of segmentation grid array
+    segmentation: dict[str, dict[int, dict[int, ChunkGrid]]]
+
+
+EntryDataKind = Literal[
+    "volume", "lattice_segmentation", "mesh_segmentation", "geometric_segmentation"
+]
+
+
+class CatalogEntryData(TypedDict):
+    source: str
+    entry_id: str
+    # total size of entry files in bytes
+    size: int
+    data_kinds: list[EntryDataKind]
+    # unix timestamps
+    created_at: float
+    updated_at: float
+
+
+class CatalogEntriesPage(TypedDict):
+    entries: list[CatalogEntryData]
+    # pass to the next request to get the next page, None if it is the last one
+    next_cursor: Optional[str]
+
+
 # END SERVER OUTPUT DATA MODEL
 
 # INPUT DATA MODEL
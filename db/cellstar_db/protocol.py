@@ -1,8 +1,12 @@
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import Protocol, Tuple
+from typing import Hashable, Iterable, Optional, Protocol, Tuple
 
 from cellstar_db.models import (
     AnnotationsMetadata,
+    CatalogEntriesPage,
+    ChunkGridsData,
+    EntryDataKind,
     GeometricSegmentationData,
     MeshesData,
     VolumeMetadata,
@@ -20,6 +24,7 @@ class DBReadContext(Protocol):
         mode: str = "dask",
         timer_printout=False,
         lattice_id: str = "0",
+        decode_quantized: bool = True,
     ) -> VolumeSliceData:
         """
         Reads a slice from a specific (down)sampling of segmentation and volume data
@@ -53,7 +58,13 @@ class DBReadContext(Protocol):
         time: int,
         mode: str = "dask",
         timer_printout=False,
-    ) -> VolumeSliceData: ...
+        decode_quantized: bool = True,
+    ) -> VolumeSliceData:
+        """
+        If decode_quantized is False, quantized volume data is returned as stored,
+        with decoding parameters in volume_quantization
+        """
+        ...
 
     async def read_segmentation_slice(
         self,
@@ -65,6 +76,25 @@ class DBReadContext(Protocol):
         timer_printout=False,
     ) -> VolumeSliceData: ...
 
+    async def read_volume_value_range(
+        self,
+        down_sampling_ratio: int,
+        box: Tuple[Tuple[int, int, int], Tuple[int, int, int]],
+        channel_id: str,
+        time: int,
+    ) -> Optional[Tuple[float, float]]:
+        """
+        Returns (min, max) bound of volume values in the box without reading it,
+        None if it is not known (entry without per-chunk statistics)
+        """
+        ...
+
+    async def read_chunk_grids(self) -> ChunkGridsData:
+        """
+        Returns shapes and chunk shapes of all volume and lattice segmentation arrays
+        """
+        ...
+
     def close(self) -> None: ...
 
     async def aclose(self) -> None: ...
@@ -75,6 +105,9 @@ class DBReadContext(Protocol):
 
 
 class VolumeServerDB(Protocol):
+    # executor for blocking reads and serialization
+    executor: Executor
+
     async def contains(self, namespace: str, key: str) -> bool: ...
 
     def read(self, namespace: str, key: str) -> DBReadContext: ...
@@ -89,6 +122,30 @@ class VolumeServerDB(Protocol):
 
     async def list_entries(self, source: str, limit: int) -> list[str]: ...
 
+    async def search_entries(
+        self, keyword: str, limit: int, offset: int = 0
+    ) -> dict[str, list[str]]: ...
+
+    async def list_catalog_entries(
+        self,
+        limit: int,
+        source: Optional[str] = None,
+        data_kinds: Iterable[EntryDataKind] = (),
+        entry_id_prefix: Optional[str] = None,
+        cursor: Optional[str] = None,
+    ) -> CatalogEntriesPage:
+        """
+        Returns page of entries ordered by source and entry id,
+        cursor is next_cursor of the previous page
+        """
+        ...
+
+    def entry_version(self, namespace: str, key: str) -> Hashable:
+        """
+        Returns value that changes when data or metadata of the entry is rewritten
+        """
+        ...
+
     async def store(self, namespace: str, key: str, temp_store_path: Path) -> bool: ...
 
     async def delete(self, namespace: str, key: str): ...
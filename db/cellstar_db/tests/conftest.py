@@ -1,9 +1,17 @@
 import asyncio
 import copy
+import json
+import shutil
 from pathlib import Path
 from typing import TypedDict
 
+import numpy as np
 import pytest
+import zarr
+from cellstar_db.file_system.constants import (
+    GRID_METADATA_FILENAME,
+    MESH_SEGMENTATION_DATA_GROUPNAME,
+)
 from cellstar_db.file_system.db import FileSystemVolumeServerDB
 from cellstar_db.models import (
     AnnotationsMetadata,
@@ -73,6 +81,91 @@ def testing_db():
     yield db
 
 
+# segment id => number of detail levels (1 is the original one),
+# segments with simple meshes are not simplified that far
+TEST_MESH_SEGMENT_DETAIL_LVLS = {1: 3, 2: 2, 5: 1}
+TEST_MESH_SEGMENTATION_ID = "0"
+
+
+def _create_test_meshes(root: zarr.Group) -> dict:
+    """
+    Writes mesh segmentation in the layout of the preprocessor,
+    returns its segment_ids metadata
+    """
+    rng = np.random.default_rng(0)
+    timeframe_gr = root.require_group(MESH_SEGMENTATION_DATA_GROUPNAME).create_group(
+        f"{TEST_MESH_SEGMENTATION_ID}/0"
+    )
+    segment_ids_metadata = {}
+    for segment_id, detail_lvl_count in TEST_MESH_SEGMENT_DETAIL_LVLS.items():
+        detail_lvls_metadata = {}
+        for detail_lvl in range(1, detail_lvl_count + 1):
+            mesh_ids_metadata = {}
+            for mesh_id in range(detail_lvl_count - detail_lvl + 2):
+                vertex_count = int(rng.integers(3, 40)) * (4 - detail_lvl)
+                triangle_count = 2 * vertex_count
+                mesh_gr = timeframe_gr.create_group(
+                    f"{segment_id}/{detail_lvl}/{mesh_id}"
+                )
+                arrays = {
+                    "vertices": rng.random((vertex_count, 3), dtype=np.float32),
+                    "triangles": rng.integers(
+                        0, vertex_count, (triangle_count, 3), dtype=np.int32
+                    ),
+                    "normals": rng.random((vertex_count, 3), dtype=np.float32),
+                }
+                for name, array in arrays.items():
+                    dset = mesh_gr.create_dataset(name, data=array)
+                    dset.attrs[f"num_{name}"] = len(array)
+                mesh_ids_metadata[mesh_id] = {
+                    f"num_{name}": len(array) for name, array in arrays.items()
+                }
+            detail_lvls_metadata[detail_lvl] = {"mesh_ids": mesh_ids_metadata}
+        segment_ids_metadata[segment_id] = {"detail_lvls": detail_lvls_metadata}
+    return segment_ids_metadata
+
+
+@pytest.fixture(scope="module")
+def testing_mesh_db(testing_db, tmp_path_factory):
+    """
+    Copy of the test entry with a (random) mesh segmentation,
+    as there is no mesh segmentation in test data
+    """
+    source = TEST_ENTRY_PREPROCESSOR_INPUT["source_db"]
+    entry_id = TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"]
+    db_path = tmp_path_factory.mktemp("testing_mesh_db")
+    entry_path = db_path / source / entry_id
+    shutil.copytree(Path(TEST_DB_FOLDER) / source / entry_id, entry_path)
+
+    store = zarr.ZipStore(path=str(entry_path / "data.zip"), mode="a")
+    segment_ids_metadata = _create_test_meshes(zarr.group(store))
+    store.close()
+
+    with open(entry_path / GRID_METADATA_FILENAME) as f:
+        metadata = json.load(f)
+    metadata["segmentation_meshes"] = {
+        "segmentation_ids": [TEST_MESH_SEGMENTATION_ID],
+        "segmentation_metadata": {
+            TEST_MESH_SEGMENTATION_ID: {
+                "detail_lvl_to_fraction": {1: 1.0, 2: 0.5, 3: 0.25},
+                "mesh_timeframes": {0: {"segment_ids": segment_ids_metadata}},
+            }
+        },
+        "time_info": {
+            TEST_MESH_SEGMENTATION_ID: {
+                "end": 0,
+                "kind": "range",
+                "start": 0,
+                "units": "millisecond",
+            }
+        },
+    }
+    with open(entry_path / GRID_METADATA_FILENAME, "w") as f:
+        json.dump(metadata, f)
+
+    yield FileSystemVolumeServerDB(folder=db_path, store_type="zip")
+
+
 FAKE_SEGMENT_ANNOTATIONS: list[SegmentAnnotationData] = [
     {
         "color": [0, 0, 0, 1.0],
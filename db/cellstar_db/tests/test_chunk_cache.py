@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import numcodecs
+import numpy as np
+import zarr
+from cellstar_db.file_system.chunk_cache import DecodedChunkCache
+from cellstar_db.file_system.store_pool import EntryStorePool
+
+
+def _create_zip_entry(path: Path, data: np.ndarray):
+    store = zarr.ZipStore(path=str(path), compression=0, allowZip64=True, mode="w")
+    root = zarr.group(store)
+    root.create_dataset("volume", data=data, chunks=(4, 4, 4))
+    root.create_dataset(
+        "set_table", data=[{"1": [1, 2]}], dtype=object, object_codec=numcodecs.JSON()
+    )
+    store.close()
+
+
+def test_decoded_chunk_cache(tmp_path: Path):
+    data = np.arange(8 * 8 * 8, dtype=np.float32).reshape((8, 8, 8))
+    path = tmp_path / "data.zip"
+    _create_zip_entry(path, data)
+
+    # room for 4 out of 8 chunks
+    cache = DecodedChunkCache(max_bytes=4 * 4 * 4 * 4 * 4)
+    pool = EntryStorePool(chunk_cache=cache)
+    pooled = pool.acquire(("db", "emdb", "0"), path, "zip")
+    arr = pooled.root["volume"]
+
+    np.testing.assert_array_equal(arr[0:4, 0:4, 0:8], data[0:4, 0:4, 0:8])
+    assert cache.misses == 2 and cache.hits == 0
+
+    np.testing.assert_array_equal(arr[1:3, 2:4, 3:6], data[1:3, 2:4, 3:6])
+    assert cache.misses == 2 and cache.hits == 2
+
+    np.testing.assert_array_equal(arr[...], data)
+    assert cache.misses == 8 and cache.evictions == 4
+    assert cache.current_bytes <= cache.max_bytes
+
+    # object arrays are not cached
+    assert pooled.root["set_table"][0] == {"1": [1, 2]}
+    assert cache.misses == 8
+
+    pool.release(pooled)
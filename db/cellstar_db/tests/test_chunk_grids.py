@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from cellstar_db.file_system.db import FileSystemVolumeServerDB
+from cellstar_db.tests.conftest import TEST_ENTRY_PREPROCESSOR_INPUT
+
+
+@pytest.mark.asyncio
+async def test_chunk_grids_cover_arrays(testing_db: FileSystemVolumeServerDB):
+    metadata = await testing_db.read_metadata(
+        TEST_ENTRY_PREPROCESSOR_INPUT["source_db"],
+        TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"],
+    )
+
+    with testing_db.read(
+        TEST_ENTRY_PREPROCESSOR_INPUT["source_db"],
+        TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"],
+    ) as context:
+        grids = await context.read_chunk_grids()
+
+        assert "0" in grids["segmentation"]
+        for level, level_grids in grids["volume"].items():
+            grid = level_grids[0]["0"]
+            assert tuple(grid["shape"]) == tuple(
+                metadata.sampled_grid_dimensions(level)
+            )
+            chunks = np.array(grid["chunks"])
+            assert (np.array(grid["grid"]) * chunks >= np.array(grid["shape"])).all()
+            assert ((np.array(grid["grid"]) - 1) * chunks < grid["shape"]).all()
+
+            # last chunk of the grid, as read by tile queries
+            bottom_left = tuple((np.array(grid["grid"]) - 1) * chunks)
+            top_right = tuple(np.array(grid["shape"]) - 1)
+            volume = await context.read_volume_slice(
+                down_sampling_ratio=level,
+                box=(bottom_left, top_right),
+                channel_id="0",
+                time=0,
+            )
+            assert volume["volume_slice"].shape == tuple(
+                np.array(top_right) - np.array(bottom_left) + 1
+            )
@@ -0,0 +1,153 @@
+import asyncio
+import zlib
+
+import brotli
+import pytest
+import zstandard
+from cellstar_db.utils.content_encoding import (
+    BROTLI,
+    GZIP,
+    IDENTITY,
+    ZSTD,
+    compress,
+    decompress,
+)
+from cellstar_server.app.compression import CompressionMiddleware
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+MINIMUM_SIZE = 100
+BODY = b"".join(f"value {i} ".encode() for i in range(2000))
+SMALL_BODY = b"small"
+STREAMED_PARTS = [BODY[i : i + 3000] for i in range(0, len(BODY), 3000)]
+
+
+async def _parts():
+    for part in STREAMED_PARTS:
+        yield part
+
+
+def _app() -> Starlette:
+    app = Starlette(
+        routes=[
+            Route("/plain", lambda request: Response(BODY)),
+            Route("/small", lambda request: Response(SMALL_BODY)),
+            Route("/streamed", lambda request: StreamingResponse(_parts())),
+            Route(
+                "/precompressed",
+                lambda request: Response(
+                    compress(BODY, GZIP), headers={"Content-Encoding": GZIP}
+                ),
+            ),
+            Route(
+                "/not_modified",
+                lambda request: Response(status_code=304, headers={"ETag": '"1"'}),
+            ),
+        ]
+    )
+    app.add_middleware(CompressionMiddleware, minimum_size=MINIMUM_SIZE)
+    return app
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    return TestClient(_app())
+
+
+def _get_raw(client: TestClient, path: str, accept_encoding: str):
+    # raw (not decoded by the client) body
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as r:
+        return r, b"".join(r.iter_raw())
+
+
+@pytest.mark.parametrize("encoding", [ZSTD, BROTLI, GZIP])
+@pytest.mark.parametrize("path", ["/plain", "/streamed"])
+def test_compression_middleware_encodes(client: TestClient, path, encoding):
+    response, raw = _get_raw(client, path, encoding)
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert decompress(raw, encoding) == BODY
+    if path == "/plain":
+        assert response.headers["Content-Length"] == str(len(raw))
+    else:
+        # length of the compressed stream is not known before it is sent
+        assert "Content-Length" not in response.headers
+
+
+def test_compression_middleware_identity(client: TestClient):
+    response, raw = _get_raw(client, "/plain", IDENTITY)
+    assert "Content-Encoding" not in response.headers
+    assert raw == BODY
+
+
+def test_compression_middleware_minimum_size(client: TestClient):
+    response, raw = _get_raw(client, "/small", ZSTD)
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Content-Length"] == str(len(SMALL_BODY))
+    assert raw == SMALL_BODY
+
+
+def test_compression_middleware_keeps_content_encoding(client: TestClient):
+    # precompressed response is not compressed again, even in another encoding
+    response, raw = _get_raw(client, "/precompressed", ZSTD)
+    assert response.headers["Content-Encoding"] == GZIP
+    assert raw == compress(BODY, GZIP)
+
+
+def test_compression_middleware_not_modified(client: TestClient):
+    response, raw = _get_raw(client, "/not_modified", GZIP)
+    assert response.status_code == 304
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] == '"1"'
+    assert raw == b""
+
+
+def _partial_decompressor(encoding: str):
+    if encoding == GZIP:
+        return zlib.decompressobj(31).decompress
+    if encoding == BROTLI:
+        return brotli.Decompressor().process
+    return zstandard.ZstdDecompressor().decompressobj().decompress
+
+
+@pytest.mark.parametrize("encoding", [ZSTD, BROTLI, GZIP])
+def test_compression_middleware_flushes_streamed_parts(encoding):
+    messages = []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            # client does not disconnect, streaming response listens for it
+            await asyncio.Event().wait()
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/streamed",
+        "raw_path": b"/streamed",
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": [(b"accept-encoding", encoding.encode())],
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+    }
+    asyncio.run(_app()(scope, receive, send))
+
+    bodies = [m for m in messages if m["type"] == "http.response.body"]
+    decompress_part = _partial_decompressor(encoding)
+    # each part can be decompressed as soon as it is received
+    for message, part in zip(bodies, STREAMED_PARTS):
+        assert message["more_body"]
+        assert decompress_part(message["body"]) == part
+    assert not bodies[-1].get("more_body", False)
@@ -0,0 +1,128 @@
+import asyncio
+import zlib
+
+import brotli
+import pytest
+import zstandard
+from cellstar_db.tests.conftest import TEST_ENTRY_PREPROCESSOR_INPUT
+from cellstar_db.utils.content_encoding import (
+    BROTLI,
+    GZIP,
+    IDENTITY,
+    PREFERRED_ENCODINGS,
+    ZSTD,
+    compress,
+    decompress,
+    negotiate_encoding,
+    stream_compressor,
+)
+from cellstar_query.core.service import VolumeServerService
+from cellstar_query.requests import (
+    MetadataRequest,
+    VolumeRequestDataKind,
+    VolumeRequestInfo,
+)
+
+CODEC_LEVELS = [
+    (GZIP, 3),
+    (GZIP, 6),
+    (BROTLI, 4),
+    (BROTLI, 6),
+    (BROTLI, 11),
+    (ZSTD, 3),
+    (ZSTD, 12),
+    (ZSTD, 19),
+]
+
+
+@pytest.fixture(scope="module")
+def bcif_payloads(testing_db) -> dict[str, bytes]:
+    service = VolumeServerService(testing_db)
+    source = TEST_ENTRY_PREPROCESSOR_INPUT["source_db"]
+    entry_id = TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"]
+
+    def cell_request(data_kind: VolumeRequestDataKind) -> VolumeRequestInfo:
+        return VolumeRequestInfo(
+            source=source,
+            structure_id=entry_id,
+            channel_id="0",
+            segmentation_id="0",
+            time=0,
+            max_points=0,
+            data_kind=data_kind,
+        )
+
+    return {
+        "volume": asyncio.run(
+            service.get_volume_data(cell_request(VolumeRequestDataKind.volume))
+        ),
+        "segmentation": asyncio.run(
+            service.get_volume_data(cell_request(VolumeRequestDataKind.segmentation))
+        ),
+        "volume_info": asyncio.run(
+            service.get_volume_info(
+                MetadataRequest(source=source, structure_id=entry_id)
+            )
+        ),
+    }
+
+
+def test_compress_roundtrip(bcif_payloads):
+    for data in bcif_payloads.values():
+        for encoding in PREFERRED_ENCODINGS + (IDENTITY,):
+            assert decompress(compress(data, encoding), encoding) == data
+
+
+def _partial_decompressor(encoding: str):
+    if encoding == GZIP:
+        return zlib.decompressobj(31).decompress
+    if encoding == BROTLI:
+        return brotli.Decompressor().process
+    return zstandard.ZstdDecompressor().decompressobj().decompress
+
+
+def test_stream_compressor_roundtrip(bcif_payloads):
+    data = bcif_payloads["volume"]
+    part_size = 10000
+    for encoding in PREFERRED_ENCODINGS:
+        compressor = stream_compressor(encoding)
+        decompress_part = _partial_decompressor(encoding)
+        compressed = b""
+        for i in range(0, len(data), part_size):
+            part = compressor.compress(data[i : i + part_size]) + compressor.sync()
+            # each synced part can be decompressed before the stream ends
+            assert decompress_part(part) == data[i : i + part_size]
+            compressed += part
+        compressed += compressor.flush()
+        assert decompress(compressed, encoding) == data
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, IDENTITY),
+        ("", IDENTITY),
+        ("gzip, deflate", GZIP),
+        ("gzip, deflate, br", BROTLI),
+        ("gzip, deflate, br, zstd", ZSTD),
+        ("zstd;q=0, br;q=0.5, gzip", BROTLI),
+        ("*", ZSTD),
+        ("zstd;q=0, *;q=0.1", BROTLI),
+        ("deflate, identity", IDENTITY),
+        ("GZIP", GZIP),
+    ],
+)
+def test_negotiate_encoding(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+@pytest.mark.parametrize("payload", ["volume", "segmentation"])
+@pytest.mark.parametrize("encoding, level", CODEC_LEVELS)
+def test_benchmark_compress_bcif(
+    bcif_payloads, benchmark, payload: str, encoding: str, level: int
+):
+    benchmark.group = f"compress {payload} BinaryCIF"
+    data = bcif_payloads[payload]
+    compressed = benchmark(lambda: compress(data, encoding, level))
+    benchmark.extra_info["ratio"] = len(compressed) / len(data)
+    assert decompress(compressed, encoding) == data
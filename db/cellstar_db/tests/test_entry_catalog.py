@@ -0,0 +1,199 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+from cellstar_db.file_system.constants import (
+    ANNOTATION_METADATA_FILENAME,
+    ENTRY_CATALOG_FILENAME,
+    GRID_METADATA_FILENAME,
+    ZIP_STORE_DATA_ZIP_NAME,
+)
+from cellstar_db.file_system.db import FileSystemVolumeServerDB
+from cellstar_db.tests.conftest import TEST_ENTRY_PREPROCESSOR_INPUT
+from cellstar_query.core.service import VolumeServerService
+from cellstar_query.requests import CatalogEntriesRequest, EntriesRequest
+
+
+def _create_entry(
+    folder: Path, namespace: str, key: str, kinds: dict[str, list], size: int
+):
+    entry_path = folder / namespace / key
+    entry_path.mkdir(parents=True)
+    with open(entry_path / ZIP_STORE_DATA_ZIP_NAME, "wb") as f:
+        f.write(b"0" * size)
+    metadata = {
+        "entry_id": {"source_db_name": namespace, "source_db_id": key},
+        "volumes": {"channel_ids": kinds.get("volumes", [])},
+        "segmentation_lattices": {
+            "segmentation_ids": kinds.get("segmentation_lattices", [])
+        },
+        "segmentation_meshes": {
+            "segmentation_ids": kinds.get("segmentation_meshes", [])
+        },
+        "geometric_segmentation": {
+            "segmentation_ids": kinds.get("geometric_segmentation", [])
+        },
+    }
+    with open(entry_path / GRID_METADATA_FILENAME, "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+
+
+@pytest.fixture
+def catalog_db(tmp_path: Path):
+    _create_entry(tmp_path, "emdb", "emd-1832", {"volumes": ["0"]}, size=10)
+    _create_entry(
+        tmp_path,
+        "emdb",
+        "emd-1181",
+        {"volumes": ["0"], "segmentation_lattices": ["0"]},
+        size=20,
+    )
+    _create_entry(
+        tmp_path,
+        "emdb",
+        "emd-99999",
+        {"volumes": ["0"], "segmentation_meshes": ["0"]},
+        size=30,
+    )
+    _create_entry(
+        tmp_path,
+        "empiar",
+        "empiar-10070",
+        {"volumes": ["0", "1"], "segmentation_meshes": ["0"]},
+        size=40,
+    )
+    (tmp_path / "empty_source").mkdir()
+    return FileSystemVolumeServerDB(tmp_path)
+
+
+def _ids(page) -> list[tuple[str, str]]:
+    return [(e["source"], e["entry_id"]) for e in page["entries"]]
+
+
+@pytest.mark.asyncio
+async def test_entry_catalog_listing(catalog_db: FileSystemVolumeServerDB):
+    assert await catalog_db.list_sources() == ["emdb", "empiar"]
+    assert await catalog_db.list_entries("emdb", 2) == ["emd-1181", "emd-1832"]
+    assert (catalog_db.folder / ENTRY_CATALOG_FILENAME).exists()
+
+    page = await catalog_db.list_catalog_entries(10)
+    assert _ids(page) == [
+        ("emdb", "emd-1181"),
+        ("emdb", "emd-1832"),
+        ("emdb", "emd-99999"),
+        ("empiar", "empiar-10070"),
+    ]
+    assert page["next_cursor"] is None
+    entry = page["entries"][3]
+    assert entry["size"] > 40
+    assert entry["data_kinds"] == ["volume", "mesh_segmentation"]
+    assert entry["created_at"] == entry["updated_at"]
+
+    # cursor pagination
+    pages = []
+    cursor = None
+    while True:
+        page = await catalog_db.list_catalog_entries(3, cursor=cursor)
+        pages.append(_ids(page))
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == [
+        [("emdb", "emd-1181"), ("emdb", "emd-1832"), ("emdb", "emd-99999")],
+        [("empiar", "empiar-10070")],
+    ]
+
+    # filters
+    page = await catalog_db.list_catalog_entries(10, data_kinds=["mesh_segmentation"])
+    assert _ids(page) == [("emdb", "emd-99999"), ("empiar", "empiar-10070")]
+    page = await catalog_db.list_catalog_entries(
+        1, source="emdb", data_kinds=["volume"], entry_id_prefix="emd-1"
+    )
+    assert _ids(page) == [("emdb", "emd-1181")]
+    page = await catalog_db.list_catalog_entries(
+        1, source="emdb", data_kinds=["volume"], cursor=page["next_cursor"]
+    )
+    assert _ids(page) == [("emdb", "emd-1832")]
+
+    with pytest.raises(ValueError):
+        await catalog_db.list_catalog_entries(10, data_kinds=["unknown"])
+    with pytest.raises(ValueError):
+        await catalog_db.list_catalog_entries(10, cursor="emd-1181")
+
+
+@pytest.mark.asyncio
+async def test_entry_catalog_is_persisted(catalog_db: FileSystemVolumeServerDB):
+    await catalog_db.list_sources()
+    # entries added behind the back of the catalog are not listed
+    _create_entry(catalog_db.folder, "emdb", "emd-0001", {}, size=1)
+
+    db = FileSystemVolumeServerDB(catalog_db.folder)
+    assert await db.list_entries("emdb", 10) == ["emd-1181", "emd-1832", "emd-99999"]
+
+    # catalog is rebuilt if the file is missing
+    (catalog_db.folder / ENTRY_CATALOG_FILENAME).unlink()
+    assert await db.list_entries("emdb", 10) == [
+        "emd-0001",
+        "emd-1181",
+        "emd-1832",
+        "emd-99999",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_entry_catalog_is_updated(catalog_db: FileSystemVolumeServerDB):
+    entry = catalog_db.entry_catalog.get_entry("emdb", "emd-1832")
+
+    annotations = {
+        "name": "Drosophila replication complex",
+        "entry_id": {"source_db_name": "emdb", "source_db_id": "emd-1832"},
+        "descriptions": {},
+        "segment_annotations": [],
+        "details": None,
+    }
+    with open(
+        catalog_db._path_to_object("emdb", "emd-1832") / ANNOTATION_METADATA_FILENAME,
+        "w",
+        encoding="utf-8",
+    ) as f:
+        json.dump(annotations, f)
+    with catalog_db.edit_annotations("emdb", "emd-1832") as ctx:
+        await ctx.add_or_modify_descriptions(
+            [{"id": "1", "name": "Nucleosome", "external_references": []}]
+        )
+
+    updated = catalog_db.entry_catalog.get_entry("emdb", "emd-1832")
+    assert updated["created_at"] == entry["created_at"]
+    assert updated["updated_at"] > entry["updated_at"]
+    assert updated["size"] > entry["size"]
+
+    await catalog_db.delete("emdb", "emd-1832")
+    assert catalog_db.entry_catalog.get_entry("emdb", "emd-1832") is None
+    assert await catalog_db.list_entries("emdb", 10) == ["emd-1181", "emd-99999"]
+
+
+@pytest.mark.asyncio
+async def test_entry_catalog_store(testing_db, tmp_path):
+    source = TEST_ENTRY_PREPROCESSOR_INPUT["source_db"]
+    entry_id = TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"]
+    db = FileSystemVolumeServerDB(tmp_path / "db")
+    assert await db.list_sources() == []
+
+    # entry files as returned by the preprocessor
+    temp_store_path = tmp_path / "temp"
+    shutil.copytree(testing_db._path_to_object(source, entry_id), temp_store_path)
+    (temp_store_path / ZIP_STORE_DATA_ZIP_NAME).unlink()
+    await db.store(source, entry_id, temp_store_path)
+
+    page = await db.list_catalog_entries(10)
+    assert _ids(page) == [(source, entry_id)]
+    assert "volume" in page["entries"][0]["data_kinds"]
+
+    service = VolumeServerService(db)
+    assert await service.get_entries(EntriesRequest(limit=10, keyword="")) == {
+        source: [entry_id]
+    }
+    assert await service.get_catalog_entries(
+        CatalogEntriesRequest(limit=10, data_kinds=["volume"])
+    ) == await db.list_catalog_entries(10)
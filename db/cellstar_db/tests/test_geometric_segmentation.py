@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+
+import pytest
+from cellstar_db.file_system import read_context
+from cellstar_db.file_system.constants import GEOMETRIC_SEGMENTATION_FILENAME
+from cellstar_db.file_system.db import FileSystemVolumeServerDB
+from cellstar_db.models import GeometricSegmentationJson
+from cellstar_db.tests.conftest import TEST_ENTRY_PREPROCESSOR_INPUT
+from cellstar_query.core.service import VolumeServerService
+from cellstar_query.requests import GeometricSegmentationRequest
+
+SOURCE = TEST_ENTRY_PREPROCESSOR_INPUT["source_db"]
+ENTRY_ID = TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"]
+
+
+def _geometric_segmentations(radius: float) -> GeometricSegmentationJson:
+    return [
+        {
+            "segmentation_id": segmentation_id,
+            "primitives": {
+                str(time): {
+                    "shape_primitive_list": [
+                        {
+                            "id": i,
+                            "kind": "sphere",
+                            "center": [i, time, 0],
+                            "radius": radius,
+                        }
+                        for i in range(count)
+                    ]
+                }
+                for time in range(3)
+            },
+        }
+        for segmentation_id, count in (("a", 2), ("b", 5))
+    ]
+
+
+def _write(path, data: GeometricSegmentationJson, mtime: int):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.utime(path, (mtime, mtime))
+
+
+def _request(segmentation_id: str, time: int) -> GeometricSegmentationRequest:
+    return GeometricSegmentationRequest(
+        source=SOURCE, structure_id=ENTRY_ID, segmentation_id=segmentation_id, time=time
+    )
+
+
+@pytest.mark.asyncio
+async def test_geometric_segmentation_index(testing_db, tmp_path, monkeypatch):
+    shutil.copytree(testing_db.folder / SOURCE / ENTRY_ID, tmp_path / SOURCE / ENTRY_ID)
+    db = FileSystemVolumeServerDB(folder=tmp_path, store_type="zip")
+    db.metadata_cache.revalidate_interval = 0
+    service = VolumeServerService(db)
+
+    loads = []
+    load_index = read_context._load_geometric_segmentation_index
+
+    def counting_load_index(path):
+        loads.append(path)
+        return load_index(path)
+
+    monkeypatch.setattr(
+        read_context, "_load_geometric_segmentation_index", counting_load_index
+    )
+
+    path = tmp_path / SOURCE / ENTRY_ID / GEOMETRIC_SEGMENTATION_FILENAME
+    data = _geometric_segmentations(radius=1.0)
+    _write(path, data, mtime=1_000_000)
+    for segmentation in data:
+        for time, timeframe_data in segmentation["primitives"].items():
+            assert (
+                await service.get_geometric_segmentation(
+                    _request(segmentation["segmentation_id"], int(time))
+                )
+                == timeframe_data
+            )
+    # parsed once
+    assert len(loads) == 1
+
+    with pytest.raises(Exception):
+        await service.get_geometric_segmentation(_request("a", 3))
+    with pytest.raises(Exception):
+        await service.get_geometric_segmentation(_request("c", 0))
+
+    # rewritten file is parsed again
+    data = _geometric_segmentations(radius=2.0)
+    _write(path, data, mtime=2_000_000)
+    assert (
+        await service.get_geometric_segmentation(_request("b", 2))
+        == data[1]["primitives"]["2"]
+    )
+    assert len(loads) == 2
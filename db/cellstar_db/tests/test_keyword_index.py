@@ -0,0 +1,116 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from cellstar_db.file_system.constants import (
+    ANNOTATION_METADATA_FILENAME,
+    KEYWORD_INDEX_FILENAME,
+    ZIP_STORE_DATA_ZIP_NAME,
+)
+from cellstar_db.file_system.db import FileSystemVolumeServerDB
+
+
+def _create_entry(folder: Path, namespace: str, key: str, name: str):
+    entry_path = folder / namespace / key
+    entry_path.mkdir(parents=True)
+    (entry_path / ZIP_STORE_DATA_ZIP_NAME).touch()
+    annotations = {
+        "name": name,
+        "entry_id": {"source_db_name": namespace, "source_db_id": key},
+        "descriptions": {
+            "1": {
+                "id": "1",
+                "name": "Ribosome",
+                "external_references": [
+                    {"id": 1, "resource": "UniProt", "label": "MCM4_DROME"}
+                ],
+            }
+        },
+        "segment_annotations": [],
+        "details": None,
+    }
+    with open(entry_path / ANNOTATION_METADATA_FILENAME, "w", encoding="utf-8") as f:
+        json.dump(annotations, f)
+
+
+@pytest.fixture
+def keyword_db(tmp_path: Path):
+    _create_entry(tmp_path, "emdb", "emd-1832", "Drosophila replication complex")
+    _create_entry(tmp_path, "emdb", "emd-99999", "Human ribosome")
+    _create_entry(tmp_path, "empiar", "empiar-10070", "Drosophila cell")
+    return FileSystemVolumeServerDB(tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_keyword_search(keyword_db: FileSystemVolumeServerDB):
+    assert await keyword_db.search_entries("drosoph", limit=10) == {
+        "emdb": ["emd-1832"],
+        "empiar": ["empiar-10070"],
+    }
+    assert await keyword_db.search_entries("emd-1832", limit=10) == {
+        "emdb": ["emd-1832"]
+    }
+    assert await keyword_db.search_entries("mcm4", limit=10) == {
+        "emdb": ["emd-1832", "emd-99999"],
+        "empiar": ["empiar-10070"],
+    }
+    assert await keyword_db.search_entries("human drosophila", limit=10) == {}
+
+    # paging
+    assert await keyword_db.search_entries("uniprot", limit=2, offset=1) == {
+        "emdb": ["emd-99999"],
+        "empiar": ["empiar-10070"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_keyword_index_is_updated_incrementally(
+    keyword_db: FileSystemVolumeServerDB,
+):
+    assert await keyword_db.search_entries("nucleosome", limit=10) == {}
+    with keyword_db.edit_annotations("emdb", "emd-99999") as ctx:
+        await ctx.add_or_modify_descriptions(
+            [{"id": "2", "name": "Nucleosome", "external_references": []}]
+        )
+    assert await keyword_db.search_entries("nucleo", limit=10) == {
+        "emdb": ["emd-99999"]
+    }
+
+    # index is persisted in the db folder
+    assert (keyword_db.folder / KEYWORD_INDEX_FILENAME).exists()
+    other_db = FileSystemVolumeServerDB(keyword_db.folder)
+    assert await other_db.search_entries("nucleo", limit=10) == {"emdb": ["emd-99999"]}
+
+    await keyword_db.delete("emdb", "emd-99999")
+    assert await keyword_db.search_entries("nucleo", limit=10) == {}
+    assert await other_db.search_entries("nucleo", limit=10) == {}
+
+
+@pytest.mark.asyncio
+async def test_keyword_index_concurrent_writers(keyword_db: FileSystemVolumeServerDB):
+    # e.g. server and preprocessor updating entries at the same time
+    other_db = FileSystemVolumeServerDB(keyword_db.folder)
+    assert await other_db.search_entries("drosophila", limit=10) != {}
+
+    def update(db: FileSystemVolumeServerDB, namespace: str, key: str, name: str):
+        for i in range(20):
+            db.keyword_index.update_entry(
+                namespace, key, {"name": f"{name} {i}", "descriptions": {}}
+            )
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(update, keyword_db, "emdb", "emd-1832", "Histone"),
+            executor.submit(update, other_db, "empiar", "empiar-10070", "Histidine"),
+        ]
+        for future in futures:
+            future.result()
+
+    # updates of both writers are kept
+    assert await keyword_db.search_entries("hist 19", limit=10) == {
+        "emdb": ["emd-1832"],
+        "empiar": ["empiar-10070"],
+    }
+    assert await other_db.search_entries("histone", limit=10) == {"emdb": ["emd-1832"]}
+    assert await other_db.search_entries("drosophila", limit=10) == {}
@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+from cellstar_db.tests.conftest import (
+    TEST_ENTRY_PREPROCESSOR_INPUT,
+    TEST_MESH_SEGMENT_DETAIL_LVLS,
+    TEST_MESH_SEGMENTATION_ID,
+)
+from cellstar_query.core.service import VolumeServerService
+from cellstar_query.requests import MeshBatchRequest
+from ciftools.serialization import loads
+
+
+def _request(**kwargs) -> MeshBatchRequest:
+    return MeshBatchRequest(
+        source=TEST_ENTRY_PREPROCESSOR_INPUT["source_db"],
+        structure_id=TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"],
+        segmentation_id=TEST_MESH_SEGMENTATION_ID,
+        time=0,
+        **kwargs,
+    )
+
+
+async def _read_meshes(db, segment_id: int, detail_lvl: int):
+    with db.read(
+        TEST_ENTRY_PREPROCESSOR_INPUT["source_db"],
+        TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"],
+    ) as context:
+        return await context.read_meshes(
+            segmentation_id=TEST_MESH_SEGMENTATION_ID,
+            time=0,
+            segment_id=segment_id,
+            detail_lvl=detail_lvl,
+        )
+
+
+async def _check_batch(db, bcif: bytes, detail_lvls: dict[int, int]):
+    meshes_block = loads(bcif, lazy=False).data_blocks[1]
+    mesh = meshes_block["mesh"]
+    vertex = meshes_block["mesh_vertex"]
+    triangle = meshes_block["mesh_triangle"]
+
+    assert sorted(set(mesh["segment_id"].as_ndarray())) == sorted(detail_lvls)
+    for segment_id, detail_lvl in detail_lvls.items():
+        meshes = await _read_meshes(db, segment_id, detail_lvl)
+        in_segment = mesh["segment_id"].as_ndarray() == segment_id
+        assert sorted(mesh["id"].as_ndarray()[in_segment]) == sorted(
+            m["mesh_id"] for m in meshes
+        )
+
+        vertices_in_segment = vertex["segment_id"].as_ndarray() == segment_id
+        triangles_in_segment = triangle["segment_id"].as_ndarray() == segment_id
+        for m in meshes:
+            vertices_in_mesh = vertices_in_segment & (
+                vertex["mesh_id"].as_ndarray() == m["mesh_id"]
+            )
+            coords = np.stack(
+                [vertex[c].as_ndarray()[vertices_in_mesh] for c in ("x", "y", "z")],
+                axis=1,
+            )
+            np.testing.assert_allclose(coords, m["vertices"], atol=1e-3)
+
+            triangles_in_mesh = triangles_in_segment & (
+                triangle["mesh_id"].as_ndarray() == m["mesh_id"]
+            )
+            np.testing.assert_array_equal(
+                triangle["vertex_id"].as_ndarray()[triangles_in_mesh],
+                m["triangles"].ravel(),
+            )
+
+
+@pytest.mark.asyncio
+async def test_meshes_bcif_batch_all_segments(testing_mesh_db):
+    service = VolumeServerService(testing_mesh_db)
+
+    bcif = await service.get_meshes_bcif_batch(_request(detail_lvl=1))
+    await _check_batch(
+        testing_mesh_db, bcif, {s: 1 for s in TEST_MESH_SEGMENT_DETAIL_LVLS}
+    )
+
+    # segments that were not simplified that far get their coarsest level
+    bcif = await service.get_meshes_bcif_batch(_request(detail_lvl=3))
+    await _check_batch(testing_mesh_db, bcif, TEST_MESH_SEGMENT_DETAIL_LVLS)
+
+
+@pytest.mark.asyncio
+async def test_meshes_bcif_batch_segment_ids(testing_mesh_db):
+    service = VolumeServerService(testing_mesh_db)
+
+    bcif = await service.get_meshes_bcif_batch(
+        _request(segment_ids=[5, 1], detail_lvl=2)
+    )
+    await _check_batch(testing_mesh_db, bcif, {5: 1, 1: 2})
+
+    with pytest.raises(KeyError):
+        await service.get_meshes_bcif_batch(_request(segment_ids=[1, 3], detail_lvl=1))
+
+
+@pytest.mark.asyncio
+async def test_meshes_bcif_batch_max_triangles(testing_mesh_db):
+    service = VolumeServerService(testing_mesh_db)
+
+    async def triangle_count(detail_lvl: int) -> int:
+        count = 0
+        for segment_id, detail_lvl_count in TEST_MESH_SEGMENT_DETAIL_LVLS.items():
+            meshes = await _read_meshes(
+                testing_mesh_db, segment_id, min(detail_lvl, detail_lvl_count)
+            )
+            count += sum(len(m["triangles"]) for m in meshes)
+        return count
+
+    counts = [await triangle_count(detail_lvl) for detail_lvl in (1, 2, 3)]
+    assert counts[0] > counts[1] > counts[2]
+
+    for max_triangles, expected_lvl in [
+        (counts[0], 1),
+        (counts[0] - 1, 2),
+        (counts[2], 3),
+        # nothing fits, the coarsest level
+        (0, 3),
+    ]:
+        bcif = await service.get_meshes_bcif_batch(
+            _request(max_triangles=max_triangles)
+        )
+        await _check_batch(
+            testing_mesh_db,
+            bcif,
+            {
+                s: min(expected_lvl, detail_lvl_count)
+                for s, detail_lvl_count in TEST_MESH_SEGMENT_DETAIL_LVLS.items()
+            },
+        )
+
+
+def test_meshes_batch_request_detail():
+    with pytest.raises(ValueError):
+        _request()
+    with pytest.raises(ValueError):
+        _request(detail_lvl=1, max_triangles=100)
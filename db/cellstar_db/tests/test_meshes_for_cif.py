@@ -0,0 +1,210 @@
+import numpy as np
+import pytest
+from cellstar_db.models import MeshesData
+from cellstar_db.tests.conftest import (
+    TEST_ENTRY_PREPROCESSOR_INPUT,
+    TEST_MESH_SEGMENTATION_ID,
+)
+from cellstar_query.core.prepared_meshes_cache import PreparedMeshesCache
+from cellstar_query.core.service import VolumeServerService
+from cellstar_query.requests import MeshBatchRequest, MeshRequest
+from cellstar_query.serialization.data.meshes_for_cif import MeshesForCif, WithArrays
+
+COLUMNS = (
+    "mesh__id",
+    "vertex__mesh_id",
+    "vertex__vertex_id",
+    "vertex__x",
+    "vertex__y",
+    "vertex__z",
+    "triangle__mesh_id",
+    "triangle__vertex_id",
+    "mesh__segment_id",
+    "vertex__segment_id",
+    "triangle__segment_id",
+)
+
+
+def _reference_columns(meshes: MeshesData, segment_ids=None) -> dict:
+    """Columns as built by the original per-mesh loop"""
+    if len(meshes) > 0:
+        coord_type = meshes[0]["vertices"].dtype
+        index_type = meshes[0]["triangles"].dtype
+    else:
+        coord_type = np.float32
+        index_type = np.uint32
+
+    columns = {
+        "mesh__id": np.array([m["mesh_id"] for m in meshes], dtype=index_type),
+        "vertex__mesh_id": np.array([], dtype=index_type),
+        "vertex__vertex_id": np.array([], dtype=index_type),
+        "vertex__x": np.array([], dtype=coord_type),
+        "vertex__y": np.array([], dtype=coord_type),
+        "vertex__z": np.array([], dtype=coord_type),
+        "triangle__mesh_id": np.array([], dtype=index_type),
+        "triangle__vertex_id": np.array([], dtype=index_type),
+    }
+    for m in meshes:
+        nv, nt = len(m["vertices"]), 3 * len(m["triangles"])
+        for name, values in (
+            ("vertex__mesh_id", np.full(nv, m["mesh_id"])),
+            ("vertex__vertex_id", np.arange(nv)),
+            ("vertex__x", m["vertices"][:, 0]),
+            ("vertex__y", m["vertices"][:, 1]),
+            ("vertex__z", m["vertices"][:, 2]),
+            ("triangle__mesh_id", np.full(nt, m["mesh_id"])),
+            ("triangle__vertex_id", m["triangles"].ravel()),
+        ):
+            columns[name] = np.concatenate(
+                [columns[name], values.astype(columns[name].dtype)]
+            )
+    if segment_ids is not None:
+        columns["mesh__segment_id"] = np.array(segment_ids, dtype=index_type)
+        columns["vertex__segment_id"] = np.repeat(
+            columns["mesh__segment_id"], [len(m["vertices"]) for m in meshes]
+        )
+        columns["triangle__segment_id"] = np.repeat(
+            columns["mesh__segment_id"], [3 * len(m["triangles"]) for m in meshes]
+        )
+    return {
+        name: WithArrays.try_shrink_uint_array(value) for name, value in columns.items()
+    }
+
+
+def _assert_columns_equal(meshes_for_cif: MeshesForCif, expected: dict):
+    for name in COLUMNS:
+        value = getattr(meshes_for_cif, name)
+        if name not in expected:
+            assert value is None, name
+            continue
+        assert value.dtype == expected[name].dtype, name
+        np.testing.assert_array_equal(value, expected[name], err_msg=name)
+
+
+def _random_meshes(
+    rng: np.random.Generator, mesh_ids: list[int], max_vertices: int
+) -> MeshesData:
+    meshes = []
+    for mesh_id in mesh_ids:
+        vertex_count = int(rng.integers(0, max_vertices))
+        meshes.append(
+            {
+                "mesh_id": mesh_id,
+                "vertices": rng.random((vertex_count, 3), dtype=np.float32),
+                "triangles": rng.integers(
+                    0, max(vertex_count, 1), (2 * vertex_count, 3), dtype=np.int32
+                ),
+            }
+        )
+    return meshes
+
+
+@pytest.mark.parametrize(
+    "mesh_ids, max_vertices",
+    [
+        ([], 10),
+        ([0], 1),
+        ([3, 1, 7], 20),
+        (list(range(300)), 5),
+        ([70000, 2], 300),
+    ],
+)
+def test_meshes_for_cif(mesh_ids, max_vertices):
+    meshes = _random_meshes(np.random.default_rng(0), mesh_ids, max_vertices)
+    _assert_columns_equal(MeshesForCif(meshes), _reference_columns(meshes))
+
+    segment_ids = [i % 3 * 100 for i in range(len(meshes))]
+    _assert_columns_equal(
+        MeshesForCif(meshes, segment_ids), _reference_columns(meshes, segment_ids)
+    )
+
+
+def test_meshes_for_cif_concatenate():
+    rng = np.random.default_rng(1)
+    segments = {
+        1: _random_meshes(rng, [0, 1], 10),
+        300: _random_meshes(rng, list(range(260)), 4),
+        2: _random_meshes(rng, [5], 1),
+    }
+    meshes = [m for segment_meshes in segments.values() for m in segment_meshes]
+    segment_ids = [s for s, segment_meshes in segments.items() for _ in segment_meshes]
+
+    concatenated = MeshesForCif.concatenate(
+        [MeshesForCif(segment_meshes) for segment_meshes in segments.values()],
+        list(segments.keys()),
+    )
+    _assert_columns_equal(concatenated, _reference_columns(meshes, segment_ids))
+
+
+def _mesh_request(segment_id: int, detail_lvl: int) -> MeshRequest:
+    return MeshRequest(
+        source=TEST_ENTRY_PREPROCESSOR_INPUT["source_db"],
+        structure_id=TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"],
+        segmentation_id=TEST_MESH_SEGMENTATION_ID,
+        segment_id=segment_id,
+        detail_lvl=detail_lvl,
+        time=0,
+    )
+
+
+@pytest.mark.asyncio
+async def test_prepared_meshes_cache(testing_mesh_db):
+    service = VolumeServerService(testing_mesh_db)
+    cache = PreparedMeshesCache(max_bytes=10**8)
+    cached_service = VolumeServerService(testing_mesh_db, prepared_meshes_cache=cache)
+
+    for _ in range(2):
+        for segment_id, detail_lvl in [(1, 1), (1, 2), (5, 1)]:
+            req = _mesh_request(segment_id, detail_lvl)
+            assert await cached_service.get_meshes_bcif(
+                req
+            ) == await service.get_meshes_bcif(req)
+    assert cache.stats()["misses"] == 3
+    assert cache.stats()["hits"] == 3
+
+    batch_req = MeshBatchRequest(
+        source=TEST_ENTRY_PREPROCESSOR_INPUT["source_db"],
+        structure_id=TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"],
+        segmentation_id=TEST_MESH_SEGMENTATION_ID,
+        time=0,
+        segment_ids=[5, 1],
+        detail_lvl=1,
+    )
+    # batch is concatenated from the cached segments
+    assert await cached_service.get_meshes_bcif_batch(
+        batch_req
+    ) == await service.get_meshes_bcif_batch(batch_req)
+    assert cache.stats()["hits"] == 5
+
+    # items of an older version of the entry are not used
+    key = (
+        TEST_ENTRY_PREPROCESSOR_INPUT["source_db"],
+        TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"],
+        TEST_MESH_SEGMENTATION_ID,
+        0,
+        1,
+        1,
+    )
+    assert cache.get(key, "older version") is None
+    assert cache.stats()["items"] == 2
+
+
+def test_prepared_meshes_cache_max_bytes():
+    rng = np.random.default_rng(0)
+    items = [MeshesForCif(_random_meshes(rng, [0, 1], 50)) for _ in range(3)]
+    cache = PreparedMeshesCache(max_bytes=items[1].nbytes() + items[2].nbytes())
+
+    for i, item in enumerate(items):
+        cache.put(("emdb", "entry", "0", 0, i, 1), "v", item)
+    # the least recently used one is evicted
+    assert cache.get(("emdb", "entry", "0", 0, 0, 1), "v") is None
+    assert cache.get(("emdb", "entry", "0", 0, 2, 1), "v") is items[2]
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_benchmark_meshes_for_cif(benchmark):
+    # many small meshes, e.g. a segment of vesicles
+    meshes = _random_meshes(np.random.default_rng(0), list(range(5000)), 60)
+    benchmark.group = "prepare meshes for cif"
+    meshes_for_cif = benchmark(MeshesForCif, meshes)
+    assert len(meshes_for_cif.mesh__id) == len(meshes)
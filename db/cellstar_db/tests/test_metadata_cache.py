@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+from cellstar_db.file_system.metadata_cache import EntryFileCache
+
+
+def _load(path: Path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write(path: Path, d: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(d, f)
+
+
+def test_metadata_cache_warm_entry_does_not_touch_file_system(tmp_path: Path):
+    cache = EntryFileCache(revalidate_interval=3600)
+    path = tmp_path / "annotations.json"
+    _write(path, {"name": "a"})
+
+    first = cache.get(("emdb", "emd-1", "annotations.json"), path, _load)
+    path.unlink()
+    second = cache.get(("emdb", "emd-1", "annotations.json"), path, _load)
+    assert first is second
+
+    _write(path, {"name": "b"})
+    cache.invalidate("emdb", "emd-1")
+    assert cache.get(("emdb", "emd-1", "annotations.json"), path, _load) == {
+        "name": "b"
+    }
+
+
+def test_metadata_cache_revalidates_by_mtime(tmp_path: Path):
+    cache = EntryFileCache(revalidate_interval=0)
+    path = tmp_path / "metadata.json"
+    _write(path, {"name": "a"})
+
+    first = cache.get(("emdb", "emd-1", "metadata.json"), path, _load)
+    assert cache.get(("emdb", "emd-1", "metadata.json"), path, _load) is first
+
+    _write(path, {"name": "longer name"})
+    assert cache.get(("emdb", "emd-1", "metadata.json"), path, _load) == {
+        "name": "longer name"
+    }
+
+
+def test_metadata_cache_is_bounded(tmp_path: Path):
+    cache = EntryFileCache(max_size=2)
+    for i in range(3):
+        path = tmp_path / f"{i}.json"
+        _write(path, {"i": i})
+        cache.get(("emdb", str(i), "metadata.json"), path, _load)
+
+    assert len(cache) == 2
@@ -0,0 +1,138 @@
+import shutil
+
+import numpy as np
+import pytest
+import zarr
+from cellstar_db.file_system.constants import MESH_SEGMENTATION_DATA_GROUPNAME
+from cellstar_db.file_system.db import FileSystemVolumeServerDB
+from cellstar_db.file_system.packed_meshes import (
+    is_packed_mesh_list,
+    pack_entry_meshes,
+    pack_mesh_segmentation,
+    read_mesh_list,
+    write_packed_mesh_list,
+)
+from cellstar_db.models import MeshesData
+from cellstar_db.tests.conftest import (
+    TEST_ENTRY_PREPROCESSOR_INPUT,
+    TEST_MESH_SEGMENT_DETAIL_LVLS,
+    TEST_MESH_SEGMENTATION_ID,
+)
+
+SOURCE = TEST_ENTRY_PREPROCESSOR_INPUT["source_db"]
+ENTRY_ID = TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"]
+
+
+async def _read_all_meshes(db) -> dict[tuple[int, int], MeshesData]:
+    meshes = {}
+    with db.read(SOURCE, ENTRY_ID) as context:
+        for segment_id, detail_lvl_count in TEST_MESH_SEGMENT_DETAIL_LVLS.items():
+            for detail_lvl in range(1, detail_lvl_count + 1):
+                meshes[(segment_id, detail_lvl)] = await context.read_meshes(
+                    segmentation_id=TEST_MESH_SEGMENTATION_ID,
+                    time=0,
+                    segment_id=segment_id,
+                    detail_lvl=detail_lvl,
+                )
+    return meshes
+
+
+def _assert_meshes_equal(meshes: MeshesData, expected: MeshesData):
+    assert len(meshes) == len(expected)
+    for mesh, expected_mesh in zip(
+        sorted(meshes, key=lambda m: m["mesh_id"]),
+        sorted(expected, key=lambda m: m["mesh_id"]),
+    ):
+        assert mesh.keys() == expected_mesh.keys()
+        for name, value in expected_mesh.items():
+            if name == "mesh_id":
+                assert mesh[name] == value
+            else:
+                assert mesh[name].dtype == value.dtype
+                np.testing.assert_array_equal(mesh[name], value)
+
+
+def _open_data(db: FileSystemVolumeServerDB) -> zarr.ZipStore:
+    return zarr.ZipStore(
+        path=str(db.path_to_zarr_root_data(SOURCE, ENTRY_ID)), mode="r"
+    )
+
+
+@pytest.mark.asyncio
+async def test_pack_entry_meshes(testing_mesh_db, tmp_path):
+    db_path = tmp_path / "db"
+    shutil.copytree(testing_mesh_db.folder, db_path)
+    db = FileSystemVolumeServerDB(folder=db_path, store_type="zip")
+
+    legacy_meshes = await _read_all_meshes(db)
+    store = _open_data(db)
+    legacy_keys = [k for k in store.keys() if MESH_SEGMENTATION_DATA_GROUPNAME not in k]
+    store.close()
+
+    assert pack_entry_meshes(db, SOURCE, ENTRY_ID)
+    # already packed
+    assert not pack_entry_meshes(db, SOURCE, ENTRY_ID)
+
+    store = _open_data(db)
+    root = zarr.group(store)
+    timeframe_gr = root[MESH_SEGMENTATION_DATA_GROUPNAME][TEST_MESH_SEGMENTATION_ID][0]
+    for segment_id, detail_lvl_count in TEST_MESH_SEGMENT_DETAIL_LVLS.items():
+        for detail_lvl in range(1, detail_lvl_count + 1):
+            mesh_list_gr = timeframe_gr[segment_id][detail_lvl]
+            assert is_packed_mesh_list(mesh_list_gr)
+            assert len(list(mesh_list_gr.group_keys())) == 0
+    # the rest of the entry is not changed
+    assert [
+        k for k in store.keys() if MESH_SEGMENTATION_DATA_GROUPNAME not in k
+    ] == legacy_keys
+    store.close()
+
+    packed_meshes = await _read_all_meshes(db)
+    assert packed_meshes.keys() == legacy_meshes.keys()
+    for k, meshes in legacy_meshes.items():
+        _assert_meshes_equal(packed_meshes[k], meshes)
+
+
+def test_write_packed_mesh_list():
+    rng = np.random.default_rng(0)
+    meshes: MeshesData = [
+        {
+            "mesh_id": mesh_id,
+            "vertices": rng.random((vertex_count, 3), dtype=np.float32),
+            "triangles": rng.integers(
+                0, max(vertex_count, 1), (vertex_count * 2, 3), dtype=np.int32
+            ),
+        }
+        for mesh_id, vertex_count in [(3, 10), (1, 0), (7, 5)]
+    ]
+
+    group = zarr.group()
+    write_packed_mesh_list(group, meshes)
+    _assert_meshes_equal(read_mesh_list(group), meshes)
+
+    group = zarr.group()
+    write_packed_mesh_list(group, [])
+    assert read_mesh_list(group) == []
+
+
+def test_pack_mesh_segmentation_attrs():
+    source = zarr.group()
+    source.attrs["a"] = 1
+    mesh_gr = source.create_group("0/1/1/4")
+    mesh_gr.attrs["num_vertices"] = 2
+    mesh_gr.create_dataset("vertices", data=np.zeros((2, 3), dtype=np.float32))
+    mesh_gr.create_dataset("triangles", data=np.zeros((1, 3), dtype=np.int32))
+
+    dest = zarr.group()
+    pack_mesh_segmentation(source, dest)
+    assert dest.attrs["a"] == 1
+    _assert_meshes_equal(read_mesh_list(dest["0/1/1"]), read_mesh_list(source["0/1/1"]))
+
+    # packed layout can be packed again (e.g. when copying entry)
+    repacked = zarr.group()
+    pack_mesh_segmentation(dest, repacked)
+    _assert_meshes_equal(
+        read_mesh_list(repacked["0/1/1"]), read_mesh_list(source["0/1/1"])
+    )
+    assert repacked["0/1/1"].attrs.asdict() == dest["0/1/1"].attrs.asdict()
+    assert dest["0/1/1"].attrs["mesh_attrs"] == {"4": {"num_vertices": 2}}
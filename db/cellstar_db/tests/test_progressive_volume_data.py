@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from cellstar_db.tests.conftest import TEST_ENTRY_PREPROCESSOR_INPUT
+from cellstar_query.core.service import VolumeServerService
+from cellstar_query.requests import (
+    VolumeRequestBox,
+    VolumeRequestDataKind,
+    VolumeRequestInfo,
+)
+from ciftools.serialization import loads
+
+
+def _request(data_kind: VolumeRequestDataKind, max_points: int) -> VolumeRequestInfo:
+    return VolumeRequestInfo(
+        source=TEST_ENTRY_PREPROCESSOR_INPUT["source_db"],
+        structure_id=TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"],
+        channel_id="0",
+        segmentation_id="0",
+        time=0,
+        max_points=max_points,
+        data_kind=data_kind,
+    )
+
+
+def _values(data_block) -> np.ndarray:
+    for name in ("volume_data_3d", "segmentation_data_3d"):
+        if name in data_block:
+            return data_block[name]["values"].as_ndarray()
+    raise AssertionError("No values in data block")
+
+
+def _downsampling_rate(data_block) -> int:
+    return data_block["volume_data_3d_info"]["sample_rate"].get_integer(0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "data_kind",
+    [
+        VolumeRequestDataKind.volume,
+        VolumeRequestDataKind.segmentation,
+        VolumeRequestDataKind.all,
+    ],
+)
+@pytest.mark.parametrize(
+    "req_box",
+    [None, VolumeRequestBox(bottom_left=(1, 2, 3), top_right=(30, 40, 50))],
+)
+async def test_progressive_volume_data(testing_db, data_kind, req_box):
+    service = VolumeServerService(testing_db)
+    req = _request(data_kind, max_points=10**9)
+    blocks_per_level = 2 if data_kind == VolumeRequestDataKind.all else 1
+
+    parts = [
+        p async for p in await service.stream_progressive_volume_data(req, req_box)
+    ]
+    progressive = loads(b"".join(parts), lazy=False)
+    # single level response for the same max_points
+    finest = loads(await service.get_volume_data(req, req_box), lazy=False)
+
+    data_blocks = progressive.data_blocks[1:]
+    rates = [_downsampling_rate(b) for b in data_blocks[::blocks_per_level]]
+    # all levels, from the coarsest one
+    assert rates == sorted(rates, reverse=True)
+    assert len(rates) > 1
+    assert rates[-1] == _downsampling_rate(finest.data_blocks[1])
+
+    for progressive_block, finest_block in zip(
+        data_blocks[-blocks_per_level:], finest.data_blocks[1:]
+    ):
+        assert progressive_block.header == finest_block.header
+        np.testing.assert_array_equal(_values(progressive_block), _values(finest_block))
+
+
+@pytest.mark.asyncio
+async def test_progressive_volume_data_max_points(testing_db):
+    service = VolumeServerService(testing_db)
+    # only the coarsest level fits
+    req = _request(VolumeRequestDataKind.volume, max_points=0)
+
+    parts = [p async for p in await service.stream_progressive_volume_data(req)]
+    progressive = loads(b"".join(parts), lazy=False)
+    coarsest = await service.get_volume_data(req)
+
+    assert b"".join(parts) == coarsest
+    assert len(progressive.data_blocks) == 2
@@ -0,0 +1,99 @@
+from pathlib import Path
+
+import dask.array as da
+import numpy as np
+import pytest
+import zarr
+from cellstar_db.file_system.constants import (
+    QUANTIZATION_DATA_DICT_ATTR_NAME,
+    VOLUME_DATA_GROUPNAME,
+    ZIP_STORE_DATA_ZIP_NAME,
+)
+from cellstar_db.file_system.db import FileSystemVolumeServerDB
+from cellstar_db.utils.quantization import (
+    decode_quantized_data,
+    decode_quantized_data_lut,
+    quantize_data,
+)
+
+
+def _quantized_data_dict(output_dtype) -> dict:
+    rng = np.random.default_rng(0)
+    data = rng.normal(loc=0.5, scale=2.0, size=(20, 30, 40)).astype(np.float32)
+    # as in preprocessor, where quantization parameters are converted to python types
+    data_dict = quantize_data(da.from_array(data), output_dtype)
+    data_dict["data"] = data_dict["data"].compute()
+    return data_dict
+
+
+@pytest.mark.parametrize("output_dtype", [np.uint8, np.uint16])
+def test_lut_decoding_equals_decoding(output_dtype):
+    data_dict = _quantized_data_dict(output_dtype)
+    quantized = data_dict["data"]
+
+    expected = decode_quantized_data(dict(data_dict))
+    decoded = decode_quantized_data_lut(dict(data_dict))
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, expected)
+
+    # strided slice, as read by read context
+    data_dict["data"] = quantized[::2, 1:, ::3]
+    np.testing.assert_array_equal(
+        decode_quantized_data_lut(dict(data_dict)),
+        decode_quantized_data(dict(data_dict)),
+    )
+
+    data_dict["data"] = da.from_array(quantized, chunks=(7, 11, 13))
+    decoded_dask = decode_quantized_data_lut(dict(data_dict))
+    assert isinstance(decoded_dask, da.Array)
+    np.testing.assert_array_equal(decoded_dask.compute(), expected)
+
+
+def _create_quantized_entry(db_folder: Path, data_dict: dict):
+    entry_path = db_folder / "emdb" / "emd-0000"
+    entry_path.mkdir(parents=True)
+    store = zarr.ZipStore(
+        path=str(entry_path / ZIP_STORE_DATA_ZIP_NAME), compression=0, mode="w"
+    )
+    root = zarr.group(store)
+    arr = (
+        root.create_group(VOLUME_DATA_GROUPNAME)
+        .create_group("1")
+        .create_group("0")
+        .create_dataset("0", data=data_dict["data"], chunks=(8, 8, 8))
+    )
+    arr.attrs[QUANTIZATION_DATA_DICT_ATTR_NAME] = {
+        k: v for k, v in data_dict.items() if k != "data"
+    }
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_read_quantized_volume_slice_without_decoding(tmp_path: Path):
+    data_dict = _quantized_data_dict(np.uint8)
+    _create_quantized_entry(tmp_path, data_dict)
+    db = FileSystemVolumeServerDB(tmp_path)
+    box = ((2, 3, 4), (10, 20, 30))
+
+    with db.read("emdb", "emd-0000") as context:
+        decoded = await context.read_volume_slice(
+            down_sampling_ratio=1, box=box, channel_id="0", time=0
+        )
+        stored = await context.read_volume_slice(
+            down_sampling_ratio=1,
+            box=box,
+            channel_id="0",
+            time=0,
+            decode_quantized=False,
+        )
+
+    assert "volume_quantization" not in decoded
+    quantization = stored["volume_quantization"]
+    assert stored["volume_slice"].dtype == np.uint8
+    np.testing.assert_array_equal(
+        stored["volume_slice"], data_dict["data"][2:11, 3:21, 4:31]
+    )
+    np.testing.assert_array_equal(
+        decode_quantized_data({**quantization, "data": stored["volume_slice"]}),
+        decoded["volume_slice"],
+    )
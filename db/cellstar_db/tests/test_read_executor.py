@@ -0,0 +1,125 @@
+from pathlib import Path
+
+import numcodecs
+import numpy as np
+import pytest
+import zarr
+from cellstar_db.file_system.constants import (
+    LATTICE_SEGMENTATION_DATA_GROUPNAME,
+    VOLUME_DATA_GROUPNAME,
+    ZIP_STORE_DATA_ZIP_NAME,
+)
+from cellstar_db.file_system.db import FileSystemVolumeServerDB
+from cellstar_db.utils.executor import create_executor
+from fastapi import HTTPException
+
+
+def _create_volume_entry(
+    folder: Path, data: np.ndarray, segmentation: np.ndarray = None
+):
+    entry_path = folder / "emdb" / "test-1"
+    entry_path.mkdir(parents=True)
+    store = zarr.ZipStore(
+        path=str(entry_path / ZIP_STORE_DATA_ZIP_NAME),
+        compression=0,
+        allowZip64=True,
+        mode="w",
+    )
+    root = zarr.group(store)
+    root.create_group(VOLUME_DATA_GROUPNAME).create_group("1").create_group(
+        "0"
+    ).create_dataset("0", data=data, chunks=(4, 4, 4))
+    if segmentation is not None:
+        timeframe = (
+            root.create_group(LATTICE_SEGMENTATION_DATA_GROUPNAME)
+            .create_group("0")
+            .create_group("1")
+            .create_group("0")
+        )
+        timeframe.create_dataset("grid", data=segmentation, chunks=(4, 4, 4))
+        timeframe.create_dataset(
+            "set_table",
+            data=[{"1": [1], "2": [2]}],
+            dtype=object,
+            object_codec=numcodecs.JSON(),
+        )
+    store.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor_kind", ["thread", "process"])
+async def test_read_volume_slice_in_executor(tmp_path: Path, executor_kind: str):
+    data = np.arange(8 * 8 * 8, dtype=np.float32).reshape((8, 8, 8))
+    _create_volume_entry(tmp_path, data)
+    executor = create_executor(executor_kind, max_workers=1)
+    db = FileSystemVolumeServerDB(tmp_path, executor=executor)
+
+    with db.read("emdb", "test-1") as context:
+        volume_slice = await context.read_volume_slice(
+            down_sampling_ratio=1, box=((1, 2, 3), (5, 6, 7)), channel_id="0", time=0
+        )
+        np.testing.assert_array_equal(volume_slice["volume_slice"], data[1:6, 2:7, 3:8])
+
+        with pytest.raises(HTTPException) as e:
+            await context.read_volume_slice(
+                down_sampling_ratio=None,
+                box=((1, 2, 3), (5, 6, 7)),
+                channel_id="0",
+                time=0,
+            )
+        assert e.value.status_code == 404
+
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_read_slice_reads_volume_and_segmentation(tmp_path: Path):
+    data = np.arange(8 * 8 * 8, dtype=np.float32).reshape((8, 8, 8))
+    segmentation = (np.arange(8 * 8 * 8) % 2 + 1).astype(np.uint8).reshape((8, 8, 8))
+    _create_volume_entry(tmp_path, data, segmentation)
+    db = FileSystemVolumeServerDB(tmp_path)
+
+    with db.read("emdb", "test-1") as context:
+        d = await context.read_slice(
+            down_sampling_ratio=1,
+            box=((1, 2, 3), (5, 6, 7)),
+            channel_id="0",
+            time=0,
+            lattice_id="0",
+        )
+        np.testing.assert_array_equal(d["volume_slice"], data[1:6, 2:7, 3:8])
+        np.testing.assert_array_equal(
+            d["segmentation_slice"]["category_set_ids"], segmentation[1:6, 2:7, 3:8]
+        )
+        assert d["segmentation_slice"]["category_set_dict"] == {"1": [1], "2": [2]}
+        assert d["segmentation_slice"]["lattice_id"] == "0"
+        assert d["time"] == 0 and d["channel_id"] == "0"
+
+        with pytest.raises(HTTPException) as e:
+            await context.read_slice(
+                down_sampling_ratio=1,
+                box=((1, 2, 3), (5, 6, 7)),
+                channel_id="0",
+                time=0,
+                lattice_id=None,
+            )
+        assert "segmentation" in e.value.detail
+
+
+def _worker_store_pool_limits() -> tuple[int, int]:
+    from cellstar_db.file_system.store_pool import ENTRY_STORE_POOL
+
+    return ENTRY_STORE_POOL.max_open, ENTRY_STORE_POOL.chunk_cache.max_bytes
+
+
+def test_process_executor_applies_limits_to_workers():
+    executor = create_executor(
+        "process",
+        max_workers=1,
+        max_open_entry_stores=3,
+        decoded_chunk_cache_max_bytes=1024,
+    )
+    try:
+        assert executor.submit(_worker_store_pool_limits).result() == (3, 1024)
+    finally:
+        executor.shutdown()
@@ -0,0 +1,157 @@
+from pathlib import Path
+
+from cellstar_db.utils.content_encoding import GZIP, IDENTITY
+from cellstar_query.core.response_cache import ResponseCache
+
+ENTRY = ("emdb", "emd-1832")
+
+
+def _put(cache: ResponseCache, request: str, response: bytes, version="v1", **kwargs):
+    cache.put("volume", ENTRY, request, version, response, **kwargs)
+
+
+def _get(cache: ResponseCache, request: str, version="v1", **kwargs):
+    return cache.get("volume", ENTRY, request, version, **kwargs)
+
+
+def _spill_files(cache: ResponseCache) -> list[Path]:
+    return sorted(cache.spill_dir.iterdir())
+
+
+def test_response_cache_lru_eviction_by_bytes():
+    cache = ResponseCache(max_bytes=30)
+    _put(cache, "a", b"a" * 10)
+    _put(cache, "b", b"b" * 10)
+    _put(cache, "c", b"c" * 10)
+    assert cache.current_bytes == 30
+
+    # "a" is the most recently used one
+    assert _get(cache, "a") == (IDENTITY, b"a" * 10)
+    _put(cache, "d", b"d" * 15)
+    assert cache.current_bytes == 25
+    assert _get(cache, "b") is None
+    assert _get(cache, "c") is None
+    assert _get(cache, "a") == (IDENTITY, b"a" * 10)
+    assert _get(cache, "d") == (IDENTITY, b"d" * 15)
+
+    # replacing a response does not count it twice
+    _put(cache, "d", b"d" * 5)
+    assert cache.current_bytes == 15
+
+    # responses larger than the cache are not kept without spill directory
+    _put(cache, "e", b"e" * 31)
+    assert _get(cache, "e") is None
+    assert cache.current_bytes == 15
+
+
+def test_response_cache_spill(tmp_path: Path):
+    spill_dir = tmp_path / "spill"
+    cache = ResponseCache(max_bytes=20, spill_dir=spill_dir, max_spill_bytes=25)
+    _put(cache, "a", b"a" * 10)
+    _put(cache, "b", b"b" * 10)
+    _put(cache, "c", b"c" * 10)
+
+    # "a" is spilled to disk
+    assert cache.current_bytes == 20
+    assert cache.current_spill_bytes == 10
+    assert len(_spill_files(cache)) == 1
+
+    # and is read back to memory, spilling "b"
+    assert _get(cache, "a") == (IDENTITY, b"a" * 10)
+    assert cache.stats()["endpoints"]["volume"]["spill_hits"] == 1
+    assert cache.current_spill_bytes == 10
+    assert len(_spill_files(cache)) == 1
+    assert (_spill_files(cache)[0]).read_bytes() == b"b" * 10
+    assert _get(cache, "b") == (IDENTITY, b"b" * 10)
+
+    # responses larger than the memory cache are spilled directly
+    _put(cache, "d", b"d" * 21)
+    assert cache.current_spill_bytes == 21
+    assert _get(cache, "d") == (IDENTITY, b"d" * 21)
+
+    # responses larger than both are not cached
+    _put(cache, "e", b"e" * 26)
+    assert _get(cache, "e") is None
+
+
+def test_response_cache_spill_eviction_removes_files(tmp_path: Path):
+    spill_dir = tmp_path / "spill"
+    cache = ResponseCache(max_bytes=10, spill_dir=spill_dir, max_spill_bytes=20)
+    for request in "abcd":
+        _put(cache, request, request.encode() * 10)
+
+    # "a" is evicted from the spill directory, "b", "c" are spilled
+    assert cache.current_spill_bytes == 20
+    assert sorted(f.read_bytes() for f in _spill_files(cache)) == [
+        b"b" * 10,
+        b"c" * 10,
+    ]
+    assert _get(cache, "a") is None
+
+    cache.clear()
+    assert _spill_files(cache) == []
+    assert cache.current_bytes == 0 and cache.current_spill_bytes == 0
+    assert _get(cache, "d") is None
+
+
+def test_response_cache_entry_version(tmp_path: Path):
+    spill_dir = tmp_path / "spill"
+    cache = ResponseCache(max_bytes=10, spill_dir=spill_dir, max_spill_bytes=100)
+    _put(cache, "a", b"a" * 10, version="v1")
+    _put(cache, "b", b"b" * 10, version="v1")
+    assert len(_spill_files(cache)) == 1
+
+    # entry was modified, both the memory and the spilled response are dropped
+    assert _get(cache, "b", version="v2") is None
+    assert cache.current_bytes == 0
+    assert _get(cache, "a", version="v2") is None
+    assert cache.current_spill_bytes == 0
+    assert _spill_files(cache) == []
+    assert _get(cache, "a", version="v1") is None
+
+
+def test_response_cache_encodings_and_stats():
+    cache = ResponseCache(max_bytes=100)
+    _put(cache, "a", b"compressed", encoding=GZIP)
+
+    assert _get(cache, "a") is None
+    assert _get(cache, "a", encodings=(IDENTITY, GZIP)) == (GZIP, b"compressed")
+    assert cache.get("segmentation", ENTRY, "a", "v1") is None
+    assert _get(cache, "a", encodings=(GZIP,)) == (GZIP, b"compressed")
+
+    stats = cache.stats()
+    assert stats["endpoints"] == {
+        "volume": {"hits": 2, "spill_hits": 0, "misses": 1, "hit_rate": 2 / 3},
+        "segmentation": {"hits": 0, "spill_hits": 0, "misses": 1, "hit_rate": 0.0},
+    }
+    assert stats["responses"] == 1
+    assert stats["bytes"] == len(b"compressed")
+
+
+def test_response_cache_spill_dir_is_private(tmp_path: Path):
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+    (spill_dir / "other.bin").write_bytes(b"other data")
+
+    cache = ResponseCache(max_bytes=10, spill_dir=spill_dir, max_spill_bytes=100)
+    other_cache = ResponseCache(max_bytes=10, spill_dir=spill_dir, max_spill_bytes=100)
+    # the same key in both caches
+    for c in (cache, other_cache):
+        _put(c, "a", b"a" * 10)
+        _put(c, "b", b"b" * 10)
+    assert cache.spill_dir.parent == spill_dir
+    assert cache.spill_dir != other_cache.spill_dir
+
+    cache.clear()
+    assert _get(other_cache, "a") == (IDENTITY, b"a" * 10)
+
+    cache.close()
+    assert not cache.spill_dir.exists()
+    assert (spill_dir / "other.bin").read_bytes() == b"other data"
+    assert other_cache.spill_dir.exists()
+    # nothing is spilled after close
+    _put(cache, "c", b"c" * 10)
+    _put(cache, "d", b"d" * 10)
+    assert _get(cache, "c") is None
+    other_cache.close()
+    assert sorted(spill_dir.iterdir()) == [spill_dir / "other.bin"]
@@ -0,0 +1,74 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import zarr
+from cellstar_db.file_system.store_pool import EntryStorePool
+
+
+def _create_zip_entry(path: Path, value: int):
+    store = zarr.ZipStore(path=str(path), compression=0, allowZip64=True, mode="w")
+    root = zarr.group(store)
+    root.create_dataset("arr", data=np.full((4, 4, 4), value, dtype=np.uint8), fill_value=255)
+    store.close()
+
+
+def test_store_pool_reuses_and_evicts(tmp_path: Path):
+    pool = EntryStorePool(max_open=2)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.zip"
+        _create_zip_entry(path, i)
+        paths.append(path)
+
+    first = pool.acquire(("db", "emdb", "0"), paths[0], "zip")
+    again = pool.acquire(("db", "emdb", "0"), paths[0], "zip")
+    assert first is again
+    pool.release(first)
+    pool.release(again)
+
+    for i in (1, 2):
+        pooled = pool.acquire(("db", "emdb", str(i)), paths[i], "zip")
+        assert pooled.root["arr"][0, 0, 0] == i
+        pool.release(pooled)
+
+    # least recently used entry was closed
+    assert len(pool) == 2
+    assert first.detached
+    assert first.store.zf.fp is None
+
+
+def test_store_pool_keeps_store_in_use_open(tmp_path: Path):
+    pool = EntryStorePool(max_open=1)
+    for i in range(2):
+        _create_zip_entry(tmp_path / f"{i}.zip", i)
+
+    in_use = pool.acquire(("db", "emdb", "0"), tmp_path / "0.zip", "zip")
+    other = pool.acquire(("db", "emdb", "1"), tmp_path / "1.zip", "zip")
+    assert in_use.root["arr"][0, 0, 0] == 0
+    pool.release(other)
+    pool.release(in_use)
+    assert len(pool) == 1
+
+
+def test_store_pool_invalidates_on_change(tmp_path: Path):
+    pool = EntryStorePool()
+    path = tmp_path / "data.zip"
+    _create_zip_entry(path, 1)
+
+    old = pool.acquire(("db", "emdb", "0"), path, "zip")
+    assert old.root["arr"][0, 0, 0] == 1
+
+    # entry is rewritten while the old store is still used by a reader
+    os.unlink(path)
+    _create_zip_entry(path, 2)
+
+    new = pool.acquire(("db", "emdb", "0"), path, "zip")
+    assert new is not old
+    assert new.root["arr"][0, 0, 0] == 2
+    assert old.root["arr"][0, 0, 0] == 1
+
+    pool.release(old)
+    assert old.store.zf.fp is None
+    pool.release(new)
+    assert new.store.zf.fp is not None
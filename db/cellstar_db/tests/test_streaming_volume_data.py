@@ -0,0 +1,138 @@
+import logging
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+import zarr
+from cellstar_db.file_system.constants import (
+    VOLUME_CHUNK_STATISTICS_GROUPNAME,
+    VOLUME_DATA_GROUPNAME,
+)
+from cellstar_db.file_system.db import FileSystemVolumeServerDB
+from cellstar_db.tests.conftest import TEST_ENTRY_PREPROCESSOR_INPUT
+from cellstar_query.core.service import VolumeServerService
+from cellstar_query.requests import (
+    VolumeRequestBox,
+    VolumeRequestDataKind,
+    VolumeRequestInfo,
+)
+from cellstar_query.serialization import streaming
+
+SOURCE = TEST_ENTRY_PREPROCESSOR_INPUT["source_db"]
+# chunks of the copied entries, several chunk layers along the last axis
+LAYER_CHUNKS = (32, 32, 16)
+# part of the grid spanning 3 chunk layers
+SUB_BOX = VolumeRequestBox(bottom_left=(-100, -90, -80), top_right=(30, 40, 150))
+
+
+def _copy_entry(
+    db: FileSystemVolumeServerDB, folder: Path, entry_id: str, volume_dtype
+):
+    """
+    Copies the test entry with 3D arrays rechunked to LAYER_CHUNKS
+    and volume values cast to volume_dtype
+    """
+    entry_folder = folder / SOURCE / entry_id
+    shutil.copytree(
+        db.folder / SOURCE / TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"], entry_folder
+    )
+
+    root = zarr.group(store=zarr.MemoryStore())
+    with db.read(SOURCE, TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"]) as context:
+        zarr.copy_all(context.root, root)
+    # statistics are computed per chunk, they are not valid after rechunking
+    del root[VOLUME_CHUNK_STATISTICS_GROUPNAME]
+
+    def rechunk(path: str, arr):
+        if not isinstance(arr, zarr.Array) or arr.ndim != 3:
+            return
+        data = arr[...]
+        if path.startswith(VOLUME_DATA_GROUPNAME):
+            data = data.astype(volume_dtype)
+        del root[path]
+        root.create_dataset(path, data=data, chunks=LAYER_CHUNKS)
+
+    paths = []
+    root.visititems(lambda path, item: paths.append((path, item)))
+    for path, item in paths:
+        rechunk(path, item)
+
+    (entry_folder / "data.zip").unlink()
+    store = zarr.ZipStore(str(entry_folder / "data.zip"), mode="w")
+    try:
+        zarr.copy_store(root.store, store)
+    finally:
+        store.close()
+
+
+@pytest.fixture(scope="module")
+def layered_db(testing_db: FileSystemVolumeServerDB, tmp_path_factory):
+    folder = tmp_path_factory.mktemp("layered_db")
+    _copy_entry(testing_db, folder, "layered-float", np.float32)
+    _copy_entry(testing_db, folder, "layered-int", np.int16)
+    return FileSystemVolumeServerDB(folder=folder, store_type="zip")
+
+
+def _request(entry_id: str, data_kind: VolumeRequestDataKind) -> VolumeRequestInfo:
+    return VolumeRequestInfo(
+        source=SOURCE,
+        structure_id=entry_id,
+        channel_id="0",
+        segmentation_id="0",
+        time=0,
+        max_points=10**9,
+        data_kind=data_kind,
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("entry_id", ["layered-float", "layered-int"])
+@pytest.mark.parametrize(
+    "data_kind",
+    [
+        VolumeRequestDataKind.volume,
+        VolumeRequestDataKind.segmentation,
+        VolumeRequestDataKind.all,
+    ],
+)
+@pytest.mark.parametrize(
+    "req_box",
+    [None, SUB_BOX],
+)
+async def test_streamed_volume_data_equals_volume_data(
+    layered_db, monkeypatch, entry_id, data_kind, req_box
+):
+    # runs of the segmentation are moved to disk, and written in several pieces
+    monkeypatch.setattr(streaming, "RUNS_SPOOL_SIZE", 1)
+    monkeypatch.setattr(streaming, "RUNS_PIECE_SIZE", 64)
+
+    service = VolumeServerService(layered_db)
+    req = _request(entry_id, data_kind)
+
+    with layered_db.read(SOURCE, entry_id) as context:
+        grids = await context.read_chunk_grids()
+    assert grids["volume"][1][0]["0"]["chunks"] == list(LAYER_CHUNKS)
+
+    parts = [p async for p in await service.stream_volume_data(req, req_box)]
+    assert b"".join(parts) == await service.get_volume_data(req, req_box)
+
+
+@pytest.mark.asyncio
+async def test_streamed_volume_data_without_statistics(layered_db, monkeypatch, caplog):
+    service = VolumeServerService(layered_db)
+    req = _request("layered-float", VolumeRequestDataKind.volume)
+    req_box = SUB_BOX
+
+    # chunk statistics are not available, range of the level is used
+    with caplog.at_level(logging.WARNING):
+        parts = [p async for p in await service.stream_volume_data(req, req_box)]
+    assert b"".join(parts) == await service.get_volume_data(req, req_box)
+    assert "read twice" not in caplog.text
+
+    # neither chunk nor level statistics, layers are read twice
+    monkeypatch.setattr(service, "_level_value_range", lambda *args: None)
+    with caplog.at_level(logging.WARNING):
+        parts = [p async for p in await service.stream_volume_data(req, req_box)]
+    assert b"".join(parts) == await service.get_volume_data(req, req_box)
+    assert "read twice" in caplog.text
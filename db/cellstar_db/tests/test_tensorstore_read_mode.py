@@ -0,0 +1,43 @@
+import asyncio
+
+import numpy as np
+import pytest
+from cellstar_db.file_system.db import FileSystemVolumeServerDB
+from cellstar_db.tests.conftest import TEST_ENTRY_PREPROCESSOR_INPUT
+
+BOXES = [((0, 0, 0), (63, 63, 63)), ((5, 10, 15), (40, 41, 42)), ((0, 0, 0), (0, 0, 0))]
+
+
+async def _read_slice(db: FileSystemVolumeServerDB, box, mode: str):
+    with db.read(
+        TEST_ENTRY_PREPROCESSOR_INPUT["source_db"],
+        TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"],
+    ) as context:
+        return await context.read_slice(
+            down_sampling_ratio=1,
+            box=box,
+            channel_id="0",
+            time=0,
+            mode=mode,
+            lattice_id="0",
+        )
+
+
+@pytest.mark.asyncio
+async def test_tensorstore_mode_equals_dask_mode(testing_db):
+    for box in BOXES:
+        dask_slice = await _read_slice(testing_db, box, "dask")
+        tensorstore_slice = await _read_slice(testing_db, box, "tensorstore")
+        np.testing.assert_array_equal(
+            dask_slice["volume_slice"], tensorstore_slice["volume_slice"]
+        )
+        np.testing.assert_array_equal(
+            dask_slice["segmentation_slice"]["category_set_ids"],
+            tensorstore_slice["segmentation_slice"]["category_set_ids"],
+        )
+
+
+@pytest.mark.parametrize("mode", ["dask", "tensorstore"])
+def test_benchmark_read_mode(testing_db, benchmark, mode: str):
+    benchmark.group = "read_slice mode"
+    benchmark(lambda: asyncio.run(_read_slice(testing_db, BOXES[1], mode)))
@@ -0,0 +1,120 @@
+import pytest
+from cellstar_db.tests.conftest import TEST_ENTRY_PREPROCESSOR_INPUT
+from cellstar_db.utils.content_encoding import GZIP, decompress
+from cellstar_query.core.service import VolumeServerService
+from cellstar_server.app.api.v1 import configure_endpoints, etag_matches
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+SOURCE = TEST_ENTRY_PREPROCESSOR_INPUT["source_db"]
+ENTRY_ID = TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"]
+
+
+@pytest.fixture(scope="module")
+def client(testing_db) -> TestClient:
+    app = FastAPI()
+    configure_endpoints(app, VolumeServerService(testing_db))
+    return TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def manifest(client: TestClient) -> dict:
+    response = client.get(f"/v1/{SOURCE}/{ENTRY_ID}/tiles")
+    assert response.status_code == 200
+    return response.json()
+
+
+def _volume_tile_url(manifest: dict, i: int = 0) -> str:
+    return manifest["tile_urls"]["volume"].format(
+        level=1, time=0, channel_id="0", i=i, j=0, k=0
+    )
+
+
+def _get(client: TestClient, url: str, **headers):
+    headers.setdefault("Accept-Encoding", "identity")
+    return client.get(url, headers={k.replace("_", "-"): v for k, v in headers.items()})
+
+
+def test_tile_cache_control_depends_on_version(client: TestClient, manifest: dict):
+    version = manifest["version"]
+    url = _volume_tile_url(manifest)
+    assert url.endswith(f"?version={version}")
+
+    response = _get(client, url)
+    assert response.status_code == 200
+    assert "immutable" in response.headers["Cache-Control"]
+    assert response.headers["ETag"] == f'"{version}"'
+
+    # tiles of other (older) versions or without version are always revalidated
+    unversioned_url = url.split("?")[0]
+    for tile_url in (unversioned_url, f"{unversioned_url}?version=older"):
+        response = _get(client, tile_url)
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == "no-cache"
+
+
+def test_tile_etag_per_encoding(client: TestClient, manifest: dict):
+    url = _volume_tile_url(manifest)
+    identity = _get(client, url)
+    with client.stream("GET", url, headers={"Accept-Encoding": GZIP}) as gzipped:
+        raw = b"".join(gzipped.iter_raw())
+
+    assert gzipped.headers["Content-Encoding"] == GZIP
+    assert decompress(raw, GZIP) == identity.content
+    assert identity.headers["ETag"] != gzipped.headers["ETag"]
+    assert "Accept-Encoding" in gzipped.headers["Vary"]
+
+    # tag of one encoding does not validate the other one
+    response = _get(client, url, if_none_match=identity.headers["ETag"])
+    assert response.status_code == 304
+    response = _get(
+        client,
+        url,
+        accept_encoding=GZIP,
+        if_none_match=identity.headers["ETag"],
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "if_none_match",
+    ['"{etag}"', 'W/"{etag}"', '"other", W/"{etag}"', "*"],
+)
+def test_tile_not_modified(client: TestClient, manifest: dict, if_none_match: str):
+    url = _volume_tile_url(manifest)
+    etag = _get(client, url).headers["ETag"].strip('"')
+
+    response = _get(client, url, if_none_match=if_none_match.format(etag=etag))
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == f'"{etag}"'
+    assert "immutable" in response.headers["Cache-Control"]
+
+
+def test_tile_modified(client: TestClient, manifest: dict):
+    url = _volume_tile_url(manifest)
+    response = _get(client, url, if_none_match='"other", W/"another"')
+    assert response.status_code == 200
+    assert len(response.content) > 0
+
+
+def test_tile_out_of_grid(client: TestClient, manifest: dict):
+    response = _get(client, _volume_tile_url(manifest, i=1000))
+    assert response.status_code == 422
+    assert "error" in response.json()
+
+
+@pytest.mark.parametrize(
+    "if_none_match, etag, expected",
+    [
+        (None, '"a"', False),
+        ('"a"', '"a"', True),
+        ('W/"a"', '"a"', True),
+        ('"b", "a"', '"a"', True),
+        ("*", '"a"', True),
+        ('"ab"', '"a"', False),
+        ('"a-gzip"', '"a"', False),
+    ],
+)
+def test_etag_matches(if_none_match, etag, expected):
+    assert etag_matches(if_none_match, etag) == expected
@@ -0,0 +1,29 @@
+import pytest
+from cellstar_db.file_system.db import FileSystemVolumeServerDB
+from cellstar_db.tests.conftest import TEST_ENTRY_PREPROCESSOR_INPUT
+
+
+@pytest.mark.asyncio
+async def test_volume_value_range_bounds_slice(testing_db: FileSystemVolumeServerDB):
+    metadata = await testing_db.read_metadata(
+        TEST_ENTRY_PREPROCESSOR_INPUT["source_db"],
+        TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"],
+    )
+    dimensions = metadata.sampled_grid_dimensions(1)
+    whole_level = ((0, 0, 0), tuple(d - 1 for d in dimensions))
+
+    with testing_db.read(
+        TEST_ENTRY_PREPROCESSOR_INPUT["source_db"],
+        TEST_ENTRY_PREPROCESSOR_INPUT["entry_id"],
+    ) as context:
+        for box in (((5, 10, 15), (40, 41, 42)), ((0, 0, 0), (0, 0, 0)), whole_level):
+            volume = await context.read_volume_slice(
+                down_sampling_ratio=1, box=box, channel_id="0", time=0
+            )
+            data_min, data_max = volume["volume_value_range"]
+            assert data_min <= volume["volume_slice"].min()
+            assert data_max >= volume["volume_slice"].max()
+
+    # statistics of all chunks are the statistics of the whole level
+    assert data_min == metadata.min(1, 0, "0")
+    assert data_max == metadata.max(1, 0, "0")
@@ -0,0 +1,147 @@
+import zlib
+from typing import Optional, Protocol
+
+import brotli
+import zstandard
+
+# HTTP content codings of responses
+IDENTITY = "identity"
+GZIP = "gzip"
+BROTLI = "br"
+ZSTD = "zstd"
+
+# in order of preference if the client accepts several of them
+PREFERRED_ENCODINGS = (ZSTD, BROTLI, GZIP)
+
+# levels used when compressing responses on the fly
+STREAMING_LEVELS = {ZSTD: 3, BROTLI: 4, GZIP: 3}
+# levels used for cached responses, which are compressed once and sent many times
+# (higher levels are several times slower for ~1% smaller BinaryCIF,
+# see benchmark in test_content_encoding.py)
+CACHED_LEVELS = {ZSTD: 12, BROTLI: 6, GZIP: 6}
+
+
+class StreamCompressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def sync(self) -> bytes:
+        """
+        Returns compressed data of everything passed so far (so that the receiver
+        can decompress it), compressor can be used after
+        """
+        ...
+
+    def flush(self) -> bytes:
+        """Returns the rest of compressed data, compressor cannot be used after"""
+        ...
+
+
+class _GzipStreamCompressor:
+    def __init__(self, level: int):
+        # wbits=31 writes gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def sync(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStreamCompressor:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def sync(self) -> bytes:
+        return self._compressor.flush()
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdStreamCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def sync(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+_STREAM_COMPRESSORS = {
+    GZIP: _GzipStreamCompressor,
+    BROTLI: _BrotliStreamCompressor,
+    ZSTD: _ZstdStreamCompressor,
+}
+
+
+def stream_compressor(encoding: str, level: Optional[int] = None) -> StreamCompressor:
+    if level is None:
+        level = STREAMING_LEVELS[encoding]
+    return _STREAM_COMPRESSORS[encoding](level)
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == IDENTITY:
+        return data
+    if level is None:
+        level = CACHED_LEVELS[encoding]
+
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    if encoding == BROTLI:
+        return brotli.compress(data, quality=level)
+    compressor = stream_compressor(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == IDENTITY:
+        return data
+    if encoding == ZSTD:
+        # streamed frames do not have content size in the header
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    if encoding == BROTLI:
+        return brotli.decompress(data)
+    if encoding == GZIP:
+        return zlib.decompress(data, 31)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def negotiate_encoding(
+    accept_encoding: Optional[str], encodings: tuple[str, ...] = PREFERRED_ENCODINGS
+) -> str:
+    """
+    Returns the first of encodings accepted by Accept-Encoding header value
+    (with q > 0, "*" accepts all), identity if none of them is accepted
+    """
+    if not accept_encoding:
+        return IDENTITY
+
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return IDENTITY
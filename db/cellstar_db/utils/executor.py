@@ -0,0 +1,74 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+EXECUTOR_KINDS = ("thread", "process")
+
+_default_executor: Optional[Executor] = None
+
+
+def create_executor(
+    kind: str = "thread",
+    max_workers: Optional[int] = None,
+    max_open_entry_stores: Optional[int] = None,
+    decoded_chunk_cache_max_bytes: Optional[int] = None,
+) -> Executor:
+    """
+    Creates executor for blocking reads and serialization.
+    Worker processes of the "process" executor have their own entry store pool
+    and decoded chunk cache, max_open_entry_stores and decoded_chunk_cache_max_bytes
+    are applied to them (defaults if None). Threads share the ones of the process,
+    the limits are not used for the "thread" executor
+    """
+    if kind == "thread":
+        return ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="cellstar-read"
+        )
+    elif kind == "process":
+        # forking a process with running threads (dask, blosc) can deadlock the child
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_read_worker,
+            initargs=(max_open_entry_stores, decoded_chunk_cache_max_bytes),
+        )
+    else:
+        raise ValueError(
+            f"executor kind is not supported: {kind}, use one of {EXECUTOR_KINDS}"
+        )
+
+
+def _init_read_worker(
+    max_open_entry_stores: Optional[int], decoded_chunk_cache_max_bytes: Optional[int]
+):
+    from cellstar_db.file_system.store_pool import ENTRY_STORE_POOL
+
+    if max_open_entry_stores is not None:
+        ENTRY_STORE_POOL.set_max_open(max_open_entry_stores)
+    if decoded_chunk_cache_max_bytes is not None:
+        ENTRY_STORE_POOL.chunk_cache.set_max_bytes(decoded_chunk_cache_max_bytes)
+
+
+def get_default_executor() -> Executor:
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = create_executor("thread")
+    return _default_executor
+
+
+def is_process_executor(executor: Executor) -> bool:
+    return isinstance(executor, ProcessPoolExecutor)
+
+
+async def run_in_executor(
+    executor: Executor, fn: Callable[..., T], *args, **kwargs
+) -> T:
+    """
+    Runs blocking function in executor without blocking the event loop
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(fn, *args, **kwargs))
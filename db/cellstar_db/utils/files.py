@@ -0,0 +1,16 @@
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+def file_signature(path: Path) -> Optional[Tuple[int, int, int]]:
+    """
+    Returns (mtime_ns, size, inode) of the path or None if it does not exist.
+    Inode is included because some writers (e.g. edit contexts) unlink a file and
+    create a new one, which can happen within the mtime resolution of the file system
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
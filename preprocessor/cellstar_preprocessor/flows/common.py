@@ -240,7 +240,10 @@ def compute_number_of_downsampling_steps(
 
 
 def _compute_chunk_size_based_on_data(arr: np.ndarray) -> tuple[int, int, int]:
-    shape: tuple = arr.shape
+    return _compute_chunk_size_based_on_shape(arr.shape)
+
+
+def _compute_chunk_size_based_on_shape(shape: tuple) -> tuple[int, int, int]:
     chunks = tuple([int(i / 4) if i > 4 else i for i in shape])
     return chunks
 
@@ -274,7 +277,7 @@ def create_dataset_wrapper(
     if chunking_mode == "auto":
         chunks = True
     elif chunking_mode == "custom_function":
-        chunks = _compute_chunk_size_based_on_data(data)
+        chunks = _compute_chunk_size_based_on_shape(shape)
     elif chunking_mode == "false":
         chunks = False
     else:
@@ -16,6 +16,8 @@ MESH_SEGMENTATION_DATA_GROUPNAME = "mesh_segmentation_data"
 
 VOLUME_DATA_GROUPNAME = "volume_data"
 VOLUME_DATA_GROUPNAME_COPY = "volume_data_copy"
+# per-chunk (min, max) of volume data arrays, same hierarchy as VOLUME_DATA_GROUPNAME
+VOLUME_CHUNK_STATISTICS_GROUPNAME = "volume_chunk_statistics"
 
 # TODO: the namespaces should NOT be hardcoded
 DB_NAMESPACES = ("emdb", "empiar")
@@ -29,6 +31,7 @@ GEOMETRIC_SEGMENTATION_FILENAME = "geometric_segmentation.json"
 
 MIN_GRID_SIZE = 100**3
 DOWNSAMPLING_KERNEL = (1, 4, 6, 4, 1)
+DOWNSAMPLING_KERNEL_RADIUS = len(DOWNSAMPLING_KERNEL) // 2
 
 MESH_SIMPLIFICATION_CURVE_LINEAR = {
     i + 1: (10 - i) / 10 for i in range(10)
@@ -1,3 +1,9 @@
+import math
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from itertools import groupby, product
+from typing import Optional
+
 import numcodecs
 import numpy as np
 import zarr
@@ -36,16 +42,179 @@ def store_downsampling_levels_in_zarr(
             params_for_storing=params_for_storing,
         )
 
-        table_obj_arr = time_frame_data_group.create_dataset(
-            # be careful here, encoding JSON, sets need to be converted to lists
-            name="set_table",
-            # MsgPack leads to bug/error: int is not allowed for map key when strict_map_key=True
-            dtype=object,
-            object_codec=numcodecs.JSON(),
-            shape=1,
+        _store_set_table(time_frame_data_group, table)
+
+
+def _store_set_table(group: zarr.Group, table: SegmentationSetTable):
+    table_obj_arr = group.create_dataset(
+        # be careful here, encoding JSON, sets need to be converted to lists
+        name="set_table",
+        # MsgPack leads to bug/error: int is not allowed for map key when strict_map_key=True
+        dtype=object,
+        object_codec=numcodecs.JSON(),
+        shape=1,
+    )
+
+    table_obj_arr[...] = [table.get_serializable_repr()]
+
+
+# max number of blocks (cells of the downsampled grid) processed at once
+# (by a single task in store_category_set_downsamplings),
+# bounds memory used for block signatures
+CATEGORICAL_DOWNSAMPLING_SLAB_CELLS = 2**21
+
+
+def store_category_set_downsamplings(
+    *,
+    original_data: zarr.Array,
+    downsampling_steps: int,
+    ratios_to_be_stored: list,
+    data_group: zarr.Group,
+    value_to_segment_id_dict_for_specific_lattice_id: dict,
+    params_for_storing: dict,
+    time_frame: str,
+    channel: Optional[str] = None,
+    max_workers: Optional[int] = None,
+):
+    """
+    Creates downsampling levels of original segmentation data (zarr array),
+    stores levels from ratios_to_be_stored in data_group ({ratio}/{time_frame}[/{channel}]).
+    Levels are computed out-of-core, region by region in parallel: each region
+    of the new level reads only the corresponding part of the previous one,
+    unions of its blocks are merged into the set table of the level and the region
+    is written as soon as the level table is resolved. Levels that are not stored
+    are kept in a temporary group until the next level is computed.
+    Grids and set tables are the same as computed by downsample_categorical_data
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # table with just singletons, e.g. "104": {104}, "94" :{94}
+        previous_set_table = SegmentationSetTable(
+            _unique_values(original_data, executor),
+            value_to_segment_id_dict_for_specific_lattice_id,
         )
+        previous_level_grid = original_data
+        temporary_group_name = None
+        ratio = 1
+        for _ in range(downsampling_steps):
+            ratio = ratio * 2
+            if ratio in ratios_to_be_stored:
+                level_group = data_group.require_group(str(ratio)).create_group(
+                    time_frame
+                )
+                if channel is not None:
+                    level_group = level_group.create_group(channel)
+                level_temporary_group_name = None
+            else:
+                level_temporary_group_name = f"_downsampling_{ratio}_{time_frame}"
+                level_group = data_group.create_group(level_temporary_group_name)
+
+            current_set_table = previous_set_table.create_next_level_table()
+            shape = tuple(math.ceil(d / 2) for d in previous_level_grid.shape)
+            level_grid = create_dataset_wrapper(
+                zarr_group=level_group,
+                data=None,
+                name="grid",
+                shape=shape,
+                dtype=previous_level_grid.dtype,
+                params_for_storing=params_for_storing,
+                is_empty=True,
+            )
+            downsample_categorical_lattice(
+                previous_level_grid,
+                level_grid,
+                previous_set_table,
+                current_set_table,
+                executor,
+            )
+            if level_temporary_group_name is None:
+                _store_set_table(level_group, current_set_table)
 
-        table_obj_arr[...] = [table.get_serializable_repr()]
+            # previous level is not needed anymore
+            if temporary_group_name is not None:
+                del data_group[temporary_group_name]
+            temporary_group_name = level_temporary_group_name
+            previous_level_grid = level_grid
+            previous_set_table = current_set_table
+
+        if temporary_group_name is not None:
+            del data_group[temporary_group_name]
+
+
+def downsample_categorical_lattice(
+    previous_level_grid: zarr.Array,
+    level_grid: zarr.Array,
+    previous_set_table: SegmentationSetTable,
+    current_set_table: SegmentationSetTable,
+    executor: Executor,
+):
+    """
+    Writes x2 downsampled previous_level_grid to level_grid (zarr arrays),
+    resolving categories in current_set_table.
+    Regions aligned to chunks of level_grid are processed row by row
+    (regions with the same z range): map: regions of a row are processed
+    in parallel (only blocks with distinct signatures are kept), while
+    the next row is being mapped, unique signatures of the row are resolved
+    in the table in the order of their first block, then regions of the row
+    are written in parallel and their blocks are released
+    """
+    blocks_shape = _blocks_shape(previous_level_grid.shape)
+    # regions are ordered by z first, rows of regions are in the order of blocks
+    rows = iter(
+        [
+            list(row)
+            for _, row in groupby(
+                _chunk_aligned_regions(level_grid.shape, level_grid.chunks),
+                key=lambda region: region[0].start,
+            )
+        ]
+    )
+    fill_value = _empty_block_fill_value(level_grid.dtype)
+
+    def map_region(region):
+        return _categorical_region_groups(
+            previous_level_grid, region, blocks_shape, level_grid.shape
+        )
+
+    def write_region(region, groups):
+        grid = np.full(
+            tuple(sl.stop - sl.start for sl in region), fill_value, level_grid.dtype
+        )
+        for group in groups:
+            grid[group.out_slices] = group.category_ids()
+        # all cells with non-empty blocks are assigned
+        assert sum(math.prod(group.counts) for group in groups) == math.prod(
+            max(min(sl.stop, d) - sl.start, 0) for sl, d in zip(region, blocks_shape)
+        )
+        level_grid[region] = grid
+
+    mapped_rows: deque = deque()
+
+    def map_next_row():
+        row = next(rows, None)
+        if row is not None:
+            mapped_rows.append(
+                (row, [executor.submit(map_region, region) for region in row])
+            )
+
+    # (block shape, block signature) => category id, for blocks already resolved
+    resolved: dict[tuple, int] = {}
+    map_next_row()
+    while mapped_rows:
+        map_next_row()
+        row, futures = mapped_rows.popleft()
+        region_groups = [future.result() for future in futures]
+        _resolve_block_groups(
+            [group for groups in region_groups for group in groups],
+            current_set_table,
+            previous_set_table,
+            resolved,
+        )
+        for future in [
+            executor.submit(write_region, region, groups)
+            for region, groups in zip(row, region_groups)
+        ]:
+            future.result()
+        del region_groups, futures
 
 
 def downsample_categorical_data(
@@ -62,42 +231,27 @@ def downsample_categorical_data(
         previous_level_grid.shape, np.nan, dtype=previous_level_grid.dtype
     )
 
-    # Select block
-    # The following will not work for e.g. 5**3 grid, as block size = 2,2,2
-    # blocks: np.ndarray = view_as_blocks(previous_level_grid, (2, 2, 2))
-    # instead, get target voxels, e.g. for 1st block it is *0,0,0) voxel
-    target_voxels_coords = np.array(
-        magic_kernel.extract_target_voxels_coords(previous_level_grid.shape)
-    )
-    origin_coords = np.array([0, 0, 0])
-    max_coords = np.subtract(previous_level_grid.shape, (1, 1, 1))
-    # loop over voxels, c = coords of a single voxel
-    for start_coords in target_voxels_coords:
-        end_coords = start_coords + 2
-        if (end_coords < origin_coords).any():
-            end_coords = np.fmax(end_coords, origin_coords)
-        if (end_coords > max_coords).any():
-            end_coords = np.fmin(end_coords, max_coords)
-
-        block: np.ndarray = previous_level_grid[
-            start_coords[0] : end_coords[0],
-            start_coords[1] : end_coords[1],
-            start_coords[2] : end_coords[2],
-        ]
-        
-        # exclude block if any dimension = 0
-        if any(i == 0 for i in block.shape):
-            continue
-
-        new_id: int = downsample_2x2x2_block(
-            block, current_set_table, previous_level_set_table
+    blocks_shape = _blocks_shape(previous_level_grid.shape)
+    # (block shape, block signature) => category id, for blocks already resolved
+    resolved: dict[tuple, int] = {}
+    plane_cells = max(1, blocks_shape[1] * blocks_shape[2])
+    slab_planes = max(1, CATEGORICAL_DOWNSAMPLING_SLAB_CELLS // plane_cells)
+    # slabs are processed in order, so that new categories are added
+    # to the table in the order of the first block they appear in
+    for start in range(0, blocks_shape[0], slab_planes):
+        region = (
+            slice(start, min(start + slab_planes, blocks_shape[0])),
+            slice(0, blocks_shape[1]),
+            slice(0, blocks_shape[2]),
+        )
+        groups = _categorical_region_groups(
+            previous_level_grid, region, blocks_shape, current_level_grid.shape
         )
-        # putting that id in the location of new grid corresponding to that block
-        current_level_grid[
-            round(start_coords[0] / 2),
-            round(start_coords[1] / 2),
-            round(start_coords[2] / 2),
-        ] = new_id
+        _resolve_block_groups(
+            groups, current_set_table, previous_level_set_table, resolved
+        )
+        for group in groups:
+            current_level_grid[group.level_slices] = group.category_ids()
 
     # need to check before conversion to int as in int grid nans => some guge number
     assert (
@@ -117,6 +271,186 @@ def downsample_categorical_data(
     return new_dict
 
 
+def _blocks_shape(previous_level_shape: tuple[int, int, int]) -> tuple[int, int, int]:
+    """
+    Block of each voxel of the new grid starts at 2x its coords and ends
+    at most at the last voxel of the previous grid (exclusive), i.e. the last
+    voxel along each axis is never used and voxels with empty blocks
+    (odd dimensions) are not assigned.
+    Returns shape of the part of the new grid with non-empty blocks
+    """
+    return tuple(max(math.ceil((d - 1) / 2), 0) for d in previous_level_shape)
+
+
+def _empty_block_fill_value(dtype: np.dtype):
+    """
+    Value of cells of the new grid with empty blocks (see _blocks_shape),
+    the same as in the grid created by downsample_categorical_data
+    (filled with np.nan converted to dtype)
+    """
+    with np.errstate(invalid="ignore"):
+        return np.array(np.nan).astype(dtype)[()]
+
+
+def _chunk_aligned_regions(shape: tuple[int, ...], chunks: tuple[int, ...]):
+    """
+    Yields regions of array made of whole chunks, with at most
+    CATEGORICAL_DOWNSAMPLING_SLAB_CELLS cells (or a single chunk),
+    so that no chunk is written by two regions
+    """
+    region_shape = list(chunks)
+    for axis in reversed(range(len(shape))):
+        while (
+            region_shape[axis] < shape[axis]
+            and math.prod(region_shape) * 2 <= CATEGORICAL_DOWNSAMPLING_SLAB_CELLS
+        ):
+            region_shape[axis] *= 2
+    for start in product(*(range(0, d, r) for d, r in zip(shape, region_shape))):
+        yield tuple(
+            slice(s, min(s + r, d)) for s, r, d in zip(start, region_shape, shape)
+        )
+
+
+def _unique_values(arr: zarr.Array, executor: Executor) -> np.ndarray:
+    regions = list(_chunk_aligned_regions(arr.shape, arr.chunks))
+    return np.unique(
+        np.concatenate(list(executor.map(lambda r: np.unique(arr[r]), regions)))
+    )
+
+
+def _categorical_region_groups(
+    previous_level_grid,
+    region: tuple[slice, slice, slice],
+    blocks_shape: tuple[int, int, int],
+    level_shape: tuple[int, int, int],
+) -> list["_BlockGroup"]:
+    """
+    Returns blocks of the region of the new grid grouped by their shape,
+    region may include cells with empty blocks
+    """
+    blocks_region = tuple(
+        slice(sl.start, min(sl.stop, d)) for sl, d in zip(region, blocks_shape)
+    )
+    if any(sl.stop <= sl.start for sl in blocks_region):
+        return []
+    # voxels used by blocks of the region, last voxel along each axis is excluded
+    voxels = np.asarray(
+        previous_level_grid[
+            tuple(
+                slice(2 * sl.start, min(2 * sl.stop, d - 1))
+                for sl, d in zip(blocks_region, previous_level_grid.shape)
+            )
+        ]
+    )
+    origin = tuple(sl.start for sl in blocks_region)
+    return [
+        _BlockGroup(voxels, out_slices, origin, level_shape)
+        for out_slices in _block_group_slices(voxels.shape)
+    ]
+
+
+def _resolve_block_groups(
+    groups: list["_BlockGroup"],
+    current_table: SegmentationSetTable,
+    previous_table: SegmentationSetTable,
+    resolved: dict[tuple, int],
+):
+    """
+    Resolves categories of unique blocks of groups in current_table
+    """
+    # new categories are added to the table in the order of the first block
+    # they appear in, as if blocks were processed one by one
+    order = sorted(
+        (first_index, group_index, i)
+        for group_index, group in enumerate(groups)
+        for i, first_index in enumerate(group.first_level_indices.tolist())
+    )
+    for _, group_index, i in order:
+        group = groups[group_index]
+        key = (group.block_shape, group.unique_signatures[i].tobytes())
+        category_id = resolved.get(key)
+        if category_id is None:
+            category_id = downsample_2x2x2_block(
+                group.unique_blocks[i], current_table, previous_table
+            )
+            resolved[key] = category_id
+        group.ids[i] = category_id
+
+
+def _block_group_slices(voxels_shape: tuple[int, int, int]):
+    """
+    Blocks at the end of odd dimensions have size 1 along that dimension,
+    yields slices of the new grid (relative to the voxels) with blocks of the same shape
+    """
+    axis_slices = [
+        [
+            out_slice
+            for out_slice in (slice(0, d // 2), slice(d // 2, d // 2 + d % 2))
+            if out_slice.stop > out_slice.start
+        ]
+        for d in voxels_shape
+    ]
+    yield from product(*axis_slices)
+
+
+class _BlockGroup:
+    """
+    Blocks of the same shape deduplicated by their signature
+    (block values in the same order as in block.flatten())
+    """
+
+    def __init__(
+        self,
+        voxels: np.ndarray,
+        out_slices: tuple[slice, slice, slice],
+        origin: tuple[int, int, int],
+        level_shape: tuple[int, int, int],
+    ):
+        self.out_slices = out_slices
+        self.level_slices = tuple(
+            slice(o + sl.start, o + sl.stop) for o, sl in zip(origin, out_slices)
+        )
+        self.counts = tuple(sl.stop - sl.start for sl in out_slices)
+        self.block_shape = tuple(
+            min(2, d - 2 * sl.start) for d, sl in zip(voxels.shape, out_slices)
+        )
+        blocks = voxels[
+            tuple(
+                slice(2 * sl.start, 2 * sl.start + n * size)
+                for sl, n, size in zip(out_slices, self.counts, self.block_shape)
+            )
+        ]
+        signatures = np.ascontiguousarray(
+            blocks.reshape(
+                [v for pair in zip(self.counts, self.block_shape) for v in pair]
+            )
+            .transpose(0, 2, 4, 1, 3, 5)
+            .reshape(-1, math.prod(self.block_shape))
+        )
+        signature_dtype = np.dtype(
+            (np.void, signatures.dtype.itemsize * signatures.shape[1])
+        )
+        self.unique_signatures, first_indices, inverse = np.unique(
+            signatures.view(signature_dtype).ravel(),
+            return_index=True,
+            return_inverse=True,
+        )
+        self.unique_blocks = signatures[first_indices]
+        self.inverse = inverse.astype(
+            np.min_scalar_type(max(len(self.unique_signatures) - 1, 0))
+        )
+        # index of the first block of each signature in the whole new grid
+        first_coords = np.unravel_index(first_indices, self.counts)
+        self.first_level_indices = np.ravel_multi_index(
+            tuple(c + sl.start for c, sl in zip(first_coords, self.level_slices)),
+            level_shape,
+        )
+        self.ids = np.empty(len(self.unique_signatures), dtype=np.int64)
+
+    def category_ids(self) -> np.ndarray:
+        return self.ids[self.inverse].reshape(self.counts)
+
+
 def downsample_2x2x2_block(
     block: np.ndarray,
     current_table: SegmentationSetTable,
@@ -126,7 +460,7 @@ def downsample_2x2x2_block(
     # by changing its args to block, categories
     # i.e. get categories ouside the function and pass it in
     # as numpy arrays
-    
+
     potentially_new_category: set = compute_union(block, previous_table)
     category_id: int = current_table.resolve_category(potentially_new_category)
     return category_id
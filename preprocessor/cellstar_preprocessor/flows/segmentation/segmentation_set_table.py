@@ -1,23 +1,45 @@
-import copy
-from typing import Dict, Set, Tuple, Union
+from typing import Dict, FrozenSet, Optional, Set, Tuple
 
 import numpy as np
 
 
 class SegmentationSetTable:
-    def __init__(self, lattice, value_to_segment_id_dict_for_specific_lattice_id):
+    def __init__(
+        self,
+        lattice: Optional[np.ndarray],
+        value_to_segment_id_dict_for_specific_lattice_id,
+        singletons: Optional[Dict] = None,
+    ):
+        """
+        Table of categories (sets of segment ids) by category id.
+        Seeded with singletons of the values of lattice, or with given singletons
+        (see create_next_level_table) without scanning the lattice
+        """
         self.value_to_segment_id_dict = value_to_segment_id_dict_for_specific_lattice_id
-        self.entries: Dict = self.__lattice_to_dict_of_sets(lattice)
+        if singletons is None:
+            singletons = self.__lattice_to_dict_of_sets(lattice)
+        # singletons are shared with the tables of next levels, categories are never modified
+        self.singletons: Dict = singletons
+        self.entries: Dict = dict(singletons)
+        # category => id of its first occurrence in entries
+        self.__index: Dict[FrozenSet, int] = {}
+        for category_id, category in self.entries.items():
+            self.__index.setdefault(frozenset(category), category_id)
+        self.__next_id: int = max(self.entries.keys(), default=-1) + 1
+
+    def create_next_level_table(self) -> "SegmentationSetTable":
+        """
+        Returns table for the next downsampling level, seeded with the same singletons
+        """
+        return SegmentationSetTable(
+            None, self.value_to_segment_id_dict, singletons=self.singletons
+        )
 
     def get_serializable_repr(self) -> Dict:
         """
         Converts sets in self.entries to lists, and returns the whole table as a dict
         """
-        d: Dict = copy.deepcopy(self.entries)
-        for i in d:
-            d[i] = list(d[i])
-
-        return d
+        return {i: list(category) for i, category in self.entries.items()}
 
     def __lattice_to_dict_of_sets(self, lattice: np.ndarray) -> Dict:
         """
@@ -48,31 +70,18 @@ class SegmentationSetTable:
         """
         return tuple([self.entries[i] for i in ids])
 
-    def __find_category(self, target_category: Set) -> Union[int, None]:
-        """
-        Looks up a category (set) in entries dict, returns its id or None if not found
-        """
-        # TODO: check if dict has unique categories indeed!
-        for category_id, category in self.entries.items():
-            if category == target_category:
-                return category_id
-        return None
-
-    def __add_category(self, target_category: Set) -> int:
-        """
-        Adds new category to entries and returns its id
-        """
-        new_id: int = max(self.entries.keys()) + 1
-        self.entries[new_id] = target_category
-        return new_id
-
     def resolve_category(self, target_category: Set):
         """
         Looks up a category (set) in entries dict, returns its id
         If not found, adds new category to entries and returns its id
         """
-        category_id = self.__find_category(target_category)
-        if category_id != None:
+        key = frozenset(target_category)
+        category_id = self.__index.get(key)
+        if category_id is not None:
             return category_id
-        else:
-            return self.__add_category(target_category)
+
+        category_id = self.__next_id
+        self.entries[category_id] = target_category
+        self.__index[key] = category_id
+        self.__next_id += 1
+        return category_id
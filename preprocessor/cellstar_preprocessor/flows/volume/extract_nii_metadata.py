@@ -8,6 +8,7 @@ from cellstar_db.models import (
     VolumeSamplingInfo,
     VolumesMetadata,
 )
+from cellstar_db.utils.quantization import decode_quantized_data_lut
 from cellstar_preprocessor.flows.common import (
     get_downsamplings,
     open_zarr_structure_from_path,
@@ -17,9 +18,6 @@ from cellstar_preprocessor.flows.constants import (
     VOLUME_DATA_GROUPNAME,
 )
 from cellstar_preprocessor.model.volume import InternalVolume
-from cellstar_preprocessor.tools.quantize_data.quantize_data import (
-    decode_quantized_data,
-)
 
 
 def _get_source_axes_units(nii_header):
@@ -90,7 +88,7 @@ def _get_nii_volume_sampling_info(
                 if QUANTIZATION_DATA_DICT_ATTR_NAME in channel_arr.attrs:
                     data_dict = channel_arr.attrs[QUANTIZATION_DATA_DICT_ATTR_NAME]
                     data_dict["data"] = arr_view
-                    arr_view = decode_quantized_data(data_dict)
+                    arr_view = decode_quantized_data_lut(data_dict)
                     if isinstance(arr_view, da.Array):
                         arr_view = arr_view.compute()
 
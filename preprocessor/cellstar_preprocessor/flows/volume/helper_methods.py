@@ -5,6 +5,10 @@ import dask.array as da
 import numpy as np
 import zarr
 from cellstar_preprocessor.flows.common import create_dataset_wrapper
+from cellstar_preprocessor.flows.constants import (
+    DOWNSAMPLING_KERNEL,
+    DOWNSAMPLING_KERNEL_RADIUS,
+)
 
 
 def generate_kernel_3d_arr(pattern: list[int]) -> np.ndarray:
@@ -26,6 +30,106 @@ def generate_kernel_3d_arr(pattern: list[int]) -> np.ndarray:
         raise e
     return k
 
+
+def generate_kernel_3d_separable_terms(pattern: list[int]) -> list[tuple[int, float]]:
+    """
+    Decomposes kernel generated by generate_kernel_3d_arr (values depend only on
+    the distance from the center along the farthest axis) into a weighted sum of
+    separable box kernels of size 5, 3 and 1.
+    Returns list of (radius, weight) of the boxes
+    """
+    assert len(pattern) == 5, "pattern should have length 5"
+    outer, inner, center = pattern[0:3]
+    terms = [(2, outer), (1, inner - outer), (0, center - inner)]
+    total = sum(weight * (2 * radius + 1) ** 3 for radius, weight in terms)
+    return [(radius, weight / total) for radius, weight in terms if weight != 0]
+
+
+def downsample_padded_block_x2(
+    padded: np.ndarray, terms: list[tuple[int, float]], out_dtype: np.dtype
+) -> np.ndarray:
+    """
+    Convolves block padded by DOWNSAMPLING_KERNEL_RADIUS voxels on each side
+    with kernel given by generate_kernel_3d_separable_terms and returns every
+    2nd voxel of the unpadded block along each axis.
+    Each box is summed along one axis at a time with stride 2, so that only
+    the returned voxels are computed
+    """
+    r = DOWNSAMPLING_KERNEL_RADIUS
+    result = None
+    for radius, weight in terms:
+        x = padded
+        for axis in range(3):
+            # voxels 0, 2, 4, ... of the unpadded block
+            n = (x.shape[axis] - 2 * r + 1) // 2
+            box_sum = None
+            for offset in range(r - radius, r + radius + 1):
+                s = [slice(None)] * 3
+                s[axis] = slice(offset, offset + 2 * n - 1, 2)
+                if box_sum is None:
+                    box_sum = x[tuple(s)].astype(np.float64)
+                else:
+                    box_sum += x[tuple(s)]
+            x = box_sum
+        if result is None:
+            result = x * weight
+        else:
+            result += x * weight
+    return result.astype(out_dtype)
+
+
+def downsample_volume_x2(data: da.Array) -> da.Array:
+    """
+    Equivalent of dask_convolve(data, generate_kernel_3d_arr(DOWNSAMPLING_KERNEL),
+    mode="mirror")[::2, ::2, ::2], computing only the voxels that are kept.
+    Values are summed in different order, float results differ by rounding only,
+    integer results (truncated sums) can differ by 1
+    """
+    r = DOWNSAMPLING_KERNEL_RADIUS
+    terms = generate_kernel_3d_separable_terms(list(DOWNSAMPLING_KERNEL))
+
+    # chunks of even size, so that each one starts at a kept voxel
+    data = data.rechunk(tuple(c + c % 2 for c in data.chunksize))
+    padded = data
+    padded_chunks = []
+    for axis, chunks in enumerate(data.chunks):
+        # mirror mode of scipy.ndimage is "reflect" mode of numpy
+        # (unlike da.pad, also for axes shorter than the padding)
+        indices = np.pad(np.arange(data.shape[axis]), r, mode="reflect")
+        padded = da.concatenate(
+            [
+                da.take(padded, indices[:r], axis=axis),
+                padded,
+                da.take(padded, indices[-r:], axis=axis),
+            ],
+            axis=axis,
+        )
+        # padding is merged with the first and the last chunk, with overlap
+        # of neighboring chunks, each chunk is then padded on both sides
+        chunks = list(chunks)
+        chunks[0] += r
+        chunks[-1] += r
+        padded_chunks.append(tuple(chunks))
+    padded = padded.rechunk(tuple(padded_chunks))
+    downsampled_chunks = tuple(
+        tuple((c + 1) // 2 for c in chunks) for chunks in data.chunks
+    )
+
+    return da.map_overlap(
+        downsample_padded_block_x2,
+        padded,
+        # chunks along short axes are padded already
+        depth={axis: r if len(c) > 1 else 0 for axis, c in enumerate(data.chunks)},
+        boundary="none",
+        trim=False,
+        allow_rechunk=False,
+        chunks=downsampled_chunks,
+        dtype=data.dtype,
+        terms=terms,
+        out_dtype=data.dtype,
+    )
+
+
 def normalize_axis_order_mrcfile(dask_arr: da.Array, mrc_header: object) -> da.Array:
     """
     Normalizes axis order to X, Y, Z (1, 2, 3)
@@ -66,4 +170,4 @@ def store_volume_data_in_zarr_stucture(
         is_empty=True,
     )
 
-    da.to_zarr(arr=data, url=zarr_arr, overwrite=True, compute=True)
\ No newline at end of file
+    da.to_zarr(arr=data, url=zarr_arr, overwrite=True, compute=True)
@@ -0,0 +1,58 @@
+import dask.array as da
+import numpy as np
+import zarr
+from cellstar_db.utils.quantization import decode_quantized_data_lut
+from cellstar_preprocessor.flows.common import open_zarr_structure_from_path
+from cellstar_preprocessor.flows.constants import (
+    QUANTIZATION_DATA_DICT_ATTR_NAME,
+    VOLUME_CHUNK_STATISTICS_GROUPNAME,
+    VOLUME_DATA_GROUPNAME,
+)
+from cellstar_preprocessor.model.volume import InternalVolume
+
+
+def _chunk_min_max(block: np.ndarray) -> np.ndarray:
+    return np.array([block.min(), block.max()], dtype=np.float64).reshape(1, 1, 1, 2)
+
+
+def compute_chunk_statistics(arr: zarr.core.Array) -> np.ndarray:
+    """
+    Returns array of shape (*number of chunks along each axis, 2) with (min, max)
+    of (decoded, if quantized) values of each chunk of arr
+    """
+    dask_arr = da.from_zarr(arr)
+    if QUANTIZATION_DATA_DICT_ATTR_NAME in arr.attrs:
+        data_dict = arr.attrs[QUANTIZATION_DATA_DICT_ATTR_NAME]
+        data_dict["data"] = dask_arr
+        dask_arr = decode_quantized_data_lut(data_dict)
+
+    return dask_arr.map_blocks(
+        _chunk_min_max,
+        chunks=tuple((1,) * len(c) for c in dask_arr.chunks) + ((2,),),
+        new_axis=3,
+        dtype=np.float64,
+    ).compute()
+
+
+def volume_chunk_statistics(internal_volume: InternalVolume):
+    """
+    Stores per-chunk (min, max) of all volume data arrays, used by the server to
+    know the range of values of a box without reading it
+    """
+    zarr_structure: zarr.Group = open_zarr_structure_from_path(
+        internal_volume.intermediate_zarr_structure_path
+    )
+    if VOLUME_CHUNK_STATISTICS_GROUPNAME in zarr_structure:
+        del zarr_structure[VOLUME_CHUNK_STATISTICS_GROUPNAME]
+    statistics_gr = zarr_structure.create_group(VOLUME_CHUNK_STATISTICS_GROUPNAME)
+
+    for res, res_gr in zarr_structure[VOLUME_DATA_GROUPNAME].groups():
+        for time, time_gr in res_gr.groups():
+            statistics_time_gr = statistics_gr.require_group(res).create_group(time)
+            for channel, channel_arr in time_gr.arrays():
+                statistics = compute_chunk_statistics(channel_arr)
+                statistics_time_gr.create_dataset(
+                    name=channel,
+                    data=statistics,
+                    chunks=statistics.shape,
+                )
@@ -2,26 +2,21 @@ import math
 
 import dask.array as da
 import zarr
+from cellstar_db.utils.quantization import decode_quantized_data_lut
 from cellstar_preprocessor.flows.common import (
     compute_downsamplings_to_be_stored,
     compute_number_of_downsampling_steps,
     open_zarr_structure_from_path,
 )
 from cellstar_preprocessor.flows.constants import (
-    DOWNSAMPLING_KERNEL,
     MIN_GRID_SIZE,
     QUANTIZATION_DATA_DICT_ATTR_NAME,
     VOLUME_DATA_GROUPNAME,
 )
-from cellstar_preprocessor.flows.volume.helper_methods import (
-    generate_kernel_3d_arr,
-    store_volume_data_in_zarr_stucture,
+from cellstar_preprocessor.flows.volume.volume_pyramid import (
+    store_volume_downsamplings,
 )
 from cellstar_preprocessor.model.volume import InternalVolume
-from cellstar_preprocessor.tools.quantize_data.quantize_data import (
-    decode_quantized_data,
-)
-from dask_image.ndfilters import convolve as dask_convolve
 
 
 # this should work for e.g. ometiff
@@ -58,15 +53,12 @@ def volume_downsampling(internal_volume: InternalVolume):
             if QUANTIZATION_DATA_DICT_ATTR_NAME in original_data_arr.attrs:
                 data_dict = original_data_arr.attrs[QUANTIZATION_DATA_DICT_ATTR_NAME]
                 data_dict["data"] = da.from_zarr(url=original_data_arr)
-                dask_arr: da.Array = decode_quantized_data(data_dict)
+                dask_arr: da.Array = decode_quantized_data_lut(data_dict)
             else:
                 dask_arr = da.from_zarr(
                     url=original_data_arr, chunks=original_data_arr.chunks
                 )
 
-            kernel = generate_kernel_3d_arr(list(DOWNSAMPLING_KERNEL))
-            current_level_data = dask_arr
-
             # 1. compute number of downsampling steps based on internal_volume.downsampling
             # 2. compute list of ratios of downsamplings to be stored based on internal_volume.downsampling
             # 3. if ratio is in list, store it
@@ -87,25 +79,16 @@ def volume_downsampling(internal_volume: InternalVolume):
                 factor=2**3,
                 dtype=dask_arr.dtype,
             )
-            for i in range(downsampling_steps):
-                current_ratio = 2 ** (i + 1)
-                downsampled_data = dask_convolve(
-                    current_level_data, kernel, mode="mirror", cval=0.0
-                )
-                downsampled_data = downsampled_data[::2, ::2, ::2]
-
-                if current_ratio in ratios_to_be_stored:
-                    store_volume_data_in_zarr_stucture(
-                        data=downsampled_data,
-                        volume_data_group=zarr_structure[VOLUME_DATA_GROUPNAME],
-                        params_for_storing=internal_volume.params_for_storing,
-                        force_dtype=internal_volume.volume_force_dtype,
-                        resolution=current_ratio,
-                        time_frame=time,
-                        channel=channel_id,
-                    )
-
-                current_level_data = downsampled_data
+            # all levels are computed in a single pass over the original data
+            store_volume_downsamplings(
+                original_data=dask_arr,
+                ratios_to_be_stored=ratios_to_be_stored,
+                volume_data_group=zarr_structure[VOLUME_DATA_GROUPNAME],
+                params_for_storing=internal_volume.params_for_storing,
+                force_dtype=internal_volume.volume_force_dtype,
+                time_frame=time,
+                channel=channel_id,
+            )
             print("Volume downsampled")
 
     # # NOTE: remove original level resolution data
@@ -0,0 +1,177 @@
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Optional
+
+import dask.array as da
+import numpy as np
+import zarr
+from cellstar_preprocessor.flows.common import create_dataset_wrapper
+from cellstar_preprocessor.flows.constants import (
+    DOWNSAMPLING_KERNEL,
+    DOWNSAMPLING_KERNEL_RADIUS,
+)
+from cellstar_preprocessor.flows.volume.helper_methods import (
+    downsample_padded_block_x2,
+    generate_kernel_3d_separable_terms,
+)
+
+# max number of voxels of the original data read at once
+# (slab of whole chunks along z), bounds memory used by store_volume_downsamplings
+VOLUME_DOWNSAMPLING_SLAB_CELLS = 2**24
+
+
+def store_volume_downsamplings(
+    *,
+    original_data: da.Array,
+    ratios_to_be_stored: list,
+    volume_data_group: zarr.Group,
+    params_for_storing: dict,
+    force_dtype: np.dtype,
+    time_frame: str,
+    channel: str,
+    max_workers: Optional[int] = None,
+):
+    """
+    Creates downsampling levels of original volume data (up to the largest ratio
+    from ratios_to_be_stored), stores levels from ratios_to_be_stored
+    in volume_data_group ({ratio}/{time_frame}/{channel}).
+    Original data is read once, in z-slabs: each slab is downsampled
+    to all levels at once, every level keeps only the planes needed as halo
+    for the next slab. Rows of chunks of stored levels are written (in parallel)
+    as soon as they are complete.
+    Data is the same as computed by downsample_volume_x2 level by level
+    """
+    levels: list[_PyramidLevel] = []
+    shape = original_data.shape
+    ratio = 1
+    while ratio < max(ratios_to_be_stored, default=1):
+        ratio = ratio * 2
+        levels.append(_PyramidLevel(shape, original_data.dtype))
+        shape = levels[-1].shape
+
+        if ratio in ratios_to_be_stored:
+            time_frame_data_group = volume_data_group.require_group(
+                str(ratio)
+            ).require_group(time_frame)
+            levels[-1].zarr_arr = create_dataset_wrapper(
+                zarr_group=time_frame_data_group,
+                data=None,
+                name=str(channel),
+                shape=shape,
+                dtype=force_dtype,
+                params_for_storing=params_for_storing,
+                is_empty=True,
+            )
+
+    z_chunk = original_data.chunksize[0]
+    slab_depth = z_chunk * max(
+        1,
+        VOLUME_DOWNSAMPLING_SLAB_CELLS
+        // (z_chunk * math.prod(original_data.shape[1:])),
+    )
+    max_workers = max_workers or os.cpu_count() or 1
+    writes: list[Future] = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for start in range(0, original_data.shape[0], slab_depth):
+            planes = original_data[start : start + slab_depth].compute()
+            for level in levels:
+                planes = level.push(planes)
+                writes.extend(level.write_complete_rows(executor))
+                # pending writes hold their data, waits for some of them
+                while len(writes) > 2 * max_workers:
+                    done, pending = wait(writes, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                    writes = list(pending)
+
+        for future in writes:
+            future.result()
+
+
+class _PyramidLevel:
+    """
+    Downsampling level computed from z-slabs of the previous level
+    """
+
+    def __init__(self, input_shape: tuple[int, ...], dtype: np.dtype):
+        self.input_shape = input_shape
+        self.shape = tuple(math.ceil(d / 2) for d in input_shape)
+        self.dtype = dtype
+        self.terms = generate_kernel_3d_separable_terms(list(DOWNSAMPLING_KERNEL))
+        # mirror mode of scipy.ndimage is "reflect" mode of numpy
+        self.mirror_indices = np.pad(
+            np.arange(input_shape[0]), DOWNSAMPLING_KERNEL_RADIUS, mode="reflect"
+        )
+        # planes of the previous level, starting at buffer_start,
+        # that are needed for planes of this level not computed yet
+        self.buffer = np.empty((0, *input_shape[1:]), dtype=dtype)
+        self.buffer_start = 0
+        self.received = 0
+        self.computed = 0
+
+        # stored levels only
+        self.zarr_arr: Optional[zarr.Array] = None
+        # planes computed, but not written yet
+        self.pending: list[np.ndarray] = []
+        self.written = 0
+
+    def push(self, planes: np.ndarray) -> np.ndarray:
+        """
+        Adds next planes of the previous level, returns planes of this level
+        that can be computed from the planes received so far
+        """
+        r = DOWNSAMPLING_KERNEL_RADIUS
+        self.buffer = np.concatenate([self.buffer, planes])
+        self.received += planes.shape[0]
+
+        if self.received == self.input_shape[0]:
+            end = self.shape[0]
+        else:
+            # plane i needs planes of the previous level up to 2 * i + r
+            end = max(self.computed, (self.received - r + 1) // 2)
+        if end == self.computed:
+            return np.empty((0, *self.shape[1:]), dtype=self.dtype)
+
+        # previous level planes 2 * computed - r, ..., 2 * (end - 1) + r
+        indices = self.mirror_indices[2 * self.computed : 2 * end - 1 + 2 * r]
+        padded = np.pad(
+            self.buffer[indices - self.buffer_start],
+            ((0, 0), (r, r), (r, r)),
+            mode="reflect",
+        )
+        result = downsample_padded_block_x2(padded, self.terms, self.dtype)
+        self.computed = end
+
+        # halo of the next planes
+        keep_start = min(2 * end - r, self.received)
+        self.buffer = self.buffer[keep_start - self.buffer_start :]
+        self.buffer_start = keep_start
+
+        if self.zarr_arr is not None:
+            self.pending.append(result)
+        return result
+
+    def write_complete_rows(self, executor: ThreadPoolExecutor) -> list[Future]:
+        """
+        Writes planes of complete rows of chunks (all of them after the last plane)
+        """
+        if self.zarr_arr is None or self.computed == self.written:
+            return []
+        z_chunk = self.zarr_arr.chunks[0]
+        if self.computed == self.shape[0]:
+            end = self.computed
+        else:
+            end = self.computed // z_chunk * z_chunk
+        if end == self.written:
+            return []
+
+        planes = np.concatenate(self.pending)
+        start = self.written
+        self.pending = [planes[end - start :]]
+        self.written = end
+
+        def write(data: np.ndarray):
+            self.zarr_arr[start:end] = data
+
+        return [executor.submit(write, planes[: end - start])]
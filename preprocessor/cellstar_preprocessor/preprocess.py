@@ -117,6 +117,9 @@ from cellstar_preprocessor.flows.volume.process_allencel_metadata_csv import (
 from cellstar_preprocessor.flows.volume.quantize_internal_volume import (
     quantize_internal_volume,
 )
+from cellstar_preprocessor.flows.volume.volume_chunk_statistics import (
+    volume_chunk_statistics,
+)
 from cellstar_preprocessor.flows.volume.volume_downsampling import volume_downsampling
 from cellstar_preprocessor.model.input import (
     DownsamplingParams,
@@ -217,6 +220,14 @@ class QuantizeInternalVolumeTask(TaskBase):
         quantize_internal_volume(internal_volume=self.internal_volume)
 
 
+class VolumeChunkStatisticsTask(TaskBase):
+    def __init__(self, internal_volume: InternalVolume):
+        self.internal_volume = internal_volume
+
+    def execute(self) -> None:
+        volume_chunk_statistics(internal_volume=self.internal_volume)
+
+
 # class SaveAnnotationsTask(TaskBase):
 #     def __init__(self, intermediate_zarr_structure_path: Path):
 #         self.intermediate_zarr_structure_path = intermediate_zarr_structure_path
@@ -762,6 +773,12 @@ class Preprocessor:
                 QuantizeInternalVolumeTask(internal_volume=self.get_internal_volume())
             )
 
+        if self.get_internal_volume():
+            # after quantization, statistics are computed from decoded data
+            tasks.append(
+                VolumeChunkStatisticsTask(internal_volume=self.get_internal_volume())
+            )
+
         if nii_segmentation_inputs:
             nii_segmentation_input_paths = [
                 i.input_path for i in nii_segmentation_inputs
@@ -1155,6 +1172,15 @@ def delete_entry(
     asyncio.run(db.delete(namespace=source_db, key=entry_id))
 
 
+@app.command("build-keyword-index")
+def build_keyword_index(
+    db_path: str = typer.Option(default=...),
+):
+    print(f"Building keyword index for db: {db_path}")
+    db = FileSystemVolumeServerDB(Path(db_path), store_type="zip")
+    db.keyword_index.rebuild()
+
+
 @app.command("remove-volume")
 def remove_volume(
     entry_id: str = typer.Option(default=...),
@@ -0,0 +1,195 @@
+import warnings
+
+import numpy as np
+import pytest
+import zarr
+from cellstar_preprocessor.flows.segmentation.category_set_downsampling_methods import (
+    downsample_2x2x2_block,
+    downsample_categorical_data,
+    store_category_set_downsamplings,
+)
+from cellstar_preprocessor.flows.segmentation.downsampling_level_dict import (
+    DownsamplingLevelDict,
+)
+from cellstar_preprocessor.flows.segmentation.segmentation_set_table import (
+    SegmentationSetTable,
+)
+from cellstar_preprocessor.model.input import StoringParams
+from cellstar_preprocessor.tools.magic_kernel_downsampling_3d.magic_kernel_downsampling_3d import (
+    MagicKernel3dDownsampler,
+)
+
+
+def _reference_downsample_categorical_data(
+    magic_kernel: MagicKernel3dDownsampler,
+    previous_level_dict: DownsamplingLevelDict,
+    current_set_table: SegmentationSetTable,
+) -> DownsamplingLevelDict:
+    """Downsampling as done by the original per-block loop"""
+    previous_level_grid = previous_level_dict.get_grid()
+    current_level_grid = magic_kernel.create_x2_downsampled_grid(
+        previous_level_grid.shape, np.nan, dtype=previous_level_grid.dtype
+    )
+    target_voxels_coords = np.array(
+        magic_kernel.extract_target_voxels_coords(previous_level_grid.shape)
+    )
+    max_coords = np.subtract(previous_level_grid.shape, (1, 1, 1))
+    for start_coords in target_voxels_coords:
+        end_coords = np.fmin(start_coords + 2, max_coords)
+        block = previous_level_grid[
+            start_coords[0] : end_coords[0],
+            start_coords[1] : end_coords[1],
+            start_coords[2] : end_coords[2],
+        ]
+        if any(i == 0 for i in block.shape):
+            continue
+        current_level_grid[tuple(start_coords // 2)] = downsample_2x2x2_block(
+            block, current_set_table, previous_level_dict.get_set_table()
+        )
+
+    return DownsamplingLevelDict(
+        {
+            "ratio": previous_level_dict.get_ratio() * 2,
+            "grid": current_level_grid,
+            "set_table": current_set_table,
+        }
+    )
+
+
+def _downsample_all_levels(downsample, grid: np.ndarray, value_to_segment_id: dict):
+    magic_kernel = MagicKernel3dDownsampler()
+    levels = [
+        DownsamplingLevelDict(
+            {
+                "ratio": 1,
+                "grid": grid,
+                "set_table": SegmentationSetTable(grid, value_to_segment_id),
+            }
+        )
+    ]
+    while min(levels[-1].get_grid().shape) > 1:
+        levels.append(
+            downsample(
+                magic_kernel,
+                levels[-1],
+                levels[-1].get_set_table().create_next_level_table(),
+            )
+        )
+    return levels[1:]
+
+
+@pytest.mark.parametrize(
+    "shape, segment_count",
+    [
+        ((4, 4, 4), 64),
+        ((5, 7, 6), 3),
+        ((16, 9, 33), 12),
+        ((2, 2, 2), 2),
+        ((40, 20, 10), 200),
+    ],
+)
+def test_downsample_categorical_data(shape, segment_count):
+    rng = np.random.default_rng(0)
+    # clustered values, so that blocks share and overlap categories
+    grid = np.repeat(
+        rng.integers(0, segment_count + 1, (shape[0], shape[1], (shape[2] + 1) // 2)),
+        2,
+        axis=2,
+    )[:, :, : shape[2]].astype(np.uint32)
+    # several grid values can represent the same segment
+    value_to_segment_id = {v: 100 + v % 7 for v in range(1, segment_count + 1)}
+
+    levels = _downsample_all_levels(
+        downsample_categorical_data, grid, value_to_segment_id
+    )
+    expected_levels = _downsample_all_levels(
+        _reference_downsample_categorical_data, grid, value_to_segment_id
+    )
+
+    assert len(levels) == len(expected_levels)
+    for level, expected in zip(levels, expected_levels):
+        assert level.get_ratio() == expected.get_ratio()
+        assert level.get_grid().dtype == expected.get_grid().dtype
+        np.testing.assert_array_equal(level.get_grid(), expected.get_grid())
+        assert (
+            level.get_set_table().get_serializable_repr()
+            == expected.get_set_table().get_serializable_repr()
+        )
+
+
+def test_downsample_categorical_data_in_slabs(monkeypatch):
+    from cellstar_preprocessor.flows.segmentation import (
+        category_set_downsampling_methods,
+    )
+
+    rng = np.random.default_rng(1)
+    grid = rng.integers(0, 4, (21, 10, 14)).astype(np.int32)
+    value_to_segment_id = {1: 1, 2: 2, 3: 3}
+    expected_levels = _downsample_all_levels(
+        downsample_categorical_data, grid, value_to_segment_id
+    )
+
+    # a single plane of blocks per slab
+    monkeypatch.setattr(
+        category_set_downsampling_methods, "CATEGORICAL_DOWNSAMPLING_SLAB_CELLS", 1
+    )
+    levels = _downsample_all_levels(
+        downsample_categorical_data, grid, value_to_segment_id
+    )
+    for level, expected in zip(levels, expected_levels):
+        np.testing.assert_array_equal(level.get_grid(), expected.get_grid())
+        assert (
+            level.get_set_table().get_serializable_repr()
+            == expected.get_set_table().get_serializable_repr()
+        )
+
+
+@pytest.mark.parametrize("channel", [None, "0"])
+def test_store_category_set_downsamplings(monkeypatch, channel):
+    from cellstar_preprocessor.flows.segmentation import (
+        category_set_downsampling_methods,
+    )
+
+    rng = np.random.default_rng(2)
+    grid = np.repeat(rng.integers(0, 40, (45, 30, 19)), 2, axis=1).astype(np.uint16)
+    value_to_segment_id = {v: 100 + v % 9 for v in range(1, 40)}
+    expected_levels = _downsample_all_levels(
+        downsample_categorical_data, grid, value_to_segment_id
+    )
+
+    # many regions processed in parallel
+    monkeypatch.setattr(
+        category_set_downsampling_methods, "CATEGORICAL_DOWNSAMPLING_SLAB_CELLS", 64
+    )
+    data_group = zarr.group()
+    original_data = data_group.create_dataset("1/0/grid", data=grid, chunks=(8, 8, 8))
+    with warnings.catch_warnings():
+        # e.g. no casts of nan to the integer grid
+        warnings.simplefilter("error", RuntimeWarning)
+        store_category_set_downsamplings(
+            original_data=original_data,
+            downsampling_steps=4,
+            ratios_to_be_stored=[4, 16],
+            data_group=data_group,
+            value_to_segment_id_dict_for_specific_lattice_id=value_to_segment_id,
+            params_for_storing=StoringParams(chunking_mode="custom_function"),
+            time_frame="0",
+            channel=channel,
+            max_workers=4,
+        )
+
+    # temporary levels are removed
+    assert sorted(data_group.group_keys()) == ["1", "16", "4"]
+    for expected in expected_levels[:4]:
+        if expected.get_ratio() not in (4, 16):
+            continue
+        level_group = data_group[f"{expected.get_ratio()}/0"]
+        if channel is not None:
+            level_group = level_group[channel]
+        assert level_group.grid.dtype == grid.dtype
+        np.testing.assert_array_equal(level_group.grid[...], expected.get_grid())
+        # keys are strings in JSON
+        assert level_group.set_table[...][0] == {
+            str(k): v
+            for k, v in expected.get_set_table().get_serializable_repr().items()
+        }
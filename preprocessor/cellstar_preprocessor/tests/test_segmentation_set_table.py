@@ -0,0 +1,54 @@
+import numpy as np
+from cellstar_preprocessor.flows.segmentation.segmentation_set_table import (
+    SegmentationSetTable,
+)
+
+
+class _ReferenceSetTable:
+    """Table as implemented originally, categories are looked up by a linear scan"""
+
+    def __init__(self, lattice: np.ndarray, value_to_segment_id: dict):
+        self.entries = {}
+        for value in np.unique(lattice).tolist():
+            self.entries[value] = {0} if value == 0 else {value_to_segment_id[value]}
+
+    def resolve_category(self, target_category: set) -> int:
+        for category_id, category in self.entries.items():
+            if category == target_category:
+                return category_id
+        new_id = max(self.entries.keys()) + 1
+        self.entries[new_id] = target_category
+        return new_id
+
+    def get_serializable_repr(self) -> dict:
+        return {i: list(category) for i, category in self.entries.items()}
+
+
+def test_segmentation_set_table():
+    rng = np.random.default_rng(0)
+    lattice = rng.choice([0, 3, 5, 8, 13, 21], size=(6, 6, 6))
+    # values 8 and 21 represent the same segment
+    value_to_segment_id = {3: 103, 5: 105, 8: 108, 13: 113, 21: 108}
+
+    table = SegmentationSetTable(lattice, value_to_segment_id)
+    reference = _ReferenceSetTable(lattice, value_to_segment_id)
+    for _ in range(200):
+        category = set(
+            rng.choice([0, 103, 105, 108, 113], size=rng.integers(1, 4)).tolist()
+        )
+        assert table.resolve_category(category) == reference.resolve_category(
+            set(category)
+        )
+    assert table.resolve_category({108}) == 8
+    assert table.get_serializable_repr() == reference.get_serializable_repr()
+
+    # next level table is seeded with singletons only
+    next_level_table = table.create_next_level_table()
+    assert (
+        next_level_table.get_serializable_repr()
+        == SegmentationSetTable(lattice, value_to_segment_id).get_serializable_repr()
+    )
+    assert next_level_table.resolve_category({103, 105}) == 22
+    assert next_level_table.resolve_category({105}) == 5
+    # seed of the previous table is not modified
+    assert 22 not in table.create_next_level_table().entries
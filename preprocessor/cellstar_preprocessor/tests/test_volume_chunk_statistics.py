@@ -0,0 +1,62 @@
+from uuid import uuid4
+
+import numpy as np
+import zarr
+from cellstar_preprocessor.flows.common import open_zarr_structure_from_path
+from cellstar_preprocessor.flows.constants import (
+    VOLUME_CHUNK_STATISTICS_GROUPNAME,
+    VOLUME_DATA_GROUPNAME,
+)
+from cellstar_preprocessor.flows.volume.volume_chunk_statistics import (
+    volume_chunk_statistics,
+)
+from cellstar_preprocessor.model.input import (
+    DownsamplingParams,
+    EntryData,
+    StoringParams,
+)
+from cellstar_preprocessor.model.volume import InternalVolume
+from cellstar_preprocessor.tests.helper_methods import (
+    initialize_intermediate_zarr_structure_for_tests,
+    remove_intermediate_zarr_structure_for_tests,
+)
+from cellstar_preprocessor.tests.input_for_tests import TEST_MAP_PATH
+
+
+def test_volume_chunk_statistics():
+    unique_folder_name = str(uuid4())
+    p = initialize_intermediate_zarr_structure_for_tests(unique_folder_name)
+    internal_volume = InternalVolume(
+        intermediate_zarr_structure_path=p,
+        volume_input_path=TEST_MAP_PATH,
+        params_for_storing=StoringParams(),
+        volume_force_dtype="f4",
+        downsampling_parameters=DownsamplingParams(),
+        entry_data=EntryData(
+            entry_id="emd-1832",
+            source_db="emdb",
+            source_db_id="emd-1832",
+            source_db_name="emdb",
+        ),
+        quantize_dtype_str=None,
+        quantize_downsampling_levels=None,
+    )
+
+    zarr_structure: zarr.Group = open_zarr_structure_from_path(
+        internal_volume.intermediate_zarr_structure_path
+    )
+
+    data = np.random.default_rng(0).random((40, 30, 20), dtype=np.float32)
+    zarr_structure.create_dataset(
+        f"{VOLUME_DATA_GROUPNAME}/1/0/0", data=data, chunks=(16, 16, 16)
+    )
+
+    volume_chunk_statistics(internal_volume=internal_volume)
+
+    statistics = zarr_structure[f"{VOLUME_CHUNK_STATISTICS_GROUPNAME}/1/0/0"][...]
+    assert statistics.shape == (3, 2, 2, 2)
+    chunk = data[32:40, 16:30, 0:16]
+    assert statistics[2, 1, 0, 0] == chunk.min()
+    assert statistics[2, 1, 0, 1] == chunk.max()
+
+    remove_intermediate_zarr_structure_for_tests(p)
@@ -1,10 +1,22 @@
 from uuid import uuid4
 
+import dask.array as da
 import numpy as np
+import pytest
 import zarr
 from cellstar_preprocessor.flows.common import open_zarr_structure_from_path
-from cellstar_preprocessor.flows.constants import VOLUME_DATA_GROUPNAME
+from cellstar_preprocessor.flows.constants import (
+    DOWNSAMPLING_KERNEL,
+    VOLUME_DATA_GROUPNAME,
+)
+from cellstar_preprocessor.flows.volume.helper_methods import (
+    downsample_volume_x2,
+    generate_kernel_3d_arr,
+)
 from cellstar_preprocessor.flows.volume.volume_downsampling import volume_downsampling
+from cellstar_preprocessor.flows.volume.volume_pyramid import (
+    store_volume_downsamplings,
+)
 from cellstar_preprocessor.model.input import (
     DownsamplingParams,
     EntryData,
@@ -17,6 +29,13 @@ from cellstar_preprocessor.tests.helper_methods import (
     remove_intermediate_zarr_structure_for_tests,
 )
 from cellstar_preprocessor.tests.input_for_tests import TEST_MAP_PATH
+from dask_image.ndfilters import convolve as dask_convolve
+
+
+def _reference_downsample_volume_x2(data: da.Array) -> da.Array:
+    """Downsampling as done originally, by full convolution"""
+    kernel = generate_kernel_3d_arr(list(DOWNSAMPLING_KERNEL))
+    return dask_convolve(data, kernel, mode="mirror", cval=0.0)[::2, ::2, ::2]
 
 
 def test_volume_downsampling():
@@ -57,3 +76,99 @@ def test_volume_downsampling():
     ).all()
 
     remove_intermediate_zarr_structure_for_tests(p)
+
+
+@pytest.mark.parametrize(
+    "shape, chunks",
+    [
+        ((64, 64, 64), (16, 16, 16)),
+        ((37, 20, 9), (7, 5, 4)),
+        ((17, 33, 64), (17, 33, 64)),
+        ((2, 3, 5), (1, 1, 1)),
+    ],
+)
+@pytest.mark.parametrize("dtype", ["f4", "f8", "u1", "i2"])
+def test_downsample_volume_x2(shape, chunks, dtype):
+    rng = np.random.default_rng(0)
+    if np.dtype(dtype).kind == "f":
+        values = (rng.random(shape) * 1000).astype(dtype)
+    else:
+        info = np.iinfo(dtype)
+        values = rng.integers(info.min, info.max, shape, dtype=dtype, endpoint=True)
+    data = da.from_array(values, chunks=chunks)
+
+    downsampled = downsample_volume_x2(data)
+    expected = _reference_downsample_volume_x2(data).compute()
+
+    assert downsampled.dtype == expected.dtype
+    if np.dtype(dtype).kind == "f":
+        np.testing.assert_allclose(downsampled.compute(), expected, rtol=1e-6)
+    else:
+        # sums are truncated to integers, different order of float summation
+        # can change the truncated value by 1
+        np.testing.assert_allclose(
+            downsampled.compute().astype(np.int64),
+            expected.astype(np.int64),
+            rtol=0,
+            atol=1,
+        )
+
+
+@pytest.mark.parametrize(
+    "shape, chunks, slab_cells",
+    [
+        # single slab
+        ((45, 30, 19), (8, 8, 8), 2**24),
+        # slabs of one row of chunks
+        ((45, 30, 19), (8, 8, 8), 1),
+        ((100, 9, 9), (3, 9, 9), 3 * 81),
+        ((7, 12, 5), (1, 4, 4), 1),
+    ],
+)
+def test_store_volume_downsamplings(monkeypatch, shape, chunks, slab_cells):
+    from cellstar_preprocessor.flows.volume import volume_pyramid
+
+    monkeypatch.setattr(volume_pyramid, "VOLUME_DOWNSAMPLING_SLAB_CELLS", slab_cells)
+    rng = np.random.default_rng(0)
+    volume_data_group = zarr.group()
+    original_data = volume_data_group.create_dataset(
+        "1/0/0", data=rng.random(shape).astype(np.float32), chunks=chunks
+    )
+    store_volume_downsamplings(
+        original_data=da.from_zarr(original_data),
+        ratios_to_be_stored=[2, 8, 16],
+        volume_data_group=volume_data_group,
+        params_for_storing=StoringParams(chunking_mode="custom_function"),
+        force_dtype="f4",
+        time_frame="0",
+        channel="0",
+        max_workers=2,
+    )
+
+    assert sorted(volume_data_group.group_keys()) == ["1", "16", "2", "8"]
+    expected = da.from_zarr(original_data)
+    for ratio in [2, 4, 8, 16]:
+        expected = downsample_volume_x2(expected)
+        if ratio != 4:
+            np.testing.assert_array_equal(
+                volume_data_group[f"{ratio}/0/0"][...], expected.compute()
+            )
+
+
+@pytest.mark.parametrize("method", ["convolve", "strided"])
+def test_benchmark_downsample_volume_x2(benchmark, method: str):
+    benchmark.group = "downsample 512^3 volume"
+    rng = np.random.default_rng(0)
+    data = da.from_array(
+        rng.random((512, 512, 512), dtype=np.float32), chunks=(128, 128, 128)
+    )
+    downsample = (
+        _reference_downsample_volume_x2
+        if method == "convolve"
+        else downsample_volume_x2
+    )
+
+    downsampled = benchmark.pedantic(
+        lambda: downsample(data).compute(), rounds=1, iterations=1
+    )
+    assert downsampled.shape == (256, 256, 256)
@@ -0,0 +1,52 @@
+import argparse
+from pathlib import Path
+from typing import Optional
+
+from cellstar_db.file_system.constants import DB_NAMESPACES
+from cellstar_db.file_system.db import FileSystemVolumeServerDB
+from cellstar_db.file_system.packed_meshes import pack_entry_meshes
+from cellstar_preprocessor.flows.constants import DEFAULT_DB_PATH
+
+
+def parse_script_args():
+    parser = argparse.ArgumentParser(
+        description="Converts mesh segmentations of existing DB entries "
+        "from group per mesh to packed (contiguous) layout"
+    )
+    parser.add_argument(
+        "--db_path", type=str, default=DEFAULT_DB_PATH, help="path to db folder"
+    )
+    parser.add_argument(
+        "--entries",
+        type=str,
+        nargs="*",
+        default=None,
+        help="entries to convert as source/entry_id (e.g. emdb/emd-1832), "
+        "all entries by default",
+    )
+    args = parser.parse_args()
+    return args
+
+
+def pack_meshes(db_path: Path, entries: Optional[list[tuple[str, str]]] = None):
+    db = FileSystemVolumeServerDB(folder=db_path, store_type="zip")
+    if entries is None:
+        entries = [
+            (namespace, entry_path.name)
+            for namespace in DB_NAMESPACES
+            if (db_path / namespace).is_dir()
+            for entry_path in sorted((db_path / namespace).iterdir())
+            if entry_path.is_dir()
+        ]
+
+    for namespace, key in entries:
+        if pack_entry_meshes(db, namespace, key):
+            print(f"Meshes of {namespace}/{key} were packed")
+
+
+if __name__ == "__main__":
+    args = parse_script_args()
+    entries = None
+    if args.entries:
+        entries = [tuple(e.split("/", 1)) for e in args.entries]
+    pack_meshes(Path(args.db_path), entries)
@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from cellstar_query.serialization.data.meshes_for_cif import MeshesForCif
+
+# (namespace, key, segmentation_id, time, segment_id, detail_lvl)
+PreparedMeshesKey = tuple[str, str, str, int, int, int]
+
+
+class PreparedMeshesCache:
+    """
+    In-memory LRU cache of meshes of single segments and detail lvls prepared
+    for BinaryCIF (MeshesForCif), bounded by max_bytes.
+    Each item is stored with version of its entry (e.g. file signatures),
+    items of an older version are discarded on access.
+    Cached objects are shared between requests and must not be modified
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._items: OrderedDict[
+            PreparedMeshesKey, tuple[MeshesForCif, Hashable, int]
+        ] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(
+        self, key: PreparedMeshesKey, entry_version: Hashable
+    ) -> Optional[MeshesForCif]:
+        with self._lock:
+            cached = self._items.get(key)
+            if cached is not None:
+                meshes, version, _ = cached
+                if version == entry_version:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return meshes
+                self._remove(key)
+
+            self.misses += 1
+            return None
+
+    def put(
+        self, key: PreparedMeshesKey, entry_version: Hashable, meshes: MeshesForCif
+    ):
+        size = meshes.nbytes()
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._items[key] = (meshes, entry_version, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._items.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def _remove(self, key: PreparedMeshesKey):
+        _, _, size = self._items.pop(key)
+        self.current_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests > 0 else 0.0,
+                "items": len(self._items),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
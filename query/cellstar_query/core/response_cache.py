@@ -0,0 +1,239 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Hashable, Optional
+
+from cellstar_db.utils.content_encoding import IDENTITY
+
+# (namespace, key)
+EntryKey = tuple[str, str]
+# (endpoint, entry, normalized request, content encoding)
+ResponseKey = tuple[str, EntryKey, Hashable, str]
+
+
+@dataclass
+class _SpilledResponse:
+    path: Path
+    size: int
+    entry_version: Hashable
+
+
+class ResponseCache:
+    """
+    Two-tier cache of encoded responses (e.g. BinaryCIF bytes).
+    Responses are kept in memory LRU bounded by max_bytes, evicted responses
+    are spilled to spill_dir (LRU bounded by max_spill_bytes) if it is provided.
+    Each response is stored with version of its entry (e.g. file signatures),
+    responses of an older version are discarded on access.
+    Response can be stored in several content encodings (compressed),
+    each of them is a separate item of the cache.
+    Hit rates are counted per endpoint.
+    Responses are spilled to a private subdirectory of spill_dir created for
+    this cache (several processes can share spill_dir), the subdirectory is
+    removed by close, when the cache is garbage collected or at exit.
+    Nothing else in spill_dir is touched
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        spill_dir: Optional[Path] = None,
+        max_spill_bytes: int = 0,
+    ):
+        self.max_bytes = max_bytes
+        self.max_spill_bytes = max_spill_bytes if spill_dir is not None else 0
+        self.spill_dir: Optional[Path] = None
+        self.current_bytes = 0
+        self.current_spill_bytes = 0
+        self._memory: OrderedDict[ResponseKey, tuple[bytes, Hashable]] = OrderedDict()
+        self._spilled: OrderedDict[ResponseKey, _SpilledResponse] = OrderedDict()
+        # endpoint => {"hits", "spill_hits", "misses"}
+        self._counters: dict[str, dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "spill_hits": 0, "misses": 0}
+        )
+        self._lock = threading.Lock()
+
+        self._finalizer: Optional[weakref.finalize] = None
+        if spill_dir is not None:
+            spill_dir.mkdir(parents=True, exist_ok=True)
+            self.spill_dir = Path(
+                tempfile.mkdtemp(dir=spill_dir, prefix="response_cache_")
+            )
+            self._finalizer = weakref.finalize(
+                self, shutil.rmtree, self.spill_dir, ignore_errors=True
+            )
+
+    def get(
+        self,
+        endpoint: str,
+        entry: EntryKey,
+        request_key: Hashable,
+        entry_version: Hashable,
+        encodings: tuple[str, ...] = (IDENTITY,),
+    ) -> Optional[tuple[str, bytes]]:
+        """
+        Returns (encoding, response) for the first of encodings the response is
+        cached in, None if it is not cached in any of them
+        """
+        with self._lock:
+            counters = self._counters[endpoint]
+            for encoding in encodings:
+                key: ResponseKey = (endpoint, entry, request_key, encoding)
+                response, spilled = self._get(key, entry_version)
+                if response is not None:
+                    counters["spill_hits" if spilled else "hits"] += 1
+                    return encoding, response
+
+            counters["misses"] += 1
+            return None
+
+    def put(
+        self,
+        endpoint: str,
+        entry: EntryKey,
+        request_key: Hashable,
+        entry_version: Hashable,
+        response: bytes,
+        encoding: str = IDENTITY,
+    ):
+        key: ResponseKey = (endpoint, entry, request_key, encoding)
+        with self._lock:
+            if key in self._memory:
+                self._remove_from_memory(key)
+            self._add_to_memory(key, response, entry_version)
+
+    def _get(
+        self, key: ResponseKey, entry_version: Hashable
+    ) -> tuple[Optional[bytes], bool]:
+        """Returns (response or None, whether it was spilled)"""
+        cached = self._memory.get(key)
+        if cached is not None:
+            response, version = cached
+            if version == entry_version:
+                self._memory.move_to_end(key)
+                return response, False
+            self._remove_from_memory(key)
+
+        spilled = self._spilled.pop(key, None)
+        if spilled is not None:
+            self.current_spill_bytes -= spilled.size
+            if spilled.entry_version == entry_version:
+                response = self._read_spilled(spilled)
+                if response is not None:
+                    self._add_to_memory(key, response, entry_version)
+                    return response, True
+            else:
+                _remove_file(spilled.path)
+
+        return None, False
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self.current_bytes = 0
+            for spilled in self._spilled.values():
+                _remove_file(spilled.path)
+            self._spilled.clear()
+            self.current_spill_bytes = 0
+
+    def close(self):
+        """Removes the spill subdirectory with all spilled responses"""
+        with self._lock:
+            self._spilled.clear()
+            self.current_spill_bytes = 0
+            self.max_spill_bytes = 0
+            if self._finalizer is not None:
+                self._finalizer()
+
+    def stats(self) -> dict:
+        with self._lock:
+            endpoints = {}
+            for endpoint, counters in self._counters.items():
+                requests = (
+                    counters["hits"] + counters["spill_hits"] + counters["misses"]
+                )
+                endpoints[endpoint] = {
+                    **counters,
+                    "hit_rate": (
+                        (counters["hits"] + counters["spill_hits"]) / requests
+                        if requests > 0
+                        else 0.0
+                    ),
+                }
+            return {
+                "endpoints": endpoints,
+                "responses": len(self._memory),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "spilled_responses": len(self._spilled),
+                "spill_bytes": self.current_spill_bytes,
+                "max_spill_bytes": self.max_spill_bytes,
+            }
+
+    def _add_to_memory(self, key: ResponseKey, response: bytes, version: Hashable):
+        if len(response) > self.max_bytes:
+            self._spill(key, response, version)
+            return
+        self._memory[key] = (response, version)
+        self.current_bytes += len(response)
+        while self.current_bytes > self.max_bytes:
+            evicted_key, (evicted, evicted_version) = self._memory.popitem(last=False)
+            self.current_bytes -= len(evicted)
+            self._spill(evicted_key, evicted, evicted_version)
+
+    def _remove_from_memory(self, key: ResponseKey):
+        response, _ = self._memory.pop(key)
+        self.current_bytes -= len(response)
+
+    def _spill(self, key: ResponseKey, response: bytes, version: Hashable):
+        if len(response) > self.max_spill_bytes:
+            return
+
+        path = self.spill_dir / f"{_hash_key(key)}.bin"
+        try:
+            with open(path, "wb") as f:
+                f.write(response)
+        except OSError as e:
+            logging.error(e, stack_info=True, exc_info=True)
+            return
+
+        previous = self._spilled.pop(key, None)
+        if previous is not None:
+            self.current_spill_bytes -= previous.size
+        self._spilled[key] = _SpilledResponse(
+            path=path, size=len(response), entry_version=version
+        )
+        self.current_spill_bytes += len(response)
+        while self.current_spill_bytes > self.max_spill_bytes:
+            _, evicted = self._spilled.popitem(last=False)
+            self.current_spill_bytes -= evicted.size
+            _remove_file(evicted.path)
+
+    @staticmethod
+    def _read_spilled(spilled: _SpilledResponse) -> Optional[bytes]:
+        try:
+            with open(spilled.path, "rb") as f:
+                response = f.read()
+        except OSError as e:
+            logging.error(e, stack_info=True, exc_info=True)
+            return None
+        _remove_file(spilled.path)
+        return response
+
+
+def _hash_key(key: ResponseKey) -> str:
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+def _remove_file(path: Path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
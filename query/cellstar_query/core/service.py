@@ -1,26 +1,61 @@
-import json
+import asyncio
+import functools
+import hashlib
+import logging
 from collections import defaultdict
 from math import ceil, floor
-from typing import Optional, Tuple
+from typing import AsyncIterator, Awaitable, Callable, Hashable, Optional, Tuple
 
-from cellstar_db.models import GeometricSegmentationData, MeshesData, VolumeMetadata
-from cellstar_db.protocol import VolumeServerDB
+import numpy as np
+from cellstar_db.models import (
+    CatalogEntriesPage,
+    ChunkGrid,
+    ChunkGridsData,
+    GeometricSegmentationData,
+    MeshesData,
+    QuantizationDataDict,
+    VolumeMetadata,
+)
+from cellstar_db.protocol import DBReadContext, VolumeServerDB
+from cellstar_db.utils.content_encoding import (
+    CACHED_LEVELS,
+    IDENTITY,
+    STREAMING_LEVELS,
+    compress,
+)
+from cellstar_db.utils.executor import run_in_executor
 from cellstar_query.core.models import GridSliceBox
+from cellstar_query.core.prepared_meshes_cache import PreparedMeshesCache
+from cellstar_query.core.response_cache import ResponseCache
 from cellstar_query.core.timing import Timing
 from cellstar_query.requests import (
+    CatalogEntriesRequest,
     EntriesRequest,
     GeometricSegmentationRequest,
+    MeshBatchRequest,
     MeshRequest,
     MetadataRequest,
     VolumeRequestBox,
     VolumeRequestDataKind,
     VolumeRequestInfo,
+    VolumeRequestTile,
 )
 from cellstar_query.serialization.cif import (
     serialize_meshes,
+    serialize_segmentation_block_header,
+    serialize_volume_block_header,
     serialize_volume_info,
     serialize_volume_slice,
+    serialize_volume_slice_header,
 )
+from cellstar_query.serialization.data.meshes_for_cif import MeshesForCif
+from cellstar_query.serialization.data.volume_info import VolumeInfo
+from cellstar_query.serialization.streaming import (
+    StreamedArrayCategory,
+    encode_array_part,
+)
+from cellstar_query.serialization.volume_cif_categories import encoders
+from ciftools.binary.encoder import BinaryCIFEncoder
 
 from cellstar_db.models import DownsamplingLevelInfo
 
@@ -28,24 +63,20 @@ __MAX_DOWN_SAMPLING_VALUE__ = 1000000
 
 
 class VolumeServerService:
-    def __init__(self, db: VolumeServerDB):
+    def __init__(
+        self,
+        db: VolumeServerDB,
+        read_mode: str = "dask",
+        response_cache: Optional[ResponseCache] = None,
+        prepared_meshes_cache: Optional[PreparedMeshesCache] = None,
+    ):
         self.db = db
-
-    async def _filter_entries_by_keyword(
-        self, namespace: str, entries: list[str], keyword: str
-    ) -> list[str]:
-        filtered = []
-        for entry in entries:
-            if keyword in entry:
-                filtered.append(entry)
-                continue
-
-            annotations = await self.db.read_annotations(namespace, entry)
-            if keyword.lower() in json.dumps(annotations).lower():
-                filtered.append(entry)
-                continue
-
-        return filtered
+        # slicing mode of DBReadContext reads, e.g. "dask" or "tensorstore"
+        self.read_mode = read_mode
+        # cache of encoded cell, volume info and mesh responses, disabled if None
+        self.response_cache = response_cache
+        # cache of meshes of single segments prepared for BinaryCIF, disabled if None
+        self.prepared_meshes_cache = prepared_meshes_cache
 
     async def get_entries(self, req: EntriesRequest) -> dict[str, list[str]]:
         limit = req.limit
@@ -53,24 +84,26 @@ class VolumeServerService:
         if limit == 0:
             return entries
 
-        sources = await self.db.list_sources()
-        for source in sources:
-            retrieved = await self.db.list_entries(source, limit)
-            if req.keyword:
-                retrieved = await self._filter_entries_by_keyword(
-                    source, retrieved, req.keyword
-                )
+        if req.keyword:
+            return await self.db.search_entries(req.keyword, limit, req.offset)
 
-            if len(retrieved) == 0:
-                continue
-
-            entries[source] = retrieved
-            limit -= len(retrieved)
-            if limit == 0:
-                break
+        page = await self.db.list_catalog_entries(limit)
+        for entry in page["entries"]:
+            entries.setdefault(entry["source"], []).append(entry["entry_id"])
 
         return entries
 
+    async def get_catalog_entries(
+        self, req: CatalogEntriesRequest
+    ) -> CatalogEntriesPage:
+        return await self.db.list_catalog_entries(
+            req.limit,
+            source=req.source,
+            data_kinds=req.data_kinds,
+            entry_id_prefix=req.entry_id_prefix,
+            cursor=req.cursor,
+        )
+
     async def get_metadata(self, req: MetadataRequest) -> dict:
         grid = await self.db.read_metadata(req.source, req.structure_id)
         try:
@@ -81,15 +114,14 @@ class VolumeServerService:
         return {"grid": grid.json_metadata(), "annotation": annotation}
 
     async def get_volume_data(
-        self, req: VolumeRequestInfo, req_box: Optional[VolumeRequestBox] = None
+        self,
+        req: VolumeRequestInfo,
+        req_box: Optional[VolumeRequestBox] = None,
+        encoding: str = IDENTITY,
     ) -> bytes:
+        """Returns BinaryCIF compressed in given content encoding"""
         metadata = await self.db.read_metadata(req.source, req.structure_id)
-
-        lattice_ids = metadata.segmentation_lattice_ids() or []
-        if req.segmentation_id not in lattice_ids:
-            lattice_id = lattice_ids[0] if len(lattice_ids) > 0 else None
-        else:
-            lattice_id = req.segmentation_id
+        lattice_id = self._request_lattice_id(req, metadata)
 
         slice_box = self._decide_slice_box(req.max_points, req_box, metadata)
 
@@ -103,6 +135,406 @@ class VolumeServerService:
         print(f"  Top Right: {slice_box.top_right}")
         print(f"  Volume: {slice_box.volume}")
 
+        if req_box is None:
+            # cell queries are the same for everyone opening the entry
+            request_key = (
+                slice_box.downsampling_rate,
+                tuple(slice_box.bottom_left),
+                tuple(slice_box.top_right),
+                req.time,
+                req.channel_id,
+                lattice_id,
+                req.quantized,
+            )
+            return await self._cached_response(
+                endpoint=f"{req.data_kind.value}/cell",
+                source=req.source,
+                structure_id=req.structure_id,
+                request_key=request_key,
+                create=lambda: self._get_volume_data(
+                    req, metadata, lattice_id, slice_box
+                ),
+                encoding=encoding,
+            )
+
+        response = await self._get_volume_data(req, metadata, lattice_id, slice_box)
+        return await self._compress(response, encoding, STREAMING_LEVELS)
+
+    async def stream_volume_data(
+        self, req: VolumeRequestInfo, req_box: Optional[VolumeRequestBox] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Returns the same BinaryCIF as get_volume_data in parts.
+        Values are read, encoded and written per chunk layer (along the slowest axis
+        of the flattened values), so memory does not grow with the box size.
+        The first layers are read before returning, so that errors are raised
+        before the response is started
+        """
+        metadata = await self.db.read_metadata(req.source, req.structure_id)
+
+        slice_box = self._decide_slice_box(req.max_points, req_box, metadata)
+        if slice_box is None:
+            raise RuntimeError("No data for request box")
+
+        return await self._stream_levels(req, metadata, [slice_box])
+
+    async def stream_progressive_volume_data(
+        self, req: VolumeRequestInfo, req_box: Optional[VolumeRequestBox] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Like stream_volume_data, but with data blocks of all available downsampling
+        levels, from the coarsest one to the one get_volume_data would return for
+        req.max_points. Each block is written as soon as its layers are read,
+        so the client can show the coarsest level before the finer ones arrive
+        """
+        metadata = await self.db.read_metadata(req.source, req.structure_id)
+
+        slice_boxes = self._progressive_slice_boxes(req.max_points, req_box, metadata)
+        if len(slice_boxes) == 0:
+            raise RuntimeError("No data for request box")
+
+        return await self._stream_levels(req, metadata, slice_boxes)
+
+    async def _stream_levels(
+        self,
+        req: VolumeRequestInfo,
+        metadata: VolumeMetadata,
+        slice_boxes: list[GridSliceBox],
+    ) -> AsyncIterator[bytes]:
+        """
+        Data blocks of the first slice box are started (their first layers are read)
+        before returning, blocks of the following ones when they are reached
+        """
+        lattice_id = self._request_lattice_id(req, metadata)
+        if req.data_kind == VolumeRequestDataKind.segmentation:
+            channel_id = metadata.json_metadata()["volumes"]["channel_ids"][0]
+        else:
+            channel_id = req.channel_id
+
+        reader = self.db.read(namespace=req.source, key=req.structure_id)
+        try:
+            grids = await reader.read_chunk_grids()
+        except Exception:
+            reader.close()
+            raise
+
+        async def start_blocks(slice_box: GridSliceBox) -> list[AsyncIterator[bytes]]:
+            volume_info = VolumeInfo(
+                name="volume",
+                metadata=metadata,
+                box=slice_box,
+                time=req.time,
+                channel_id=channel_id,
+            )
+            blocks: list[AsyncIterator[bytes]] = []
+            try:
+                if req.data_kind != VolumeRequestDataKind.segmentation:
+                    blocks.append(
+                        await self._stream_volume_block(
+                            reader, req, metadata, slice_box, volume_info, grids
+                        )
+                    )
+                if req.data_kind != VolumeRequestDataKind.volume:
+                    blocks.append(
+                        await self._stream_segmentation_block(
+                            reader, req, lattice_id, slice_box, volume_info, grids
+                        )
+                    )
+            except Exception:
+                for block in blocks:
+                    await block.aclose()
+                raise
+            return blocks
+
+        try:
+            first_blocks = await start_blocks(slice_boxes[0])
+        except Exception:
+            reader.close()
+            raise
+
+        return self._stream_data_blocks(
+            reader,
+            data_block_count=len(first_blocks) * len(slice_boxes),
+            first_blocks=first_blocks,
+            next_blocks=[
+                functools.partial(start_blocks, slice_box)
+                for slice_box in slice_boxes[1:]
+            ],
+        )
+
+    async def _stream_data_blocks(
+        self,
+        reader: DBReadContext,
+        data_block_count: int,
+        first_blocks: list[AsyncIterator[bytes]],
+        next_blocks: list[Callable[[], Awaitable[list[AsyncIterator[bytes]]]]],
+    ) -> AsyncIterator[bytes]:
+        blocks = first_blocks
+        try:
+            yield serialize_volume_slice_header(data_block_count)
+            for i in range(len(next_blocks) + 1):
+                if i > 0:
+                    blocks = await next_blocks[i - 1]()
+                for block in blocks:
+                    async for part in block:
+                        yield part
+        finally:
+            for block in blocks:
+                await block.aclose()
+            reader.close()
+
+    async def _stream_volume_block(
+        self,
+        reader: DBReadContext,
+        req: VolumeRequestInfo,
+        metadata: VolumeMetadata,
+        slice_box: GridSliceBox,
+        volume_info: VolumeInfo,
+        grids: ChunkGridsData,
+    ) -> AsyncIterator[bytes]:
+        level = slice_box.downsampling_rate
+        grid = grids["volume"].get(level, {}).get(req.time, {}).get(req.channel_id)
+
+        # decoding parameters of quantized data sent as stored
+        quantization: Optional[QuantizationDataDict] = None
+
+        async def read_values(box) -> np.ndarray:
+            nonlocal quantization
+            volume = await reader.read_volume_slice(
+                down_sampling_ratio=level,
+                box=box,
+                channel_id=req.channel_id,
+                time=req.time,
+                mode=self.read_mode,
+                decode_quantized=not req.quantized,
+            )
+            quantization = volume.get("volume_quantization")
+            return np.ravel(volume["volume_slice"], order="F")
+
+        boxes = _chunk_layer_boxes(slice_box, grid)
+        first_values = await read_values(boxes[0])
+
+        if quantization is not None:
+            # quantized data is sent as stored, as in QuantizedVolumeData3dCategory
+            encoder, dtype = encoders.bytearray_encoder(None), first_values.dtype
+        else:
+            value_range = self._whole_level_value_range(
+                slice_box, metadata, req.time, req.channel_id
+            )
+            if value_range is None:
+                value_range = await reader.read_volume_value_range(
+                    down_sampling_ratio=level,
+                    box=(slice_box.bottom_left, slice_box.top_right),
+                    channel_id=req.channel_id,
+                    time=req.time,
+                )
+            if value_range is None:
+                # entries without chunk statistics
+                value_range = self._level_value_range(
+                    slice_box, metadata, req.time, req.channel_id
+                )
+            if (
+                value_range is None
+                and first_values.dtype.kind == "f"
+                and len(boxes) > 1
+            ):
+                logging.warning(
+                    f"No value statistics of {req.source}/{req.structure_id}, "
+                    f"{len(boxes) - 1} chunk layers are read twice to stream "
+                    "volume data, re-run preprocessing of the entry to compute them"
+                )
+            encoder, dtype = await self._decide_streamed_encoder(
+                first_values, "VolumeData3d", value_range, read_values, boxes
+            )
+
+        return self._stream_values(
+            header=serialize_volume_block_header(volume_info, quantization),
+            category=StreamedArrayCategory(
+                "volume_data_3d", "values", slice_box.volume, encoder
+            ),
+            first_values=first_values,
+            read_values=read_values,
+            boxes=boxes,
+            encoder=encoder,
+            dtype=dtype,
+        )
+
+    async def _stream_segmentation_block(
+        self,
+        reader: DBReadContext,
+        req: VolumeRequestInfo,
+        lattice_id: Optional[str],
+        slice_box: GridSliceBox,
+        volume_info: VolumeInfo,
+        grids: ChunkGridsData,
+    ) -> AsyncIterator[bytes]:
+        level = slice_box.downsampling_rate
+        grid = grids["segmentation"].get(lattice_id, {}).get(level, {}).get(req.time)
+
+        category_set_dict: dict = {}
+
+        async def read_values(box) -> np.ndarray:
+            nonlocal category_set_dict
+            segmentation = await reader.read_segmentation_slice(
+                lattice_id=lattice_id,
+                down_sampling_ratio=level,
+                box=box,
+                time=req.time,
+                mode=self.read_mode,
+            )
+            category_set_dict = segmentation["segmentation_slice"]["category_set_dict"]
+            return np.ravel(
+                segmentation["segmentation_slice"]["category_set_ids"], order="F"
+            )
+
+        boxes = _chunk_layer_boxes(slice_box, grid)
+        first_values = await read_values(boxes[0])
+        encoder, dtype = await self._decide_streamed_encoder(
+            first_values, "SegmentationData3d", None, read_values, boxes
+        )
+
+        return self._stream_values(
+            header=serialize_segmentation_block_header(volume_info, category_set_dict),
+            category=StreamedArrayCategory(
+                "segmentation_data_3d", "values", slice_box.volume, encoder
+            ),
+            first_values=first_values,
+            read_values=read_values,
+            boxes=boxes,
+            encoder=encoder,
+            dtype=dtype,
+        )
+
+    async def _decide_streamed_encoder(
+        self,
+        first_values: np.ndarray,
+        data_name: str,
+        value_range: Optional[tuple[float, float]],
+        read_values: Callable[..., Awaitable[np.ndarray]],
+        boxes: list,
+    ) -> tuple[BinaryCIFEncoder, np.dtype]:
+        """
+        Encoder of all values, decided from the first layer. Range of float values
+        that is not known in advance (entries without chunk and level statistics)
+        is computed by reading the remaining layers, which are read again
+        when they are streamed
+        """
+        if value_range is None and first_values.dtype.kind == "f":
+            data_min, data_max = first_values.min(), first_values.max()
+            for box in boxes[1:]:
+                values = await read_values(box)
+                data_min = min(data_min, values.min())
+                data_max = max(data_max, values.max())
+            value_range = (float(data_min), float(data_max))
+        return encoders.decide_encoder(first_values, data_name, value_range=value_range)
+
+    async def _stream_values(
+        self,
+        header: bytes,
+        category: StreamedArrayCategory,
+        first_values: np.ndarray,
+        read_values: Callable[..., Awaitable[np.ndarray]],
+        boxes: list,
+        encoder: BinaryCIFEncoder,
+        dtype: np.dtype,
+    ) -> AsyncIterator[bytes]:
+        yield header
+        try:
+            for i, box in enumerate(boxes):
+                if i == 0:
+                    values, first_values = first_values, None
+                else:
+                    values = await read_values(box)
+                encoded = await run_in_executor(
+                    self.db.executor, encode_array_part, encoder, dtype, values
+                )
+                for part in category.add(encoded, values.size):
+                    yield part
+            for part in category.finish():
+                yield part
+        finally:
+            category.close()
+
+    async def get_tile_manifest(self, req: MetadataRequest) -> ChunkGridsData:
+        with self.db.read(namespace=req.source, key=req.structure_id) as reader:
+            return await reader.read_chunk_grids()
+
+    async def get_volume_tile(
+        self, req: VolumeRequestInfo, tile: VolumeRequestTile, encoding: str = IDENTITY
+    ) -> bytes:
+        """
+        Returns data of a single chunk of the chunk grid of volume data array
+        (of segmentation grid array if only segmentation is requested).
+        Tiles do not depend on the request box or max_points (ignored),
+        so that they can be cached by URL
+        """
+        lattice_id = (
+            req.segmentation_id
+            if req.data_kind != VolumeRequestDataKind.volume
+            else None
+        )
+
+        async def create() -> bytes:
+            with self.db.read(namespace=req.source, key=req.structure_id) as reader:
+                grids = await reader.read_chunk_grids()
+            try:
+                if req.data_kind == VolumeRequestDataKind.segmentation:
+                    grid = grids["segmentation"][lattice_id][tile.level][req.time]
+                else:
+                    grid = grids["volume"][tile.level][req.time][req.channel_id]
+            except KeyError:
+                raise RuntimeError(
+                    f"No {req.data_kind.value} data for level {tile.level}, "
+                    f"time {req.time}"
+                )
+            if any(i >= n for i, n in zip(tile.index, grid["grid"])):
+                raise RuntimeError(
+                    f"Tile {tile.index} is outside of chunk grid {grid['grid']}"
+                )
+
+            chunks, shape = grid["chunks"], grid["shape"]
+            bottom_left = tuple(i * c for i, c in zip(tile.index, chunks))
+            top_right = tuple(
+                min((i + 1) * c, d) - 1 for i, c, d in zip(tile.index, chunks, shape)
+            )
+            slice_box = GridSliceBox(
+                downsampling_rate=tile.level,
+                bottom_left=bottom_left,  # type: ignore  # length is 3
+                top_right=top_right,  # type: ignore  # length is 3
+            )
+            metadata = await self.db.read_metadata(req.source, req.structure_id)
+            return await self._get_volume_data(req, metadata, lattice_id, slice_box)
+
+        return await self._cached_response(
+            endpoint=f"{req.data_kind.value}/tile",
+            source=req.source,
+            structure_id=req.structure_id,
+            request_key=(
+                tile.level,
+                tuple(tile.index),
+                req.time,
+                req.channel_id,
+                lattice_id,
+                req.quantized,
+            ),
+            create=create,
+            encoding=encoding,
+        )
+
+    def entry_etag(self, source: str, structure_id: str) -> str:
+        """
+        Returns HTTP entity tag of the current version of the entry
+        """
+        version = self.db.entry_version(source, structure_id)
+        return hashlib.sha256(repr(version).encode("utf-8")).hexdigest()[:32]
+
+    async def _get_volume_data(
+        self,
+        req: VolumeRequestInfo,
+        metadata: VolumeMetadata,
+        lattice_id: Optional[str],
+        slice_box: GridSliceBox,
+    ) -> bytes:
         with self.db.read(namespace=req.source, key=req.structure_id) as reader:
             if req.data_kind == VolumeRequestDataKind.all:
                 db_slice = await reader.read_slice(
@@ -111,6 +543,8 @@ class VolumeServerService:
                     box=(slice_box.bottom_left, slice_box.top_right),
                     channel_id=req.channel_id,
                     time=req.time,
+                    mode=self.read_mode,
+                    decode_quantized=not req.quantized,
                 )
             elif req.data_kind == VolumeRequestDataKind.volume:
                 db_slice = await reader.read_volume_slice(
@@ -118,6 +552,8 @@ class VolumeServerService:
                     box=(slice_box.bottom_left, slice_box.top_right),
                     channel_id=req.channel_id,
                     time=req.time,
+                    mode=self.read_mode,
+                    decode_quantized=not req.quantized,
                 )
             elif req.data_kind == VolumeRequestDataKind.segmentation:
                 db_slice = await reader.read_segmentation_slice(
@@ -125,17 +561,48 @@ class VolumeServerService:
                     down_sampling_ratio=slice_box.downsampling_rate,
                     box=(slice_box.bottom_left, slice_box.top_right),
                     time=req.time,
+                    mode=self.read_mode,
                 )
             else:
                 # This should be validated on the Pydantic data model level, but one never knows...
                 raise RuntimeError(f"{req.data_kind} is not a valid request data kind")
 
-        return serialize_volume_slice(db_slice, metadata, slice_box)
+        if (
+            db_slice.get("volume_slice") is not None
+            and "volume_quantization" not in db_slice
+        ):
+            value_range = self._whole_level_value_range(
+                slice_box, metadata, req.time, req.channel_id
+            )
+            if value_range is None and "volume_value_range" not in db_slice:
+                # entries without chunk statistics, values of the box are
+                # bounded by the range of the level (as in stream_volume_data)
+                value_range = self._level_value_range(
+                    slice_box, metadata, req.time, req.channel_id
+                )
+            if value_range is not None:
+                db_slice["volume_value_range"] = value_range
 
-    async def get_volume_info(self, req: MetadataRequest) -> bytes:
-        metadata = await self.db.read_metadata(req.source, req.structure_id)
-        box = self._decide_slice_box(None, None, metadata)
-        return serialize_volume_info(metadata, box)
+        return await run_in_executor(
+            self.db.executor, serialize_volume_slice, db_slice, metadata, slice_box
+        )
+
+    async def get_volume_info(
+        self, req: MetadataRequest, encoding: str = IDENTITY
+    ) -> bytes:
+        async def create() -> bytes:
+            metadata = await self.db.read_metadata(req.source, req.structure_id)
+            box = self._decide_slice_box(None, None, metadata)
+            return serialize_volume_info(metadata, box)
+
+        return await self._cached_response(
+            endpoint="volume_info",
+            source=req.source,
+            structure_id=req.structure_id,
+            request_key=None,
+            create=create,
+            encoding=encoding,
+        )
 
     async def get_geometric_segmentation(
         self, req: GeometricSegmentationRequest
@@ -150,7 +617,24 @@ class VolumeServerService:
                 raise Exception("Exception in get_geometric_segmentation: " + str(e))
         return gs
 
-    async def get_meshes_bcif(self, req: MeshRequest) -> bytes:
+    async def get_meshes_bcif(
+        self, req: MeshRequest, encoding: str = IDENTITY
+    ) -> bytes:
+        return await self._cached_response(
+            endpoint="mesh_bcif",
+            source=req.source,
+            structure_id=req.structure_id,
+            request_key=(
+                req.segmentation_id,
+                req.segment_id,
+                req.detail_lvl,
+                req.time,
+            ),
+            create=lambda: self._get_meshes_bcif(req),
+            encoding=encoding,
+        )
+
+    async def _get_meshes_bcif(self, req: MeshRequest) -> bytes:
         with Timing("read metadata"):
             metadata = await self.db.read_metadata(req.source, req.structure_id)
         # with Timing("decide box"):
@@ -162,37 +646,197 @@ class VolumeServerService:
             bottom_left=(0, 0, 0),
             top_right=tuple(d - 1 for d in metadata.sampled_grid_dimensions(1)),  # type: ignore  # length is 3
         )
+        with self.db.read(req.source, req.structure_id) as context:
+            try:
+                meshes_for_cif = await self._prepare_meshes(
+                    context,
+                    source=req.source,
+                    structure_id=req.structure_id,
+                    segmentation_id=req.segmentation_id,
+                    time=req.time,
+                    segment_id=req.segment_id,
+                    detail_lvl=req.detail_lvl,
+                )
+            except KeyError as e:
+                print("Exception in get_meshes: " + str(e))
+                meta = await self.db.read_metadata(req.source, req.structure_id)
+                segments_levels = self._extract_segments_detail_levels(
+                    meta, timeframe=req.time, segmentation_id=req.segmentation_id
+                )
+                error_msg = f"Invalid segment_id={req.segment_id} or detail_lvl={req.detail_lvl} (available segment_ids and detail_lvls: {segments_levels})"
+                raise KeyError(error_msg)
+        with Timing("serialize meshes"):
+            bcif = await run_in_executor(
+                self.db.executor,
+                serialize_meshes,
+                meshes_for_cif,
+                metadata,
+                box,
+                req.time,
+            )
+
+        return bcif
+
+    async def _prepare_meshes(
+        self,
+        context: DBReadContext,
+        source: str,
+        structure_id: str,
+        segmentation_id: str,
+        time: int,
+        segment_id: int,
+        detail_lvl: int,
+    ) -> MeshesForCif:
+        """
+        Returns meshes of a segment prepared for BinaryCIF, from prepared meshes
+        cache if it is enabled and has them for the current version of the entry
+        """
+        cache = self.prepared_meshes_cache
+        key = (source, structure_id, segmentation_id, time, segment_id, detail_lvl)
+        if cache is not None:
+            # taken before reading, see _cached_response
+            entry_version = self.db.entry_version(source, structure_id)
+            meshes_for_cif = cache.get(key, entry_version)
+            if meshes_for_cif is not None:
+                return meshes_for_cif
+
         with Timing("read meshes"):
-            with self.db.read(req.source, req.structure_id) as context:
-                try:
-                    meshes = await context.read_meshes(
+            meshes = await context.read_meshes(
+                segmentation_id=segmentation_id,
+                time=time,
+                segment_id=segment_id,
+                detail_lvl=detail_lvl,
+            )
+        with Timing("prepare meshes for cif"):
+            meshes_for_cif = await run_in_executor(
+                self.db.executor, MeshesForCif, meshes
+            )
+
+        if cache is not None:
+            cache.put(key, entry_version, meshes_for_cif)
+        return meshes_for_cif
+
+    async def get_meshes_bcif_batch(
+        self, req: MeshBatchRequest, encoding: str = IDENTITY
+    ) -> bytes:
+        """
+        Returns meshes of several segments (all of them if req.segment_ids is None)
+        in a single BinaryCIF, with segment_id columns
+        """
+        metadata = await self.db.read_metadata(req.source, req.structure_id)
+        detail_lvls = self._decide_mesh_detail_lvls(req, metadata)
+
+        return await self._cached_response(
+            endpoint="mesh_bcif_batch",
+            source=req.source,
+            structure_id=req.structure_id,
+            request_key=(
+                req.segmentation_id,
+                req.time,
+                tuple(detail_lvls.items()),
+            ),
+            create=lambda: self._get_meshes_bcif_batch(req, metadata, detail_lvls),
+            encoding=encoding,
+        )
+
+    async def _get_meshes_bcif_batch(
+        self,
+        req: MeshBatchRequest,
+        metadata: VolumeMetadata,
+        detail_lvls: dict[int, int],
+    ) -> bytes:
+        box = GridSliceBox(
+            downsampling_rate=1,
+            bottom_left=(0, 0, 0),
+            top_right=tuple(d - 1 for d in metadata.sampled_grid_dimensions(1)),  # type: ignore  # length is 3
+        )
+        with self.db.read(req.source, req.structure_id) as context:
+            segments_meshes = await asyncio.gather(
+                *(
+                    self._prepare_meshes(
+                        context,
+                        source=req.source,
+                        structure_id=req.structure_id,
                         segmentation_id=req.segmentation_id,
                         time=req.time,
-                        segment_id=req.segment_id,
-                        detail_lvl=req.detail_lvl,
-                    )
-                    # try:  # DEBUG, TODO REMOVE
-                    #     meshes1 = await context.read_meshes(req.segment_id+1, req.detail_lvl)
-                    #     for mesh in meshes1: mesh['mesh_id'] = 1
-                    #     meshes += meshes1
-                    #     meshes2 = await context.read_meshes(req.segment_id+2, req.detail_lvl)
-                    #     for mesh in meshes2: mesh['mesh_id'] = 2
-                    #     meshes += meshes2
-                    # except KeyError:
-                    #     pass
-                except KeyError as e:
-                    print("Exception in get_meshes: " + str(e))
-                    meta = await self.db.read_metadata(req.source, req.structure_id)
-                    segments_levels = self._extract_segments_detail_levels(
-                        meta, timeframe=req.time, segmentation_id=req.segmentation_id
+                        segment_id=segment_id,
+                        detail_lvl=detail_lvl,
                     )
-                    error_msg = f"Invalid segment_id={req.segment_id} or detail_lvl={req.detail_lvl} (available segment_ids and detail_lvls: {segments_levels})"
-                    raise KeyError(error_msg)
+                    for segment_id, detail_lvl in detail_lvls.items()
+                )
+            )
+
         with Timing("serialize meshes"):
-            bcif = serialize_meshes(meshes, metadata, box, req.time)
+            meshes_for_cif = await run_in_executor(
+                self.db.executor,
+                MeshesForCif.concatenate,
+                segments_meshes,
+                list(detail_lvls.keys()),
+            )
+            bcif = await run_in_executor(
+                self.db.executor,
+                serialize_meshes,
+                meshes_for_cif,
+                metadata,
+                box,
+                req.time,
+            )
 
         return bcif
 
+    def _decide_mesh_detail_lvls(
+        self, req: MeshBatchRequest, metadata: VolumeMetadata
+    ) -> dict[int, int]:
+        """
+        Returns detail level of each requested segment. Segments that do not have
+        the requested (or decided) level, as their meshes were not simplified that
+        far, get their coarsest one. With max_triangles, the finest level with total
+        number of triangles (from metadata) not over max_triangles is used,
+        the coarsest one if there is no such level
+        """
+        segments_levels = self._extract_segments_detail_levels(
+            metadata, timeframe=req.time, segmentation_id=req.segmentation_id
+        )
+        if req.segment_ids is None:
+            segment_ids = list(segments_levels.keys())
+        else:
+            segment_ids = list(dict.fromkeys(req.segment_ids))
+            missing = [s for s in segment_ids if s not in segments_levels]
+            if len(missing) > 0:
+                raise KeyError(
+                    f"Invalid segment_ids={missing} (available segment_ids and detail_lvls: {segments_levels})"
+                )
+        if len(segment_ids) == 0:
+            raise KeyError(
+                f"No meshes for segmentation_id={req.segmentation_id} and time={req.time}"
+            )
+
+        def segment_lvl(segment_id: int, detail_lvl: int) -> int:
+            levels = segments_levels[segment_id]
+            finer_levels = [lvl for lvl in levels if lvl <= detail_lvl]
+            return max(finer_levels) if len(finer_levels) > 0 else min(levels)
+
+        if req.max_triangles is None:
+            return {s: segment_lvl(s, req.detail_lvl) for s in segment_ids}
+
+        segments_meshes_metadata = metadata.json_metadata()["segmentation_meshes"][
+            "segmentation_metadata"
+        ][req.segmentation_id]["mesh_timeframes"][str(req.time)]["segment_ids"]
+
+        def triangle_count(segment_id: int, detail_lvl: int) -> int:
+            meshes = segments_meshes_metadata[str(segment_id)]["detail_lvls"][
+                str(detail_lvl)
+            ]["mesh_ids"]
+            return sum(mesh["num_triangles"] for mesh in meshes.values())
+
+        all_levels = sorted({lvl for s in segment_ids for lvl in segments_levels[s]})
+        for detail_lvl in all_levels:
+            detail_lvls = {s: segment_lvl(s, detail_lvl) for s in segment_ids}
+            total = sum(triangle_count(s, lvl) for s, lvl in detail_lvls.items())
+            if total <= req.max_triangles:
+                break
+        return detail_lvls
+
     async def get_meshes(self, req: MeshRequest) -> MeshesData:
         with self.db.read(req.source, req.structure_id) as context:
             try:
@@ -251,6 +895,119 @@ class VolumeServerService:
         sorted_result = {seg: sorted(result[seg]) for seg in sorted(result.keys())}
         return sorted_result
 
+    async def _cached_response(
+        self,
+        endpoint: str,
+        source: str,
+        structure_id: str,
+        request_key: Hashable,
+        create: Callable[[], Awaitable[bytes]],
+        encoding: str = IDENTITY,
+    ) -> bytes:
+        """
+        Returns response in given content encoding from response cache if it is
+        enabled and has a response for the current version of the entry,
+        otherwise creates (compresses) and caches it
+        """
+        if self.response_cache is None:
+            return await self._compress(await create(), encoding, STREAMING_LEVELS)
+
+        entry = (source, structure_id)
+        # taken before reading, so that a response read from an entry that is
+        # being rewritten is not stored under the new version
+        entry_version = self.db.entry_version(source, structure_id)
+        cached = await asyncio.to_thread(
+            self.response_cache.get,
+            endpoint,
+            entry,
+            request_key,
+            entry_version,
+            (encoding, IDENTITY) if encoding != IDENTITY else (IDENTITY,),
+        )
+        if cached is None:
+            cached_encoding, response = IDENTITY, await create()
+            await asyncio.to_thread(
+                self.response_cache.put,
+                endpoint,
+                entry,
+                request_key,
+                entry_version,
+                response,
+            )
+        else:
+            cached_encoding, response = cached
+
+        if cached_encoding != encoding:
+            # compressed once, later requests get it from the cache
+            response = await self._compress(response, encoding, CACHED_LEVELS)
+            await asyncio.to_thread(
+                self.response_cache.put,
+                endpoint,
+                entry,
+                request_key,
+                entry_version,
+                response,
+                encoding,
+            )
+        return response
+
+    async def _compress(
+        self, response: bytes, encoding: str, levels: dict[str, int]
+    ) -> bytes:
+        if encoding == IDENTITY:
+            return response
+        return await run_in_executor(
+            self.db.executor, compress, response, encoding, levels[encoding]
+        )
+
+    @staticmethod
+    def _request_lattice_id(
+        req: VolumeRequestInfo, metadata: VolumeMetadata
+    ) -> Optional[str]:
+        lattice_ids = metadata.segmentation_lattice_ids() or []
+        if req.segmentation_id not in lattice_ids:
+            return lattice_ids[0] if len(lattice_ids) > 0 else None
+        return req.segmentation_id
+
+    def _whole_level_value_range(
+        self,
+        slice_box: GridSliceBox,
+        metadata: VolumeMetadata,
+        time: int,
+        channel_id: str,
+    ) -> Optional[tuple[float, float]]:
+        """
+        Returns (min, max) of the downsampling level from metadata statistics
+        if slice box covers the whole level, None otherwise
+        """
+        level = slice_box.downsampling_rate
+        grid_dimensions = metadata.sampled_grid_dimensions(level)
+        if tuple(slice_box.bottom_left) != (0, 0, 0) or tuple(
+            slice_box.top_right
+        ) != tuple(d - 1 for d in grid_dimensions):
+            return None
+        return self._level_value_range(slice_box, metadata, time, channel_id)
+
+    def _level_value_range(
+        self,
+        slice_box: GridSliceBox,
+        metadata: VolumeMetadata,
+        time: int,
+        channel_id: str,
+    ) -> Optional[tuple[float, float]]:
+        """
+        Returns (min, max) of the downsampling level of the slice box
+        from metadata statistics, None if they are not available
+        """
+        level = slice_box.downsampling_rate
+        try:
+            statistics = metadata.json_metadata()["volumes"]["volume_sampling_info"][
+                "descriptive_statistics"
+            ][str(level)][str(time)][str(channel_id)]
+        except KeyError:
+            return None
+        return statistics["min"], statistics["max"]
+
     def _decide_slice_box(
         self,
         max_points: Optional[int],
@@ -269,29 +1026,8 @@ class VolumeServerService:
         # if provided - calculates box based on that
         # if not, calculates box based on downsampling
         # returns first box
-        for downsampling_level_info in metadata.volume_downsamplings():
-            if downsampling_level_info["available"] == False:
-                continue
-            
-            if len(metadata.segmentation_lattice_ids()) > 0:
-                level = downsampling_level_info["level"]
-                exists = self._check_if_downsampling_exists_in_segmentations(level, metadata)
-                if not exists:
-                    continue
-            
-            downsampling_rate = downsampling_level_info["level"]
-            if req_box:
-                box = calc_slice_box(
-                    req_box.bottom_left, req_box.top_right, metadata, downsampling_rate
-                )
-            # for cell query
-            # this branch works
-            else:
-                box = GridSliceBox(
-                    downsampling_rate=downsampling_rate,
-                    bottom_left=(0, 0, 0),
-                    top_right=tuple(d - 1 for d in metadata.sampled_grid_dimensions(downsampling_rate)),  # type: ignore  # length is 3
-                )
+        for downsampling_rate in self._available_downsampling_rates(metadata):
+            box = self._slice_box_at_level(downsampling_rate, req_box, metadata)
 
             # TODO: decide what to do when max_points is 0
             # e.g. whether to return the lowest downsampling or highest
@@ -307,6 +1043,88 @@ class VolumeServerService:
 
         return box
 
+    def _progressive_slice_boxes(
+        self,
+        max_points: Optional[int],
+        req_box: Optional[VolumeRequestBox],
+        metadata: VolumeMetadata,
+    ) -> list[GridSliceBox]:
+        """
+        Slice boxes of available downsampling levels from the coarsest one
+        to the one picked by _decide_slice_box
+        """
+        finest_box = self._decide_slice_box(max_points, req_box, metadata)
+        if finest_box is None:
+            return []
+
+        boxes = []
+        for downsampling_rate in self._available_downsampling_rates(metadata):
+            if downsampling_rate < finest_box.downsampling_rate:
+                continue
+            box = self._slice_box_at_level(downsampling_rate, req_box, metadata)
+            if box is not None:
+                boxes.append(box)
+        return sorted(boxes, key=lambda b: b.downsampling_rate, reverse=True)
+
+    def _available_downsampling_rates(self, metadata: VolumeMetadata) -> list[int]:
+        """
+        Volume downsampling levels that are available (also in all segmentation
+        lattices, if there are any), in order of metadata
+        """
+        rates = []
+        for downsampling_level_info in metadata.volume_downsamplings():
+            if downsampling_level_info["available"] == False:
+                continue
+
+            level = downsampling_level_info["level"]
+            if len(metadata.segmentation_lattice_ids()) > 0:
+                exists = self._check_if_downsampling_exists_in_segmentations(
+                    level, metadata
+                )
+                if not exists:
+                    continue
+            rates.append(level)
+        return rates
+
+    def _slice_box_at_level(
+        self,
+        downsampling_rate: int,
+        req_box: Optional[VolumeRequestBox],
+        metadata: VolumeMetadata,
+    ) -> Optional[GridSliceBox]:
+        if req_box:
+            return calc_slice_box(
+                req_box.bottom_left, req_box.top_right, metadata, downsampling_rate
+            )
+        # for cell query
+        return GridSliceBox(
+            downsampling_rate=downsampling_rate,
+            bottom_left=(0, 0, 0),
+            top_right=tuple(d - 1 for d in metadata.sampled_grid_dimensions(downsampling_rate)),  # type: ignore  # length is 3
+        )
+
+
+def _chunk_layer_boxes(
+    box: GridSliceBox, grid: Optional[ChunkGrid]
+) -> list[tuple[tuple[int, int, int], tuple[int, int, int]]]:
+    """
+    Splits box (inclusive) into boxes of single chunk layers along the last axis,
+    the slowest axis of values flattened in Fortran order.
+    The whole box is returned if chunk grid is not known
+    """
+    bl, tr = box.bottom_left, box.top_right
+    if grid is None:
+        return [(tuple(bl), tuple(tr))]
+
+    chunk_size = grid["chunks"][2]
+    boxes = []
+    start = bl[2]
+    while start <= tr[2]:
+        end = min((start // chunk_size + 1) * chunk_size - 1, tr[2])
+        boxes.append(((bl[0], bl[1], start), (tr[0], tr[1], end)))
+        start = end + 1
+    return boxes
+
 
 def calc_slice_box(
     req_min: Tuple[float, float, float],
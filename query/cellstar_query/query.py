@@ -1,12 +1,18 @@
+from typing import Optional
+
+from cellstar_db.utils.content_encoding import IDENTITY
 from cellstar_query.core.service import VolumeServerService
 from cellstar_query.requests import (
+    CatalogEntriesRequest,
     EntriesRequest,
     GeometricSegmentationRequest,
+    MeshBatchRequest,
     MeshRequest,
     MetadataRequest,
     VolumeRequestBox,
     VolumeRequestDataKind,
     VolumeRequestInfo,
+    VolumeRequestTile,
 )
 
 HTTP_CODE_UNPROCESSABLE_ENTITY = 422
@@ -25,8 +31,13 @@ async def get_segmentation_box_query(
     b2: float,
     b3: float,
     max_points: int,
+    stream: bool = False,
 ):
-    response = await volume_server.get_volume_data(
+    """If stream is True, returns async iterator over parts of the response"""
+    get_volume_data = (
+        volume_server.stream_volume_data if stream else volume_server.get_volume_data
+    )
+    response = await get_volume_data(
         req=VolumeRequestInfo(
             source=source,
             structure_id=id,
@@ -53,8 +64,45 @@ async def get_volume_box_query(
     b2: float,
     b3: float,
     max_points: int,
+    quantized: bool = False,
+    stream: bool = False,
 ):
-    response = await volume_server.get_volume_data(
+    """If stream is True, returns async iterator over parts of the response"""
+    get_volume_data = (
+        volume_server.stream_volume_data if stream else volume_server.get_volume_data
+    )
+    response = await get_volume_data(
+        req=VolumeRequestInfo(
+            source=source,
+            structure_id=id,
+            channel_id=channel_id,
+            time=time,
+            max_points=max_points,
+            data_kind=VolumeRequestDataKind.volume,
+            quantized=quantized,
+        ),
+        req_box=VolumeRequestBox(bottom_left=(a1, a2, a3), top_right=(b1, b2, b3)),
+    )
+    return response
+
+
+async def get_volume_progressive_box_query(
+    volume_server: VolumeServerService,
+    source: str,
+    id: str,
+    time: int,
+    channel_id: str,
+    a1: float,
+    a2: float,
+    a3: float,
+    b1: float,
+    b2: float,
+    b3: float,
+    max_points: int,
+    quantized: bool = False,
+):
+    """Returns async iterator over parts of the response"""
+    response = await volume_server.stream_progressive_volume_data(
         req=VolumeRequestInfo(
             source=source,
             structure_id=id,
@@ -62,12 +110,37 @@ async def get_volume_box_query(
             time=time,
             max_points=max_points,
             data_kind=VolumeRequestDataKind.volume,
+            quantized=quantized,
         ),
         req_box=VolumeRequestBox(bottom_left=(a1, a2, a3), top_right=(b1, b2, b3)),
     )
     return response
 
 
+async def get_volume_progressive_cell_query(
+    volume_server: VolumeServerService,
+    source: str,
+    id: str,
+    time: int,
+    channel_id: str,
+    max_points: int,
+    quantized: bool = False,
+):
+    """Returns async iterator over parts of the response"""
+    response = await volume_server.stream_progressive_volume_data(
+        req=VolumeRequestInfo(
+            source=source,
+            structure_id=id,
+            channel_id=channel_id,
+            time=time,
+            max_points=max_points,
+            data_kind=VolumeRequestDataKind.volume,
+            quantized=quantized,
+        ),
+    )
+    return response
+
+
 async def get_segmentation_cell_query(
     volume_server: VolumeServerService,
     source: str,
@@ -75,6 +148,7 @@ async def get_segmentation_cell_query(
     segmentation: str,
     time: int,
     max_points: int,
+    encoding: str = IDENTITY,
 ):
     response = await volume_server.get_volume_data(
         req=VolumeRequestInfo(
@@ -85,6 +159,7 @@ async def get_segmentation_cell_query(
             max_points=max_points,
             data_kind=VolumeRequestDataKind.segmentation,
         ),
+        encoding=encoding,
     )
 
     return response
@@ -97,6 +172,8 @@ async def get_volume_cell_query(
     time: int,
     channel_id: str,
     max_points: int,
+    quantized: bool = False,
+    encoding: str = IDENTITY,
 ):
     response = await volume_server.get_volume_data(
         req=VolumeRequestInfo(
@@ -106,7 +183,109 @@ async def get_volume_cell_query(
             channel_id=channel_id,
             max_points=max_points,
             data_kind=VolumeRequestDataKind.volume,
+            quantized=quantized,
+        ),
+        encoding=encoding,
+    )
+
+    return response
+
+
+async def get_tile_manifest_query(
+    volume_server: VolumeServerService,
+    source: str,
+    id: str,
+):
+    request = MetadataRequest(source=source, structure_id=id)
+    manifest = await volume_server.get_tile_manifest(request)
+    return manifest
+
+
+async def get_volume_tile_query(
+    volume_server: VolumeServerService,
+    source: str,
+    id: str,
+    level: int,
+    time: int,
+    channel_id: str,
+    i: int,
+    j: int,
+    k: int,
+    quantized: bool = False,
+    encoding: str = IDENTITY,
+):
+    response = await volume_server.get_volume_tile(
+        req=VolumeRequestInfo(
+            source=source,
+            structure_id=id,
+            time=time,
+            channel_id=channel_id,
+            max_points=0,
+            data_kind=VolumeRequestDataKind.volume,
+            quantized=quantized,
+        ),
+        tile=VolumeRequestTile(level=level, index=(i, j, k)),
+        encoding=encoding,
+    )
+
+    return response
+
+
+async def get_segmentation_tile_query(
+    volume_server: VolumeServerService,
+    source: str,
+    id: str,
+    segmentation_id: str,
+    level: int,
+    time: int,
+    i: int,
+    j: int,
+    k: int,
+    encoding: str = IDENTITY,
+):
+    response = await volume_server.get_volume_tile(
+        req=VolumeRequestInfo(
+            source=source,
+            structure_id=id,
+            segmentation_id=segmentation_id,
+            time=time,
+            max_points=0,
+            data_kind=VolumeRequestDataKind.segmentation,
+        ),
+        tile=VolumeRequestTile(level=level, index=(i, j, k)),
+        encoding=encoding,
+    )
+
+    return response
+
+
+async def get_tile_query(
+    volume_server: VolumeServerService,
+    source: str,
+    id: str,
+    segmentation_id: str,
+    level: int,
+    time: int,
+    channel_id: str,
+    i: int,
+    j: int,
+    k: int,
+    quantized: bool = False,
+    encoding: str = IDENTITY,
+):
+    response = await volume_server.get_volume_tile(
+        req=VolumeRequestInfo(
+            source=source,
+            structure_id=id,
+            segmentation_id=segmentation_id,
+            time=time,
+            channel_id=channel_id,
+            max_points=0,
+            data_kind=VolumeRequestDataKind.all,
+            quantized=quantized,
         ),
+        tile=VolumeRequestTile(level=level, index=(i, j, k)),
+        encoding=encoding,
     )
 
     return response
@@ -126,9 +305,10 @@ async def get_volume_info_query(
     volume_server: VolumeServerService,
     id: str,
     source: str,
+    encoding: str = IDENTITY,
 ):
     request = MetadataRequest(source=source, structure_id=id)
-    response_bytes = await volume_server.get_volume_info(request)
+    response_bytes = await volume_server.get_volume_info(request, encoding=encoding)
 
     return response_bytes
 
@@ -141,13 +321,32 @@ async def get_list_entries_query(volume_server: VolumeServerService, limit: int)
 
 
 async def get_list_entries_keyword_query(
-    volume_server: VolumeServerService, limit: int, keyword: str
+    volume_server: VolumeServerService, limit: int, keyword: str, offset: int = 0
 ):
-    request = EntriesRequest(limit=limit, keyword=keyword)
+    request = EntriesRequest(limit=limit, keyword=keyword, offset=offset)
     response = await volume_server.get_entries(request)
     return response
 
 
+async def get_catalog_entries_query(
+    volume_server: VolumeServerService,
+    limit: int,
+    source: Optional[str] = None,
+    data_kinds: Optional[list[str]] = None,
+    entry_id_prefix: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
+    request = CatalogEntriesRequest(
+        limit=limit,
+        source=source,
+        data_kinds=data_kinds or [],
+        entry_id_prefix=entry_id_prefix,
+        cursor=cursor,
+    )
+    response = await volume_server.get_catalog_entries(request)
+    return response
+
+
 async def get_meshes_query(
     volume_server: VolumeServerService,
     source: str,
@@ -177,6 +376,7 @@ async def get_meshes_bcif_query(
     time: int,
     segment_id: int,
     detail_lvl: int,
+    encoding: str = IDENTITY,
 ):
     request = MeshRequest(
         source=source,
@@ -187,7 +387,35 @@ async def get_meshes_bcif_query(
         time=time,
     )
 
-    response_bytes = await volume_server.get_meshes_bcif(request)
+    response_bytes = await volume_server.get_meshes_bcif(request, encoding=encoding)
+    return response_bytes
+
+
+async def get_meshes_bcif_batch_query(
+    volume_server: VolumeServerService,
+    source: str,
+    id: str,
+    segmentation_id: str,
+    time: int,
+    segment_ids: Optional[list[int]],
+    detail_lvl: Optional[int] = None,
+    max_triangles: Optional[int] = None,
+    encoding: str = IDENTITY,
+):
+    """segment_ids=None means all segments"""
+    request = MeshBatchRequest(
+        source=source,
+        structure_id=id,
+        segmentation_id=segmentation_id,
+        time=time,
+        segment_ids=segment_ids,
+        detail_lvl=detail_lvl,
+        max_triangles=max_triangles,
+    )
+
+    response_bytes = await volume_server.get_meshes_bcif_batch(
+        request, encoding=encoding
+    )
     return response_bytes
 
 
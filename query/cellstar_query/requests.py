@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 from pydantic import BaseModel, root_validator, validator
 
@@ -18,6 +18,8 @@ class VolumeRequestInfo(BaseModel):
     time: int
     max_points: int
     data_kind: VolumeRequestDataKind = VolumeRequestDataKind.all
+    # if True, quantized volume data is sent as stored, with decoding parameters
+    quantized: bool = False
 
     @validator("segmentation_id")
     def _validate_segmentation_ui(cls, id: Optional[str], values):
@@ -46,9 +48,33 @@ class VolumeRequestBox(BaseModel):
         return values
 
 
+class VolumeRequestTile(BaseModel):
+    # downsampling level and index of the chunk in its chunk grid
+    level: int
+    index: Tuple[int, int, int]
+
+    @validator("index")
+    def _validate_index(cls, index: Tuple[int, int, int]):
+        if any(i < 0 for i in index):
+            raise ValueError(f"{index} is not a valid tile index")
+        return index
+
+
 class EntriesRequest(BaseModel):
     limit: int
     keyword: str
+    # used for paging keyword search results
+    offset: int = 0
+
+
+class CatalogEntriesRequest(BaseModel):
+    limit: int
+    source: Optional[str] = None
+    # entries having all of these data kinds (see EntryDataKind)
+    data_kinds: List[str] = []
+    entry_id_prefix: Optional[str] = None
+    # next_cursor of the previous page
+    cursor: Optional[str] = None
 
 
 class GeometricSegmentationRequest(BaseModel):
@@ -67,6 +93,25 @@ class MeshRequest(BaseModel):
     time: int
 
 
+class MeshBatchRequest(BaseModel):
+    source: str
+    structure_id: str
+    segmentation_id: str
+    time: int
+    # None means all segments of the segmentation
+    segment_ids: Optional[List[int]] = None
+    # either detail level or maximum total number of triangles,
+    # from which the finest detail level that fits is decided
+    detail_lvl: Optional[int] = None
+    max_triangles: Optional[int] = None
+
+    @root_validator(skip_on_failure=True)
+    def _validate_detail(cls, values):
+        if (values["detail_lvl"] is None) == (values["max_triangles"] is None):
+            raise ValueError("Exactly one of detail_lvl and max_triangles must be set")
+        return values
+
+
 class MetadataRequest(BaseModel):
     source: str
     structure_id: str
@@ -1,7 +1,7 @@
-from typing import Union
+from typing import Optional, Union
 
 import numpy as np
-from cellstar_db.models import MeshesData, VolumeMetadata, VolumeSliceData
+from cellstar_db.models import QuantizationDataDict, VolumeMetadata, VolumeSliceData
 from cellstar_query.core.models import GridSliceBox
 from cellstar_query.core.timing import Timing
 from cellstar_query.serialization.data.meshes_for_cif import MeshesForCif
@@ -19,21 +19,32 @@ from cellstar_query.serialization.volume_cif_categories.segmentation_table impor
     SegmentationDataTableCategory,
 )
 from cellstar_query.serialization.volume_cif_categories.volume_data_3d import (
+    QuantizedVolumeData3dCategory,
     VolumeData3dCategory,
 )
 from cellstar_query.serialization.volume_cif_categories.volume_data_3d_info import (
     VolumeData3dInfoCategory,
 )
+from cellstar_query.serialization.volume_cif_categories.volume_data_3d_quantization import (
+    VolumeData3dQuantizationCategory,
+)
 from cellstar_query.serialization.volume_cif_categories.volume_data_time_and_channel_info import (
     VolumeDataTimeAndChannelInfo,
 )
+from cellstar_query.serialization.streaming import (
+    data_block_header,
+    encode_categories,
+    file_header,
+)
 from ciftools.serialization import create_binary_writer
 
+BCIF_ENCODER = "cellstar-volume-server"
+
 
 def serialize_volume_slice(
     slice: VolumeSliceData, metadata: VolumeMetadata, box: GridSliceBox
 ) -> Union[bytes, str]:
-    writer = create_binary_writer(encoder="cellstar-volume-server")
+    writer = create_binary_writer(encoder=BCIF_ENCODER)
 
     writer.start_data_block("SERVER")
     # NOTE: the SERVER category left empty for now
@@ -65,7 +76,15 @@ def serialize_volume_slice(
         # which channel_id and time_id is it
         writer.write_category(VolumeDataTimeAndChannelInfo, [volume_info])
 
-        data_category = VolumeData3dCategory()
+        quantization = slice.get("volume_quantization")
+        if quantization is not None:
+            # quantized data is sent as stored, decoding is done by the client
+            writer.write_category(VolumeData3dQuantizationCategory, [quantization])
+            data_category = QuantizedVolumeData3dCategory()
+        else:
+            data_category = VolumeData3dCategory(
+                value_range=slice.get("volume_value_range")
+            )
         writer.write_category(
             data_category, [np.ravel(slice["volume_slice"], order="F")]
         )
@@ -98,8 +117,51 @@ def serialize_volume_slice(
     return writer.encode()
 
 
+def serialize_volume_slice_header(data_block_count: int) -> bytes:
+    """
+    Start of a streamed volume slice, data blocks are written after it by
+    serialize_volume_block_header and serialize_segmentation_block_header,
+    each followed by StreamedArrayCategory with values
+    """
+    # NOTE: the SERVER category left empty, as in serialize_volume_slice
+    return file_header(BCIF_ENCODER, data_block_count + 1) + data_block_header(
+        "SERVER", 0
+    )
+
+
+def serialize_volume_block_header(
+    volume_info: VolumeInfo, quantization: Optional[QuantizationDataDict]
+) -> bytes:
+    categories = [
+        (VolumeData3dInfoCategory, [volume_info]),
+        (VolumeDataTimeAndChannelInfo, [volume_info]),
+    ]
+    if quantization is not None:
+        categories.append((VolumeData3dQuantizationCategory, [quantization]))
+    category_count, encoded = encode_categories(categories)
+    # + streamed volume_data_3d
+    return data_block_header("volume", category_count + 1) + encoded
+
+
+def serialize_segmentation_block_header(
+    volume_info: VolumeInfo, category_set_dict: dict
+) -> bytes:
+    category_count, encoded = encode_categories(
+        [
+            (VolumeData3dInfoCategory, [volume_info]),
+            (VolumeDataTimeAndChannelInfo, [volume_info]),
+            (
+                SegmentationDataTableCategory,
+                [SegmentSetTable.from_dict(category_set_dict)],
+            ),
+        ]
+    )
+    # + streamed segmentation_data_3d
+    return data_block_header("segmentation_data", category_count + 1) + encoded
+
+
 def serialize_volume_info(metadata: VolumeMetadata, box: GridSliceBox) -> bytes:
-    writer = create_binary_writer(encoder="cellstar-volume-server")
+    writer = create_binary_writer(encoder=BCIF_ENCODER)
 
     writer.start_data_block("volume_info")
     volume_info = VolumeInfo(name="volume", metadata=metadata, box=box)
@@ -109,13 +171,17 @@ def serialize_volume_info(metadata: VolumeMetadata, box: GridSliceBox) -> bytes:
 
 
 def serialize_meshes(
-    meshes: MeshesData, metadata: VolumeMetadata, box: GridSliceBox, time: int
+    meshes_for_cif: MeshesForCif,
+    metadata: VolumeMetadata,
+    box: GridSliceBox,
+    time: int,
 ) -> bytes:
-    with Timing("  prepare meshes for cif"):
-        meshes_for_cif = MeshesForCif(meshes)
-
+    """
+    Meshes of several segments (see MeshesForCif.concatenate) are written
+    with segment_id columns
+    """
     with Timing("  write categories"):
-        writer = create_binary_writer(encoder="cellstar-volume-server")
+        writer = create_binary_writer(encoder=BCIF_ENCODER)
 
         writer.start_data_block("volume_info")
         volume_info = VolumeInfo(name="volume", metadata=metadata, box=box, time=time)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 import numpy as np
 from cellstar_db.models import MeshesData
 
@@ -20,25 +22,51 @@ class WithArrays(object):
             return array
         if array.size == 0:
             return array
-        current_itemsize: int = array.dtype.itemsize  # in bytes
-        minimum = array.min()
-        maximum = array.max()
+        dtype = WithArrays.shrinked_uint_dtype(array.dtype, array.min(), array.max())
+        if dtype != array.dtype:
+            return array.astype(dtype)
+        return array
+
+    @staticmethod
+    def shrinked_uint_dtype(dtype: np.dtype, minimum: int, maximum: int) -> np.dtype:
+        """Return the smallest sufficient uint dtype for integer values in range
+        [minimum, maximum] if it is smaller than `dtype`, otherwise `dtype`.
+        """
+        current_itemsize: int = dtype.itemsize  # in bytes
         if minimum < 0:
-            return array
-        # print('try_shrink_uint_dtype', minimum, maximum, array.dtype, current_itemsize)
+            return dtype
         for dtype_class in (np.uint8, np.uint16, np.uint32, np.uint64):
             itemsize: int = np.dtype(dtype_class).itemsize
             limit = 2 ** (8 * itemsize) - 1
-            # print(dtype_class, '?', limit)
             if maximum <= limit:
                 if itemsize < current_itemsize:
-                    # print('yep, convert to', dtype_class)
-                    return array.astype(dtype_class)
+                    return np.dtype(dtype_class)
                 else:
-                    # print('yep, keep', array.dtype)
-                    return array
-        # print('nope')
-        return array
+                    return dtype
+        return dtype
+
+    @staticmethod
+    def repeat_shrinked(values: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """`np.repeat(values, counts)` with the dtype `try_shrink_uint_array` would
+        give it, without a pass over the repeated array.
+        """
+        if values.dtype.kind not in "iu":
+            return np.repeat(values, counts)
+        repeated_values = values[counts > 0]
+        if repeated_values.size == 0:
+            return np.empty((0,), dtype=values.dtype)
+        dtype = WithArrays.shrinked_uint_dtype(
+            values.dtype, repeated_values.min(), repeated_values.max()
+        )
+        # values that do not fit into dtype are repeated 0 times
+        return np.repeat(values.astype(dtype), counts)
+
+    def nbytes(self) -> int:
+        return sum(
+            value.nbytes
+            for value in vars(self).values()
+            if isinstance(value, np.ndarray)
+        )
 
 
 class MeshesForCif(WithArrays):
@@ -54,45 +82,120 @@ class MeshesForCif(WithArrays):
     vertex__z: np.ndarray  # float
     triangle__mesh_id: np.ndarray  # int
     triangle__vertex_id: np.ndarray  # int
+    # segment id columns, only if meshes of several segments are written together
+    mesh__segment_id: Optional[np.ndarray] = None  # int
+    vertex__segment_id: Optional[np.ndarray] = None  # int
+    triangle__segment_id: Optional[np.ndarray] = None  # int
 
-    def __init__(self, meshes: MeshesData) -> None:
-        total_vertices = sum(mesh["vertices"].shape[0] for mesh in meshes)
-        total_triangles = sum(mesh["triangles"].shape[0] for mesh in meshes)
-
+    def __init__(
+        self, meshes: MeshesData, segment_ids: Optional[list[int]] = None
+    ) -> None:
+        """segment_ids - segment id of each mesh (mesh ids are unique per segment).
+        Integer columns are created in their final (shrinked) dtypes."""
         if len(meshes) > 0:
             coord_type = meshes[0]["vertices"].dtype
             index_type = meshes[0]["triangles"].dtype
         else:
             coord_type = np.float32
             index_type = np.uint32
+        # dtype of integer columns before shrinking
+        self._index_type = np.dtype(index_type)
+
+        vertex_counts = np.array(
+            [mesh["vertices"].shape[0] for mesh in meshes], dtype=np.int64
+        )
+        triangle_counts = np.array(
+            [3 * mesh["triangles"].shape[0] for mesh in meshes], dtype=np.int64
+        )
+        total_vertices = int(vertex_counts.sum())
+        total_triangles = int(triangle_counts.sum())
+
+        mesh_ids = np.array([mesh["mesh_id"] for mesh in meshes], dtype=index_type)
+        self.mesh__id = self.try_shrink_uint_array(mesh_ids)
+        self.vertex__mesh_id = self.repeat_shrinked(mesh_ids, vertex_counts)
+        self.triangle__mesh_id = self.repeat_shrinked(mesh_ids, triangle_counts)
+
+        # index of the vertex within its mesh
+        vertex_id_type = self._index_type
+        if total_vertices > 0:
+            vertex_id_type = self.shrinked_uint_dtype(
+                vertex_id_type, 0, int(vertex_counts.max()) - 1
+            )
+        self.vertex__vertex_id = np.empty((total_vertices,), dtype=vertex_id_type)
+        vertex_starts = np.cumsum(vertex_counts) - vertex_counts
+        np.subtract(
+            np.arange(total_vertices),
+            np.repeat(vertex_starts, vertex_counts),
+            out=self.vertex__vertex_id,
+            casting="unsafe",
+        )
+
+        coords = np.empty((3, total_vertices), dtype=coord_type)
+        triangle_vertex_ids = np.empty((total_triangles,), dtype=index_type)
+        if len(meshes) > 0:
+            np.concatenate(
+                [mesh["vertices"].T for mesh in meshes],
+                axis=1,
+                out=coords,
+                casting="unsafe",
+            )
+            np.concatenate(
+                [mesh["triangles"].ravel() for mesh in meshes],
+                out=triangle_vertex_ids,
+                casting="unsafe",
+            )
+        self.vertex__x, self.vertex__y, self.vertex__z = coords
+        # vertex ids of triangles are the only column that needs min/max pass
+        self.triangle__vertex_id = self.try_shrink_uint_array(triangle_vertex_ids)
+
+        if segment_ids is not None:
+            mesh_segment_ids = np.array(segment_ids, dtype=index_type)
+            self.mesh__segment_id = self.try_shrink_uint_array(mesh_segment_ids)
+            self.vertex__segment_id = self.repeat_shrinked(
+                mesh_segment_ids, vertex_counts
+            )
+            self.triangle__segment_id = self.repeat_shrinked(
+                mesh_segment_ids, triangle_counts
+            )
+
+    @staticmethod
+    def concatenate(
+        segments_meshes: list["MeshesForCif"], segment_ids: list[int]
+    ) -> "MeshesForCif":
+        """Concatenate meshes of several segments (prepared separately, e.g. cached),
+        adding segment id columns. segment_ids - segment id of each MeshesForCif.
+        """
+        result = MeshesForCif([])
+        with_meshes = [m for m in segments_meshes if m.mesh__id.size > 0]
+        if len(with_meshes) > 0:
+            result._index_type = with_meshes[0]._index_type
+
+        for name in (
+            "mesh__id",
+            "vertex__mesh_id",
+            "vertex__vertex_id",
+            "vertex__x",
+            "vertex__y",
+            "vertex__z",
+            "triangle__mesh_id",
+            "triangle__vertex_id",
+        ):
+            # empty columns keep dtype before shrinking
+            columns = [getattr(m, name) for m in segments_meshes]
+            non_empty = [c for c in columns if c.size > 0]
+            if len(non_empty) > 0:
+                setattr(result, name, np.concatenate(non_empty))
+            elif len(with_meshes) > 0:
+                setattr(result, name, getattr(with_meshes[0], name))
 
-        self.mesh__id = np.array([mesh["mesh_id"] for mesh in meshes], dtype=index_type)
-        self.vertex__mesh_id = np.empty((total_vertices,), dtype=index_type)
-        self.vertex__vertex_id = np.empty((total_vertices,), dtype=index_type)
-        self.vertex__x = np.empty((total_vertices,), dtype=coord_type)
-        self.vertex__y = np.empty((total_vertices,), dtype=coord_type)
-        self.vertex__z = np.empty((total_vertices,), dtype=coord_type)
-        self.triangle__mesh_id = np.empty((3 * total_triangles), dtype=index_type)
-        self.triangle__vertex_id = np.empty((3 * total_triangles), dtype=index_type)
-
-        vertex_offset = 0
-        triangle_offset = 0
-        for mesh in meshes:
-            nv = mesh["vertices"].shape[0]
-            self.vertex__mesh_id[vertex_offset : vertex_offset + nv] = mesh["mesh_id"]
-            self.vertex__vertex_id[vertex_offset : vertex_offset + nv] = np.arange(nv)
-            self.vertex__x[vertex_offset : vertex_offset + nv] = mesh["vertices"][:, 0]
-            self.vertex__y[vertex_offset : vertex_offset + nv] = mesh["vertices"][:, 1]
-            self.vertex__z[vertex_offset : vertex_offset + nv] = mesh["vertices"][:, 2]
-            vertex_offset += nv
-            nt = mesh["triangles"].shape[0]
-            self.triangle__mesh_id[triangle_offset : triangle_offset + 3 * nt] = mesh[
-                "mesh_id"
-            ]
-            self.triangle__vertex_id[triangle_offset : triangle_offset + 3 * nt] = mesh[
-                "triangles"
-            ].ravel()
-            triangle_offset += 3 * nt
-
-        self.try_shrink_uint_array_attrs()
-        return
+        segment_ids_array = np.array(segment_ids, dtype=result._index_type)
+        for name, column in (
+            ("mesh__segment_id", "mesh__id"),
+            ("vertex__segment_id", "vertex__mesh_id"),
+            ("triangle__segment_id", "triangle__mesh_id"),
+        ):
+            counts = np.array(
+                [getattr(m, column).size for m in segments_meshes], dtype=np.int64
+            )
+            setattr(result, name, result.repeat_shrinked(segment_ids_array, counts))
+        return result
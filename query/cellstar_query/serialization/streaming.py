@@ -0,0 +1,216 @@
+from tempfile import SpooledTemporaryFile
+from typing import Any, Iterator, List, Optional, Tuple
+
+import msgpack
+import numpy as np
+from ciftools.binary.encoded_data import EncodedCIFData
+from ciftools.binary.encoder import BinaryCIFEncoder, ComposeEncoders
+from ciftools.binary.encoding_types import EncodingEnun
+from ciftools.models.writer import CIFCategoryDesc
+from ciftools.serialization import create_binary_writer
+
+# Pieces of BinaryCIF files that are written incrementally.
+# Concatenated, they give the same bytes as ciftools BinaryCIFWriter,
+# which msgpacks the whole file (nested dicts and lists) at once.
+# msgpack arrays are prefixed with their length, so numbers of data blocks
+# and categories have to be known before they are written
+
+BCIF_VERSION = "0.3.0"
+
+# encodings that map each value independently, so parts of an array
+# can be encoded separately
+_ELEMENTWISE_ENCODINGS = (
+    EncodingEnun.ByteArray,
+    EncodingEnun.FixedPoint,
+    EncodingEnun.IntervalQuantization,
+)
+
+# finished runs of run-length encoded columns larger than this
+# are kept in a temporary file instead of memory
+RUNS_SPOOL_SIZE = 2**22
+# size of the pieces the runs are written in
+RUNS_PIECE_SIZE = 2**20
+
+
+def file_header(encoder: str, data_block_count: int) -> bytes:
+    # packers are not thread-safe, so they are not shared
+    _packer = msgpack.Packer()
+    return (
+        _packer.pack_map_header(3)
+        + _packer.pack("version")
+        + _packer.pack(BCIF_VERSION)
+        + _packer.pack("encoder")
+        + _packer.pack(encoder)
+        + _packer.pack("dataBlocks")
+        + _packer.pack_array_header(data_block_count)
+    )
+
+
+def data_block_header(header: str, category_count: int) -> bytes:
+    # same normalization as in BinaryCIFWriter.start_data_block
+    header = header.replace(" ", "").replace("\n", "").replace("\t", "").upper()
+    _packer = msgpack.Packer()
+    return (
+        _packer.pack_map_header(2)
+        + _packer.pack("header")
+        + _packer.pack(header)
+        + _packer.pack("categories")
+        + _packer.pack_array_header(category_count)
+    )
+
+
+def encode_categories(
+    categories: List[Tuple[CIFCategoryDesc, List[Any]]],
+) -> Tuple[int, bytes]:
+    """
+    Encodes (small) categories as a whole with BinaryCIFWriter.
+    Returns number of written categories (empty ones are skipped) and their bytes
+    """
+    writer = create_binary_writer(encoder="")
+    writer.start_data_block("")
+    for category, data in categories:
+        writer.write_category(category, data)
+    encoded = writer.encode()
+
+    category_count = len(msgpack.loads(encoded)["dataBlocks"][0]["categories"])
+    prefix = file_header("", 1) + data_block_header("", category_count)
+    assert encoded.startswith(prefix)
+    return category_count, encoded[len(prefix) :]
+
+
+def encode_array_part(
+    encoder: BinaryCIFEncoder, dtype: np.dtype, part: np.ndarray
+) -> EncodedCIFData:
+    return encoder.encode(np.asarray(part, dtype=dtype))
+
+
+class StreamedArrayCategory:
+    """
+    Category with a single numeric column whose values are provided in parts,
+    each encoded by encode_array_part with the given encoder.
+    Parts encoded by elementwise encodings are written as soon as they are added.
+    Run-length encoded parts are merged (runs across parts are joined), finished
+    runs are moved to a temporary file as parts are added and written by finish,
+    as size of the data is not known before. Only the last run, which can continue
+    in the next part, is kept aside
+    """
+
+    def __init__(
+        self, name: str, field_name: str, row_count: int, encoder: BinaryCIFEncoder
+    ):
+        self.name = name
+        self.field_name = field_name
+        self.row_count = row_count
+        self._written_count = 0
+        self._encodings: Optional[list] = None
+        # composed encoders write encoding before data, single encoders after
+        self._data_first = not isinstance(encoder, ComposeEncoders)
+        self._run_length = False
+        # value, length pairs of finished runs of run-length encoded parts
+        self._runs: Optional[SpooledTemporaryFile] = None
+        self._runs_size = 0
+        self._last_run: Optional[np.ndarray] = None
+
+    def add(self, encoded: EncodedCIFData, part_size: int) -> List[bytes]:
+        """
+        Returns bytes to be written after the bytes returned for the previous part
+        """
+        parts = []
+        if self._encodings is None:
+            self._start(encoded)
+            if not self._run_length:
+                # bytes per value are the same in all parts
+                byte_count = self.row_count * len(encoded["data"]) // part_size
+                parts.append(self._header(byte_count))
+        self._written_count += part_size
+
+        if not self._run_length:
+            parts.append(encoded["data"])
+            return parts
+
+        runs = np.frombuffer(encoded["data"], dtype="<i4")
+        if len(runs) == 0:
+            return parts
+        if self._last_run is not None:
+            if self._last_run[0] == runs[0]:
+                # run continues from the previous part
+                runs = runs.copy()
+                runs[1] += self._last_run[1]
+            else:
+                self._write_runs(self._last_run)
+        self._write_runs(runs[:-2])
+        self._last_run = runs[-2:]
+        return parts
+
+    def finish(self) -> Iterator[bytes]:
+        assert (
+            self._written_count == self.row_count
+        ), f"{self._written_count} values written, {self.row_count} expected"
+        if self._run_length:
+            if self._last_run is not None:
+                self._write_runs(self._last_run)
+                self._last_run = None
+            yield self._header(self._runs_size)
+            self._runs.seek(0)
+            while piece := self._runs.read(RUNS_PIECE_SIZE):
+                yield piece
+            self.close()
+        yield self._footer()
+
+    def close(self):
+        """Removes the temporary file of runs, if any"""
+        if self._runs is not None:
+            self._runs.close()
+            self._runs = None
+
+    def _start(self, encoded: EncodedCIFData):
+        encodings = encoded["encoding"]
+        kinds = [e["kind"] for e in encodings]
+        if kinds == [EncodingEnun.RunLength, EncodingEnun.ByteArray]:
+            self._run_length = True
+            self._runs = SpooledTemporaryFile(max_size=RUNS_SPOOL_SIZE)
+            encodings = [{**encodings[0], "srcSize": self.row_count}, encodings[1]]
+        elif not all(k in _ELEMENTWISE_ENCODINGS for k in kinds):
+            raise ValueError(f"Encodings {kinds} cannot be applied to array parts")
+        self._encodings = encodings
+
+    def _write_runs(self, runs: np.ndarray):
+        data = runs.tobytes()
+        self._runs.write(data)
+        self._runs_size += len(data)
+
+    def _header(self, byte_count: int) -> bytes:
+        _packer = msgpack.Packer()
+        encoded_header = _packer.pack_map_header(2)
+        if not self._data_first:
+            encoded_header += _packer.pack("encoding") + _packer.pack(self._encodings)
+        encoded_header += _packer.pack("data") + _bin_header(byte_count)
+        return (
+            _packer.pack_map_header(3)
+            + _packer.pack("name")
+            + _packer.pack(f"_{self.name}")
+            + _packer.pack("rowCount")
+            + _packer.pack(self.row_count)
+            + _packer.pack("columns")
+            + _packer.pack_array_header(1)
+            + _packer.pack_map_header(3)
+            + _packer.pack("name")
+            + _packer.pack(self.field_name)
+            + _packer.pack("data")
+            + encoded_header
+        )
+
+    def _footer(self) -> bytes:
+        _packer = msgpack.Packer()
+        footer = b""
+        if self._data_first:
+            footer += _packer.pack("encoding") + _packer.pack(self._encodings)
+        return footer + _packer.pack("mask") + _packer.pack(None)
+
+
+def _bin_header(size: int) -> bytes:
+    if size < 2**8:
+        return b"\xc4" + size.to_bytes(1, "big")
+    if size < 2**16:
+        return b"\xc5" + size.to_bytes(2, "big")
+    return b"\xc6" + size.to_bytes(4, "big")
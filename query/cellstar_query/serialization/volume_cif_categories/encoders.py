@@ -1,3 +1,5 @@
+from typing import Optional
+
 import numpy as np
 from ciftools.binary import encoder
 from ciftools.binary.data_types import DataType, DataTypeEnum
@@ -55,28 +57,33 @@ def coord_encoder(coords: np.ndarray) -> BinaryCIFEncoder:
 
 
 def decide_encoder(
-    ctx: np.ndarray, data_name: str
+    ctx: np.ndarray,
+    data_name: str,
+    value_range: Optional[tuple[float, float]] = None,
 ) -> tuple[BinaryCIFEncoder, np.dtype]:
-    """Return an encoder appropriate for the given array and corresponding dtype"""
+    """
+    Return an encoder appropriate for the given array and corresponding dtype.
+    value_range is (min, max) bound of the values of float arrays if known
+    (e.g. from precomputed statistics), otherwise it is computed from the array
+    """
     data_type = DataType.from_dtype(ctx.dtype)
     typed_array = DataType.to_dtype(data_type)  # is this necessary?
 
     encoders: list[BinaryCIFEncoder] = []
 
     if data_type == DataTypeEnum.Float32 or data_type == DataTypeEnum.Float64:
-        print(
-            f"Encoder for {data_name} was chosen as IntervalQuantizationCIFEncoder for dataType = {str(data_type)}"
-        )  # using str() to format enum nicely
-        data_min: int = ctx.min(initial=ctx[0])
-        data_max: int = ctx.max(initial=ctx[0])
+        if value_range is not None:
+            # same type as computed by min()/max() of the array
+            data_min = ctx.dtype.type(value_range[0])
+            data_max = ctx.dtype.type(value_range[1])
+        else:
+            data_min = ctx.min(initial=ctx[0])
+            data_max = ctx.max(initial=ctx[0])
         interval_quantization = encoder.IntervalQuantization(
             data_min, data_max, 255, DataTypeEnum.Uint8
         )
         encoders.append(interval_quantization)
     else:
-        print(
-            f"Encoder for {data_name} was chosen as RunLengthCIFEncoder for dataType = {str(data_type)}"
-        )  # using str() to format enum nicely
         encoders.append(encoder.RUN_LENGTH)
 
     encoders.append(encoder.BYTE_ARRAY)
@@ -15,7 +15,7 @@ class CategoryWriterProvider_Mesh(CIFCategoryDesc):
 
     @staticmethod
     def get_field_descriptors(data: MeshesForCif):
-        return [
+        fields = [
             Field[MeshesForCif].number_array(
                 name="id",
                 array=lambda d: d.mesh__id,
@@ -23,6 +23,16 @@ class CategoryWriterProvider_Mesh(CIFCategoryDesc):
                 encoder=encoders.bytearray_encoder,
             ),  # usually only 1 row
         ]
+        if data.mesh__segment_id is not None:
+            fields.append(
+                Field[MeshesForCif].number_array(
+                    name="segment_id",
+                    array=lambda d: d.mesh__segment_id,
+                    dtype=data.mesh__segment_id.dtype,
+                    encoder=encoders.delta_rl_encoder,
+                )
+            )
+        return fields
 
 
 class CategoryWriterProvider_MeshVertex(CIFCategoryDesc):
@@ -43,7 +53,7 @@ class CategoryWriterProvider_MeshVertex(CIFCategoryDesc):
         def z_encoder(meshes: MeshesForCif):
             return encoders.coord_encoder(meshes.vertex__z)
 
-        return [
+        fields = [
             Field[MeshesForCif].number_array(
                 name="mesh_id",
                 array=lambda d: d.vertex__mesh_id,
@@ -75,6 +85,16 @@ class CategoryWriterProvider_MeshVertex(CIFCategoryDesc):
                 encoder=z_encoder,
             ),
         ]
+        if data.vertex__segment_id is not None:
+            fields.append(
+                Field[MeshesForCif].number_array(
+                    name="segment_id",
+                    array=lambda d: d.vertex__segment_id,
+                    dtype=data.vertex__segment_id.dtype,
+                    encoder=encoders.delta_rl_encoder,
+                )
+            )
+        return fields
 
 
 class CategoryWriterProvider_MeshTriangle(CIFCategoryDesc):
@@ -86,7 +106,7 @@ class CategoryWriterProvider_MeshTriangle(CIFCategoryDesc):
 
     @staticmethod
     def get_field_descriptors(data: MeshesForCif):
-        return [
+        fields = [
             Field[MeshesForCif].number_array(
                 name="mesh_id",
                 array=lambda d: d.triangle__mesh_id,
@@ -100,3 +120,13 @@ class CategoryWriterProvider_MeshTriangle(CIFCategoryDesc):
                 encoder=encoders.bytearray_encoder,
             ),  # delta_intpack_encoder is a bit better but slow
         ]
+        if data.triangle__segment_id is not None:
+            fields.append(
+                Field[MeshesForCif].number_array(
+                    name="segment_id",
+                    array=lambda d: d.triangle__segment_id,
+                    dtype=data.triangle__segment_id.dtype,
+                    encoder=encoders.delta_rl_encoder,
+                )
+            )
+        return fields
@@ -1,3 +1,5 @@
+from typing import Optional
+
 import numpy as np
 from cellstar_query.serialization.volume_cif_categories import encoders
 from ciftools.models.writer import CIFCategoryDesc
@@ -7,13 +9,18 @@ from ciftools.models.writer import CIFFieldDesc as Field
 class VolumeData3dCategory(CIFCategoryDesc):
     name = "volume_data_3d"
 
+    def __init__(self, value_range: Optional[tuple[float, float]] = None):
+        # known (min, max) bound of the values, avoids computing it from the data
+        self.value_range = value_range
+
     @staticmethod
     def get_row_count(ctx: np.ndarray) -> int:
         return ctx.size
 
-    @staticmethod
-    def get_field_descriptors(ctx: np.ndarray):
-        encoder, dtype = encoders.decide_encoder(ctx, "VolumeData3d")
+    def get_field_descriptors(self, ctx: np.ndarray):
+        encoder, dtype = encoders.decide_encoder(
+            ctx, "VolumeData3d", value_range=self.value_range
+        )
         return [
             Field.number_array(
                 name="values",
@@ -22,3 +29,27 @@ class VolumeData3dCategory(CIFCategoryDesc):
                 dtype=dtype,
             ),
         ]
+
+
+class QuantizedVolumeData3dCategory(CIFCategoryDesc):
+    """
+    Quantized volume data as stored, to be decoded on the client
+    using volume_data_3d_quantization category
+    """
+
+    name = "volume_data_3d"
+
+    @staticmethod
+    def get_row_count(ctx: np.ndarray) -> int:
+        return ctx.size
+
+    @staticmethod
+    def get_field_descriptors(ctx: np.ndarray):
+        return [
+            Field.number_array(
+                name="values",
+                array=lambda volume: volume,
+                encoder=encoders.bytearray_encoder,
+                dtype=ctx.dtype,
+            ),
+        ]
@@ -1,7 +1,8 @@
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 
 from cellstar_db.file_system.annotations_context import AnnnotationsEditContext
 from cellstar_db.file_system.db import FileSystemVolumeServerDB
+from cellstar_db.utils.content_encoding import IDENTITY, negotiate_encoding
 from cellstar_db.models import (
     AnnotationsMetadata,
     DescriptionData,
@@ -10,25 +11,114 @@ from cellstar_db.models import (
 from cellstar_query.core.service import VolumeServerService
 from cellstar_query.query import (
     HTTP_CODE_UNPROCESSABLE_ENTITY,
+    get_catalog_entries_query,
     get_geometric_segmentation_query,
     get_list_entries_keyword_query,
     get_list_entries_query,
+    get_meshes_bcif_batch_query,
     get_meshes_bcif_query,
     get_meshes_query,
     get_metadata_query,
     get_segmentation_box_query,
     get_segmentation_cell_query,
+    get_segmentation_tile_query,
+    get_tile_manifest_query,
+    get_tile_query,
     get_volume_box_query,
     get_volume_cell_query,
     get_volume_info_query,
+    get_volume_progressive_box_query,
+    get_volume_progressive_cell_query,
+    get_volume_tile_query,
 )
 from cellstar_query.serialization.json_numpy_response import JSONNumpyResponse
 from cellstar_server.app.settings import settings
-from fastapi import Body, FastAPI, Query, Response
-from starlette.responses import JSONResponse
+from fastapi import Body, FastAPI, Query, Request, Response
+from starlette.responses import JSONResponse, StreamingResponse
+
+
+def request_encoding(request: Request) -> str:
+    return negotiate_encoding(request.headers.get("accept-encoding"))
+
+
+def encoded_response_headers(encoding: str, headers: dict[str, str]) -> dict[str, str]:
+    # responses with Content-Encoding are passed by CompressionMiddleware as they are
+    headers = {**headers, "Vary": "Accept-Encoding"}
+    if encoding != IDENTITY:
+        headers["Content-Encoding"] = encoding
+    return headers
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of etag with the list of entity tags of If-None-Match header
+    """
+    if if_none_match is None:
+        return False
+    opaque_tag = etag.removeprefix("W/")
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == opaque_tag:
+            return True
+    return False
 
 
 def configure_endpoints(app: FastAPI, volume_server: VolumeServerService):
+    async def tile_response(
+        request: Request,
+        source: str,
+        id: str,
+        version: Optional[str],
+        get_tile: Callable[[str], Awaitable[bytes]],
+    ) -> Response:
+        encoding = request_encoding(request)
+        current_version = volume_server.entry_etag(source, id)
+        # representations in different content codings need different strong tags
+        etag = f'"{current_version}"'
+        if encoding != IDENTITY:
+            etag = f'"{current_version}-{encoding}"'
+        # tile URLs of the manifest include entry version, only those tiles
+        # never change, others (e.g. of an older version) are always revalidated
+        if version == current_version:
+            cache_control = f"public, max-age={settings.TILE_CACHE_MAX_AGE}, immutable"
+        else:
+            cache_control = "no-cache"
+        headers = encoded_response_headers(
+            encoding, {"Cache-Control": cache_control, "ETag": etag}
+        )
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        try:
+            response = await get_tile(encoding)
+        except Exception as e:
+            return JSONResponse(
+                {"error": str(e)}, status_code=HTTP_CODE_UNPROCESSABLE_ENTITY
+            )
+        if volume_server.entry_etag(source, id) != current_version:
+            # entry was modified while the tile was read
+            headers = {**headers, "Cache-Control": "no-store"}
+            del headers["ETag"]
+        return Response(
+            response,
+            headers={
+                **headers,
+                "Content-Disposition": f'attachment;filename="{id}.bcif"',
+            },
+        )
+
+    def tile_url_templates(request: Request, source: str, id: str, version: str):
+        paths = {
+            "volume": "volume/tile/{level}/{time}/{channel_id}/{i}/{j}/{k}",
+            "segmentation": "segmentation/tile/{segmentation}/{level}/{time}/{i}/{j}/{k}",
+            "all": "tile/{segmentation}/{level}/{time}/{channel_id}/{i}/{j}/{k}",
+        }
+        prefix = f"{request.scope.get('root_path', '')}/v1/{source}/{id}"
+        return {
+            data_kind: f"{prefix}/{path}?version={version}"
+            for data_kind, path in paths.items()
+        }
+
     # TODO: make it pydantic model for validation purposes
     @app.post("/v1/{source}/{id}/annotations_json/update")
     async def annotations_json_update(
@@ -92,6 +182,24 @@ def configure_endpoints(app: FastAPI, volume_server: VolumeServerService):
 
         return {"git_tag": git_tag, "git_sha": git_sha}
 
+    @app.get("/v1/cache_stats")
+    async def get_cache_stats():
+        # caches of this process only, with READ_EXECUTOR="process" data is read
+        # (and decoded chunks are cached) in worker processes not reported here
+        response_cache = volume_server.response_cache
+        prepared_meshes_cache = volume_server.prepared_meshes_cache
+        return {
+            "response_cache": (
+                response_cache.stats() if response_cache is not None else None
+            ),
+            "prepared_meshes_cache": (
+                prepared_meshes_cache.stats()
+                if prepared_meshes_cache is not None
+                else None
+            ),
+            "decoded_chunk_cache": volume_server.db.store_pool.chunk_cache.stats(),
+        }
+
     @app.get("/v1/list_entries/{limit}")
     async def get_entries(limit: int = 100):
         response = await get_list_entries_query(
@@ -100,12 +208,37 @@ def configure_endpoints(app: FastAPI, volume_server: VolumeServerService):
         return response
 
     @app.get("/v1/list_entries/{limit}/{keyword}")
-    async def get_entries_keyword(keyword: str, limit: int = 100):
+    async def get_entries_keyword(
+        keyword: str, limit: int = 100, offset: Optional[int] = Query(0)
+    ):
         response = await get_list_entries_keyword_query(
-            volume_server=volume_server, limit=limit, keyword=keyword
+            volume_server=volume_server, limit=limit, keyword=keyword, offset=offset
         )
         return response
 
+    @app.get("/v1/entries")
+    async def get_catalog_entries(
+        limit: int = 100,
+        source: Optional[str] = Query(None),
+        data_kind: Optional[list[str]] = Query(None),
+        prefix: Optional[str] = Query(None),
+        cursor: Optional[str] = Query(None),
+    ):
+        try:
+            response = await get_catalog_entries_query(
+                volume_server=volume_server,
+                limit=limit,
+                source=source,
+                data_kinds=data_kind,
+                entry_id_prefix=prefix,
+                cursor=cursor,
+            )
+            return JSONResponse(response)
+        except Exception as e:
+            return JSONResponse(
+                {"error": str(e)}, status_code=HTTP_CODE_UNPROCESSABLE_ENTITY
+            )
+
     @app.get(
         "/v1/{source}/{id}/segmentation/box/{segmentation}/{time}/{a1}/{a2}/{a3}/{b1}/{b2}/{b3}"
     )
@@ -135,9 +268,10 @@ def configure_endpoints(app: FastAPI, volume_server: VolumeServerService):
             b2=b2,
             b3=b3,
             max_points=max_points,
+            stream=True,
         )
 
-        return Response(
+        return StreamingResponse(
             response,
             headers={"Content-Disposition": f'attachment;filename="{id}.bcif"'},
         )
@@ -157,6 +291,7 @@ def configure_endpoints(app: FastAPI, volume_server: VolumeServerService):
         b2: float,
         b3: float,
         max_points: Optional[int] = Query(0),
+        quantized: Optional[bool] = Query(False),
     ):
         response = await get_volume_box_query(
             volume_server=volume_server,
@@ -171,21 +306,89 @@ def configure_endpoints(app: FastAPI, volume_server: VolumeServerService):
             b2=b2,
             b3=b3,
             max_points=max_points,
+            quantized=quantized,
+            stream=True,
         )
 
-        return Response(
+        return StreamingResponse(
+            response,
+            headers={"Content-Disposition": f'attachment;filename="{id}.bcif"'},
+        )
+
+    @app.get(
+        "/v1/{source}/{id}/volume/progressive/box/{time}/{channel_id}/{a1}/{a2}/{a3}/{b1}/{b2}/{b3}"
+    )
+    async def get_volume_progressive_box(
+        source: str,
+        id: str,
+        time: int,
+        channel_id: str,
+        a1: float,
+        a2: float,
+        a3: float,
+        b1: float,
+        b2: float,
+        b3: float,
+        max_points: Optional[int] = Query(0),
+        quantized: Optional[bool] = Query(False),
+    ):
+        # data blocks of downsampling levels from the coarsest one
+        response = await get_volume_progressive_box_query(
+            volume_server=volume_server,
+            source=source,
+            id=id,
+            time=time,
+            channel_id=channel_id,
+            a1=a1,
+            a2=a2,
+            a3=a3,
+            b1=b1,
+            b2=b2,
+            b3=b3,
+            max_points=max_points,
+            quantized=quantized,
+        )
+
+        return StreamingResponse(
+            response,
+            headers={"Content-Disposition": f'attachment;filename="{id}.bcif"'},
+        )
+
+    @app.get("/v1/{source}/{id}/volume/progressive/cell/{time}/{channel_id}")
+    async def get_volume_progressive_cell(
+        source: str,
+        id: str,
+        time: int,
+        channel_id: str,
+        max_points: Optional[int] = Query(0),
+        quantized: Optional[bool] = Query(False),
+    ):
+        # data blocks of downsampling levels from the coarsest one
+        response = await get_volume_progressive_cell_query(
+            volume_server=volume_server,
+            source=source,
+            id=id,
+            time=time,
+            channel_id=channel_id,
+            max_points=max_points,
+            quantized=quantized,
+        )
+
+        return StreamingResponse(
             response,
             headers={"Content-Disposition": f'attachment;filename="{id}.bcif"'},
         )
 
     @app.get("/v1/{source}/{id}/segmentation/cell/{segmentation}/{time}")
     async def get_segmentation_cell(
+        request: Request,
         source: str,
         id: str,
         segmentation: str,
         time: int,
         max_points: Optional[int] = Query(0),
     ):
+        encoding = request_encoding(request)
         response = await get_segmentation_cell_query(
             volume_server=volume_server,
             source=source,
@@ -193,21 +396,27 @@ def configure_endpoints(app: FastAPI, volume_server: VolumeServerService):
             segmentation=segmentation,
             time=time,
             max_points=max_points,
+            encoding=encoding,
         )
 
         return Response(
             response,
-            headers={"Content-Disposition": f'attachment;filename="{id}.bcif"'},
+            headers=encoded_response_headers(
+                encoding, {"Content-Disposition": f'attachment;filename="{id}.bcif"'}
+            ),
         )
 
     @app.get("/v1/{source}/{id}/volume/cell/{time}/{channel_id}")
     async def get_volume_cell(
+        request: Request,
         source: str,
         id: str,
         time: int,
         channel_id: str,
         max_points: Optional[int] = Query(0),
+        quantized: Optional[bool] = Query(False),
     ):
+        encoding = request_encoding(request)
         response = await get_volume_cell_query(
             volume_server=volume_server,
             source=source,
@@ -215,11 +424,140 @@ def configure_endpoints(app: FastAPI, volume_server: VolumeServerService):
             time=time,
             channel_id=channel_id,
             max_points=max_points,
+            quantized=quantized,
+            encoding=encoding,
         )
 
         return Response(
             response,
-            headers={"Content-Disposition": f'attachment;filename="{id}.bcif"'},
+            headers=encoded_response_headers(
+                encoding, {"Content-Disposition": f'attachment;filename="{id}.bcif"'}
+            ),
+        )
+
+    @app.get("/v1/{source}/{id}/tiles")
+    async def get_tile_manifest(
+        request: Request,
+        source: str,
+        id: str,
+    ):
+        # read before chunk grids, if the entry is modified in between,
+        # tiles are requested with an older version and are not cached as immutable
+        version = volume_server.entry_etag(source, id)
+        manifest = await get_tile_manifest_query(
+            volume_server=volume_server, source=source, id=id
+        )
+
+        return {
+            **manifest,
+            "version": version,
+            "tile_urls": tile_url_templates(request, source, id, version),
+        }
+
+    @app.get("/v1/{source}/{id}/volume/tile/{level}/{time}/{channel_id}/{i}/{j}/{k}")
+    async def get_volume_tile(
+        request: Request,
+        source: str,
+        id: str,
+        level: int,
+        time: int,
+        channel_id: str,
+        i: int,
+        j: int,
+        k: int,
+        quantized: Optional[bool] = Query(False),
+        version: Optional[str] = Query(None),
+    ):
+        return await tile_response(
+            request,
+            source,
+            id,
+            version,
+            lambda encoding: get_volume_tile_query(
+                volume_server=volume_server,
+                source=source,
+                id=id,
+                level=level,
+                time=time,
+                channel_id=channel_id,
+                i=i,
+                j=j,
+                k=k,
+                quantized=quantized,
+                encoding=encoding,
+            ),
+        )
+
+    @app.get(
+        "/v1/{source}/{id}/segmentation/tile/{segmentation}/{level}/{time}/{i}/{j}/{k}"
+    )
+    async def get_segmentation_tile(
+        request: Request,
+        source: str,
+        id: str,
+        segmentation: str,
+        level: int,
+        time: int,
+        i: int,
+        j: int,
+        k: int,
+        version: Optional[str] = Query(None),
+    ):
+        return await tile_response(
+            request,
+            source,
+            id,
+            version,
+            lambda encoding: get_segmentation_tile_query(
+                volume_server=volume_server,
+                source=source,
+                id=id,
+                segmentation_id=segmentation,
+                level=level,
+                time=time,
+                i=i,
+                j=j,
+                k=k,
+                encoding=encoding,
+            ),
+        )
+
+    @app.get(
+        "/v1/{source}/{id}/tile/{segmentation}/{level}/{time}/{channel_id}/{i}/{j}/{k}"
+    )
+    async def get_tile(
+        request: Request,
+        source: str,
+        id: str,
+        segmentation: str,
+        level: int,
+        time: int,
+        channel_id: str,
+        i: int,
+        j: int,
+        k: int,
+        quantized: Optional[bool] = Query(False),
+        version: Optional[str] = Query(None),
+    ):
+        return await tile_response(
+            request,
+            source,
+            id,
+            version,
+            lambda encoding: get_tile_query(
+                volume_server=volume_server,
+                source=source,
+                id=id,
+                segmentation_id=segmentation,
+                level=level,
+                time=time,
+                channel_id=channel_id,
+                i=i,
+                j=j,
+                k=k,
+                quantized=quantized,
+                encoding=encoding,
+            ),
         )
 
     @app.get("/v1/{source}/{id}/metadata")
@@ -271,28 +609,33 @@ def configure_endpoints(app: FastAPI, volume_server: VolumeServerService):
             segmentation_id=segmentation_id,
             time=time,
         )
-        return response
+        # plain JSON data (shared with other requests), jsonable_encoder is not needed
+        return JSONResponse(response)
 
     @app.get("/v1/{source}/{id}/volume_info")
     async def get_volume_info(
+        request: Request,
         source: str,
         id: str,
     ):
+        encoding = request_encoding(request)
         response_bytes = await get_volume_info_query(
-            volume_server=volume_server, source=source, id=id
+            volume_server=volume_server, source=source, id=id, encoding=encoding
         )
 
         return Response(
             response_bytes,
-            headers={
-                "Content-Disposition": f'attachment;filename="{id}-volume_info.bcif"'
-            },
+            headers=encoded_response_headers(
+                encoding,
+                {"Content-Disposition": f'attachment;filename="{id}-volume_info.bcif"'},
+            ),
         )
 
     @app.get(
         "/v1/{source}/{id}/mesh_bcif/{segmentation_id}/{time}/{segment_id}/{detail_lvl}"
     )
     async def get_meshes_bcif(
+        request: Request,
         source: str,
         id: str,
         segmentation_id: str,
@@ -300,6 +643,7 @@ def configure_endpoints(app: FastAPI, volume_server: VolumeServerService):
         segment_id: int,
         detail_lvl: int,
     ):
+        encoding = request_encoding(request)
         try:
             response_bytes = await get_meshes_bcif_query(
                 volume_server=volume_server,
@@ -309,12 +653,16 @@ def configure_endpoints(app: FastAPI, volume_server: VolumeServerService):
                 time=time,
                 segment_id=segment_id,
                 detail_lvl=detail_lvl,
+                encoding=encoding,
             )
             return Response(
                 response_bytes,
-                headers={
-                    "Content-Disposition": f'attachment;filename="{id}-volume_info.bcif"'
-                },
+                headers=encoded_response_headers(
+                    encoding,
+                    {
+                        "Content-Disposition": f'attachment;filename="{id}-volume_info.bcif"'
+                    },
+                ),
             )
         except Exception as e:
             return JSONResponse(
@@ -322,3 +670,44 @@ def configure_endpoints(app: FastAPI, volume_server: VolumeServerService):
             )
         finally:
             pass
+
+    @app.get("/v1/{source}/{id}/mesh_bcif_batch/{segmentation_id}/{time}/{segment_ids}")
+    async def get_meshes_bcif_batch(
+        request: Request,
+        source: str,
+        id: str,
+        segmentation_id: str,
+        time: int,
+        segment_ids: str,
+        detail_lvl: Optional[int] = Query(None),
+        max_triangles: Optional[int] = Query(None),
+    ):
+        """segment_ids - "all" or comma-separated list of segment ids"""
+        encoding = request_encoding(request)
+        try:
+            response_bytes = await get_meshes_bcif_batch_query(
+                volume_server=volume_server,
+                source=source,
+                id=id,
+                segmentation_id=segmentation_id,
+                time=time,
+                segment_ids=(
+                    None
+                    if segment_ids == "all"
+                    else [int(s) for s in segment_ids.split(",")]
+                ),
+                detail_lvl=detail_lvl,
+                max_triangles=max_triangles,
+                encoding=encoding,
+            )
+            return Response(
+                response_bytes,
+                headers=encoded_response_headers(
+                    encoding,
+                    {"Content-Disposition": f'attachment;filename="{id}-meshes.bcif"'},
+                ),
+            )
+        except Exception as e:
+            return JSONResponse(
+                {"error": str(e)}, status_code=HTTP_CODE_UNPROCESSABLE_ENTITY
+            )
@@ -0,0 +1,97 @@
+from cellstar_db.utils.content_encoding import (
+    IDENTITY,
+    StreamCompressor,
+    negotiate_encoding,
+    stream_compressor,
+)
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses in content encoding negotiated from Accept-Encoding
+    (zstd, br or gzip), including streamed responses, each part of which is
+    compressed and flushed as it is sent.
+    Responses that already have Content-Encoding (e.g. precompressed cached
+    responses) are sent as they are
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1000) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            encoding = negotiate_encoding(Headers(scope=scope).get("Accept-Encoding"))
+            if encoding != IDENTITY:
+                responder = _CompressionResponder(self.app, self.minimum_size, encoding)
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, minimum_size: int, encoding: str) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoding = encoding
+        self.send: Send = _unattached_send
+        self.initial_message: Message = {}
+        self.started = False
+        self.content_encoding_set = False
+        self.compressor: StreamCompressor = stream_compressor(encoding)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # headers are sent with the first part of the body,
+            # once it is known whether the response is compressed
+            self.initial_message = message
+            headers = Headers(raw=self.initial_message["headers"])
+            self.content_encoding_set = "content-encoding" in headers
+        elif message_type == "http.response.body" and self.content_encoding_set:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+        elif message_type == "http.response.body" and not self.started:
+            self.started = True
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if len(body) < self.minimum_size and not more_body:
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            body = self.compressor.compress(body)
+            if more_body:
+                body += self.compressor.sync()
+                del headers["Content-Length"]
+            else:
+                body += self.compressor.flush()
+                headers["Content-Length"] = str(len(body))
+            message["body"] = body
+
+            await self.send(self.initial_message)
+            await self.send(message)
+        elif message_type == "http.response.body":
+            # remaining parts of streamed response
+            body = self.compressor.compress(message.get("body", b""))
+            if message.get("more_body", False):
+                body += self.compressor.sync()
+            else:
+                body += self.compressor.flush()
+            message["body"] = body
+            await self.send(message)
+
+
+async def _unattached_send(message: Message) -> None:
+    raise RuntimeError("send awaitable not set")  # pragma: no cover
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal, Optional
 
 from pydantic import BaseSettings
 
@@ -10,6 +11,29 @@ class _Settings(BaseSettings):
     DB_PATH: Path = Path("preprocessor/temp/test_db")
     GIT_TAG: str = ""
     GIT_SHA: str = ""
+    MAX_OPEN_ENTRY_STORES: int = 64
+    DECODED_CHUNK_CACHE_MAX_BYTES: int = 512 * 1024**2
+    # executor for blocking data reads and serialization; with "process" each worker
+    # has its own entry stores and decoded chunk cache (limits above are per worker),
+    # /v1/cache_stats reports the caches of the server process only
+    READ_EXECUTOR: Literal["thread", "process"] = "thread"
+    READ_EXECUTOR_MAX_WORKERS: Optional[int] = None
+    # slicing mode of volume and segmentation reads
+    READ_MODE: Literal[
+        "dask", "zarr_colon", "zarr_gbs", "dask_from_zarr", "tensorstore"
+    ] = "dask"
+    TENSORSTORE_CACHE_POOL_BYTES: int = 256 * 1024**2
+    # in-memory cache of encoded cell, volume info and mesh responses, 0 disables it
+    RESPONSE_CACHE_MAX_BYTES: int = 256 * 1024**2
+    # directory for responses evicted from memory, not used if None
+    RESPONSE_CACHE_SPILL_DIR: Optional[Path] = None
+    RESPONSE_CACHE_SPILL_MAX_BYTES: int = 4 * 1024**3
+    # in-memory cache of meshes of single segments prepared for BinaryCIF
+    # (used by mesh and batch mesh responses), 0 disables it
+    PREPARED_MESHES_CACHE_MAX_BYTES: int = 128 * 1024**2
+    # max-age of chunk-aligned tile responses requested with the current entry
+    # version (tile URLs of the manifest), sent as immutable
+    TILE_CACHE_MAX_AGE: int = 365 * 24 * 3600
 
 
 settings = _Settings()
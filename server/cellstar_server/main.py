@@ -1,10 +1,14 @@
 import cellstar_server.app.api.v1 as api_v1
 from cellstar_db.file_system.db import FileSystemVolumeServerDB
+from cellstar_db.file_system.tensorstore_arrays import get_tensorstore_arrays
+from cellstar_db.utils.executor import create_executor
+from cellstar_query.core.prepared_meshes_cache import PreparedMeshesCache
+from cellstar_query.core.response_cache import ResponseCache
 from cellstar_query.core.service import VolumeServerService
+from cellstar_server.app.compression import CompressionMiddleware
 from cellstar_server.app.settings import settings
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 
 print("Server Settings: ", settings.dict())
 
@@ -27,15 +31,45 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(
-    GZipMiddleware, minimum_size=1000, compresslevel=3
-)  # Default compresslevel=9 is veeery slow
+# zstd, br or gzip (at fast levels) depending on Accept-Encoding,
+# cached responses are compressed by the service beforehand
+app.add_middleware(CompressionMiddleware, minimum_size=1000)
 
 # initialize dependencies
-db = FileSystemVolumeServerDB(folder=settings.DB_PATH)
+read_executor = create_executor(
+    kind=settings.READ_EXECUTOR,
+    max_workers=settings.READ_EXECUTOR_MAX_WORKERS,
+    max_open_entry_stores=settings.MAX_OPEN_ENTRY_STORES,
+    decoded_chunk_cache_max_bytes=settings.DECODED_CHUNK_CACHE_MAX_BYTES,
+)
+db = FileSystemVolumeServerDB(folder=settings.DB_PATH, executor=read_executor)
+db.store_pool.set_max_open(settings.MAX_OPEN_ENTRY_STORES)
+db.store_pool.chunk_cache.set_max_bytes(settings.DECODED_CHUNK_CACHE_MAX_BYTES)
+
+if settings.READ_MODE == "tensorstore":
+    get_tensorstore_arrays().set_cache_pool_bytes(settings.TENSORSTORE_CACHE_POOL_BYTES)
+
+response_cache = None
+if settings.RESPONSE_CACHE_MAX_BYTES > 0:
+    response_cache = ResponseCache(
+        max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+        spill_dir=settings.RESPONSE_CACHE_SPILL_DIR,
+        max_spill_bytes=settings.RESPONSE_CACHE_SPILL_MAX_BYTES,
+    )
+
+prepared_meshes_cache = None
+if settings.PREPARED_MESHES_CACHE_MAX_BYTES > 0:
+    prepared_meshes_cache = PreparedMeshesCache(
+        max_bytes=settings.PREPARED_MESHES_CACHE_MAX_BYTES
+    )
 
 # initialize server
-volume_server = VolumeServerService(db)
+volume_server = VolumeServerService(
+    db,
+    read_mode=settings.READ_MODE,
+    response_cache=response_cache,
+    prepared_meshes_cache=prepared_meshes_cache,
+)
 
 # api_v1.configure_endpoints(app, volume_server)
 api_v1.configure_endpoints(app, volume_server)
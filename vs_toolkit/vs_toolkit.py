@@ -248,18 +248,24 @@ class MeshSegmentationQueryTask(QueryTask):
                 "mesh_timeframes"
             ][str(self.time)]["segment_ids"].keys()
         )
-        response: list[str, bytes] = []
-        for segment_id in segment_ids:
-            r = await get_meshes_bcif_query(
-                volume_server=self.volume_server,
-                segmentation_id=self.segmentation_id,
-                source=self.source_db,
-                id=self.entry_id,
-                time=self.time,
-                segment_id=segment_id,
-                detail_lvl=self.detail_lvl,
+        # CVSX has a file per segment, meshes of all segments are read concurrently
+        meshes = await asyncio.gather(
+            *(
+                get_meshes_bcif_query(
+                    volume_server=self.volume_server,
+                    segmentation_id=self.segmentation_id,
+                    source=self.source_db,
+                    id=self.entry_id,
+                    time=self.time,
+                    segment_id=segment_id,
+                    detail_lvl=self.detail_lvl,
+                )
+                for segment_id in segment_ids
             )
-            response.append((str(segment_id), r))
+        )
+        response: list[str, bytes] = [
+            (str(segment_id), r) for segment_id, r in zip(segment_ids, meshes)
+        ]
         return QueryResponse(response=response, type="mesh", input_data=self.__dict__)
 
 